@@ -1,69 +1,457 @@
 import os
 import json
+import hashlib
 import shutil
 import re  # For parsing AI responses
+from datetime import datetime
 from flask import (
+    Blueprint,
     Flask,
+    current_app,
+    has_app_context,
     render_template,
     jsonify,
     request,
     session,
     redirect,
+    Response,
+    stream_with_context,
     url_for,
     flash,
+    g,
 )  # Added redirect, url_for
-from openai import OpenAI
+from werkzeug.local import LocalProxy
 from dotenv import load_dotenv
-from utils.data_loader import DataLoader
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.ai_gateway import AIGateway, AIGatewayError
+from utils.ai_jobs import FINISHED_STATUSES, AnalysisJobQueue, QueueFullError
+from utils.ai_review import ParallelReviewer
+from utils.ai_streaming import JsonStringFieldStream, iter_completion_text
+from utils.ai_stub import StubOpenAIClient
+from utils.analysis_cache import AnalysisCache
+from utils.auth import Auth, Identity, IdentityCache, login_required, role_required
+from utils.batch_writer import BatchWriter
+from utils.code_runner import CodeRunner
+from utils.data_loader import DataLoader, question_id
+from utils.enrollment import enroll, parse_roster, resolve_students, unenroll
+from utils.grading import (
+    STATUS_CORRECT,
+    build_local_feedback,
+    count_correct,
+    grade_submission,
+    infer_weak_tags,
+    needs_ai_review,
+    score_tags,
+)
+from utils.lazy import Lazy
+from utils.progress_store import ProgressStore
+from utils.passwords import PasswordHasher, PasswordHasherBusyError
+from utils.prompt_builder import (
+    PromptBuilder,
+    estimate_tokens,
+    format_submission_items,
+)
+from utils.quiz_session_store import create_quiz_session_store
+from utils.roster import DEFAULT_PAGE_SIZE, decode_cursor, roster_page
+from utils.single_flight import SingleFlight
+from utils.upsert import Upsert
 import random, string
-from flask_sqlalchemy import SQLAlchemy
+import secrets
+import time
+from flask_migrate import Migrate
+from sqlalchemy import event
 from extensions import db
+from models import (
+    User,
+    Class,
+    ClassRegistration,
+    QuizAttempt,
+    QuestionResponse,
+    SubtopicProgress,
+    TagMastery,
+    TopicProgress,
+)
+
+migrate = Migrate()
+bp = Blueprint("main", __name__)
+
+#  Constants and Global Settings
+MASTERY_THRESHOLD = 0.80  # 80% score to consider targeted weak topics mastered
+DATA_ROOT_PATH = os.path.join(os.path.dirname(__file__), "data")
+
+#  Cache of AI analyses, keyed by a hash of the graded submission
+ANALYSIS_MODEL = "gpt-4"
+ANALYSIS_MAX_COMPLETION_TOKENS = 1500
+
+#  Static start of every analysis request; variable parts follow it
+ANALYSIS_SYSTEM_MESSAGE = (
+    "You are an expert instructor. Your task is to analyze a student's quiz performance, "
+    "classify their errors against a predefined list of topics, and evaluate their submitted code. "
+    "For 'coding' questions, determine if the student's code correctly solves the problem."
+)
+ANALYSIS_PROMPT_PREFIX = (
+    "You are analyzing a student's quiz submission which includes multiple choice, fill-in-the-blank, and coding questions.\n"
+    "Based on the incorrect answers and their submitted code, identify the concepts they are weak in.\n"
+    "For coding questions marked 'For AI Review', evaluate if the student's code:\n"
+    "1. Correctly solves the problem\n"
+    "2. Uses appropriate syntax and conventions\n"
+    "3. Demonstrates understanding of the underlying concepts\n"
+    "Compare their code with the provided sample solution.\n"
+    "Questions the student answered correctly are only listed by number.\n\n"
+    "Provide your analysis as a single JSON object with two keys:\n"
+    ' - "detailed_feedback": (string) Your textual analysis, including specific feedback on coding attempts, what they did well, and areas for improvement.\n'
+    ' - "weak_concept_tags": (JSON list of strings) The list of weak concepts from the ALLOWED TAGS list. If there are no weaknesses, provide an empty list `[]`.\n\n'
+)
+
+#  Per-student aggregates, merged in the same batch as the attempts they summarize
+subtopic_progress_upsert = Upsert(
+    SubtopicProgress.__table__,
+    keys=["student_id", "subject", "subtopic"],
+    add=["attempts"],
+    greatest=["best_score", "last_activity"],
+    replace=["last_score"],
+)
+tag_mastery_upsert = Upsert(
+    TagMastery.__table__,
+    keys=["student_id", "subject", "tag"],
+    add=["answered", "missed"],
+    greatest=["last_activity"],
+)
+
+#  Limits of one progress report and one roster import
+PROGRESS_MAX_BATCH = 100
+PROGRESS_TOPIC_MAX_LENGTH = TopicProgress.__table__.c.topic.type.length
+ROSTER_IMPORT_MAX_BYTES = 2 * 1024 * 1024
+
+
+def load_config() -> dict:
+    """Read the app settings from the environment, with their defaults."""
+    return {
+        "SECRET_KEY": os.getenv("FLASK_KEY"),
+        "TEMPLATES_AUTO_RELOAD": True,
+        "SQLALCHEMY_DATABASE_URI": os.getenv("DATABASE_URL"),
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "DATA_ROOT_PATH": DATA_ROOT_PATH,
+        # Identities are cached in-process for this many seconds (0 disables)
+        "AUTH_CACHE_TTL": float(os.getenv("AUTH_CACHE_TTL", 30)),
+        "PASSWORD_HASH_METHOD": os.getenv("PASSWORD_HASH_METHOD", "scrypt"),
+        "PASSWORD_HASH_WORKERS": int(
+            os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+        ),
+        "PASSWORD_HASH_QUEUE": int(os.getenv("PASSWORD_HASH_QUEUE", 64)),
+        "PASSWORD_HASH_TIMEOUT": float(os.getenv("PASSWORD_HASH_TIMEOUT", 10)),
+        # AI_BACKEND=stub answers AI requests locally, for development and load tests
+        "AI_BACKEND": os.getenv("AI_BACKEND", "openai"),
+        "AI_STUB_DELAY": float(os.getenv("AI_STUB_DELAY", 1.0)),
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY"),
+        # Deadline in seconds for one logical AI call, including retries; a
+        # streamed call only needs its first chunk by then, and afterwards
+        # fails if no chunk arrives for AI_STREAM_IDLE_TIMEOUT seconds
+        "AI_CALL_TIMEOUT": float(os.getenv("AI_CALL_TIMEOUT", 30)),
+        "AI_STREAM_IDLE_TIMEOUT": float(os.getenv("AI_STREAM_IDLE_TIMEOUT", 30)),
+        "AI_MAX_CONCURRENCY": int(os.getenv("AI_MAX_CONCURRENCY", 4)),
+        "AI_MAX_RETRIES": int(os.getenv("AI_MAX_RETRIES", 2)),
+        "AI_BREAKER_FAILURES": int(os.getenv("AI_BREAKER_FAILURES", 5)),
+        "AI_BREAKER_RESET": float(os.getenv("AI_BREAKER_RESET", 30)),
+        "CODE_RUNNER_WORKERS": int(os.getenv("CODE_RUNNER_WORKERS", 4)),
+        "CODE_RUNNER_TIMEOUT": float(os.getenv("CODE_RUNNER_TIMEOUT", 5)),
+        "CODE_RUNNER_CPU_SECONDS": int(os.getenv("CODE_RUNNER_CPU_SECONDS", 2)),
+        "CODE_RUNNER_MEMORY_MB": int(os.getenv("CODE_RUNNER_MEMORY_MB", 256)),
+        # Only for local development where the kernel cannot isolate the sandbox
+        "CODE_RUNNER_REQUIRE_ISOLATION": os.getenv(
+            "CODE_RUNNER_REQUIRE_ISOLATION", "true"
+        ).lower()
+        in ("1", "true", "yes"),
+        "CONTENT_CACHE_MAX_BYTES": int(
+            os.getenv("CONTENT_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+        ),
+        "CONTENT_CACHE_MAX_ENTRIES": int(os.getenv("CONTENT_CACHE_MAX_ENTRIES", 2048)),
+        "CONTENT_NEGATIVE_CACHE_TTL": float(
+            os.getenv("CONTENT_NEGATIVE_CACHE_TTL", 30)
+        ),
+        # The SQLite stores below default to files in the instance folder
+        "QUIZ_SESSION_DB": os.getenv("QUIZ_SESSION_DB"),
+        "QUIZ_SESSION_TTL": float(os.getenv("QUIZ_SESSION_TTL", 24 * 60 * 60)),
+        "ANALYSIS_CACHE_DB": os.getenv("ANALYSIS_CACHE_DB"),
+        "ANALYSIS_CACHE_TTL": float(os.getenv("ANALYSIS_CACHE_TTL", 7 * 24 * 60 * 60)),
+        "ANALYSIS_CACHE_MAX_ENTRIES": int(
+            os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 10000)
+        ),
+        "ANALYSIS_JOB_DB": os.getenv("ANALYSIS_JOB_DB"),
+        # Token budgets bounding the size, and so the latency, of every AI request
+        "AI_PROMPT_MAX_TOKENS": int(os.getenv("AI_PROMPT_MAX_TOKENS", 3000)),
+        "AI_ANSWER_MAX_TOKENS": int(os.getenv("AI_ANSWER_MAX_TOKENS", 400)),
+        "ATTEMPT_FLUSH_SIZE": int(os.getenv("ATTEMPT_FLUSH_SIZE", 200)),
+        "ATTEMPT_FLUSH_INTERVAL": float(os.getenv("ATTEMPT_FLUSH_INTERVAL", 1.0)),
+        "PROGRESS_FLUSH_INTERVAL": float(os.getenv("PROGRESS_FLUSH_INTERVAL", 5.0)),
+        "ROSTER_IMPORT_MAX_ROWS": int(os.getenv("ROSTER_IMPORT_MAX_ROWS", 5000)),
+        "AI_JOB_WORKERS": int(os.getenv("AI_JOB_WORKERS", 4)),
+        "AI_JOB_MAX_PENDING": int(os.getenv("AI_JOB_MAX_PENDING", 64)),
+        "AI_JOB_TIMEOUT": float(os.getenv("AI_JOB_TIMEOUT", 300)),
+        # "parallel" reviews each coding answer with its own concurrent request
+        # instead of sending the whole submission in one prompt
+        "AI_ANALYSIS_MODE": os.getenv("AI_ANALYSIS_MODE", "single").lower(),
+        # Ask the AI for narrative feedback on every quiz, not only to review code
+        "AI_NARRATIVE_FEEDBACK": os.getenv("AI_NARRATIVE_FEEDBACK", "false").lower()
+        in ("1", "true", "yes"),
+        "AI_REVIEW_WORKERS": int(os.getenv("AI_REVIEW_WORKERS", 4)),
+        # Each open Server-Sent Events stream holds a worker until its job ends,
+        # so clients poll unless an async worker class (e.g. gevent) serves them
+        "AI_STREAM_EVENTS": os.getenv("AI_STREAM_EVENTS", "false").lower()
+        in ("1", "true", "yes"),
+        # Minimum seconds between streamed feedback updates written to the job table
+        "AI_STREAM_REPORT_INTERVAL": float(
+            os.getenv("AI_STREAM_REPORT_INTERVAL", 0.1)
+        ),
+    }
 
 
-#  Load Environment Variables
-load_dotenv()
+def load_identity(user_id):
+    """Load a user's identity from the database, or None if the user is gone."""
+    user = db.session.get(User, user_id)
+    return Identity.from_user(user) if user else None
 
-#  App Configuration
-app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_KEY")
-if not app.secret_key:
-    app.logger.warning(
-        "FLASK_KEY not set, using a default secret key. Please set this in your .env file for production."
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_identity(mapper, connection, target):
+    auth = current_app.extensions.get("auth") if has_app_context() else None
+    if auth:
+        auth.invalidate(target.id)
+
+
+def create_ai_client(app, gateway):
+    """
+    Create the client for AI requests, or None if it cannot be configured.
+
+    The OpenAI SDK is imported here rather than at module level; it is the
+    slowest import of the app and most processes never make an AI call.
+    """
+    if app.config["AI_BACKEND"] == "stub":
+        app.logger.info("Using the stub AI backend")
+        return StubOpenAIClient(delay=app.config["AI_STUB_DELAY"])
+
+    from openai import (
+        APIConnectionError,
+        APITimeoutError,
+        InternalServerError,
+        OpenAI,
+        RateLimitError,
     )
-    app.secret_key = (
-        "your_default_secret_key_for_development_12345_v2"  # Fallback for local dev
+
+    # Ensure OPENAI_API_KEY is set in your .env file
+    try:
+        api_key = app.config["OPENAI_API_KEY"]
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not found in environment variables.")
+        # Retries and timeouts are handled by ai_gateway, not the client
+        client = OpenAI(
+            api_key=api_key, max_retries=0, timeout=app.config["AI_CALL_TIMEOUT"]
+        )
+        app.logger.info("OpenAI client initialized successfully")
+    except Exception as e:
+        app.logger.error(f"Failed to initialize OpenAI client: {e}")
+        return None  # Allow app to run but AI features will fail if client is None
+
+    gateway.retryable_errors += (
+        APIConnectionError,  # Includes APITimeoutError
+        RateLimitError,
+        InternalServerError,
     )
-    
-app.config['TEMPLATES_AUTO_RELOAD'] = True
-SECRET_KEY = os.getenv("SECRET_KEY", "devkey")
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    gateway.timeout_errors += (APITimeoutError,)
+    return client
 
-db.init_app(app)
-from models import User, Class, ClassRegistration
 
-from flask_migrate import Migrate
-migrate = Migrate(app, db)
-# Ensure OPENAI_API_KEY is set in your .env file
-try:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY not found in environment variables.")
-    # Simple initialization without extra parameters
-    client = OpenAI(api_key=api_key)
-    # Test the client
-    app.logger.info("OpenAI client initialized successfully")
-except Exception as e:
-    app.logger.error(f"Failed to initialize OpenAI client: {e}")
-    client = None  # Allow app to run but AI features will fail if client is None
+def create_app(config=None) -> Flask:
+    """
+    Create and configure the app.
 
-#  Constants and Global Settings
-MASTERY_THRESHOLD = 0.80  # 80% score to consider targeted weak topics mastered
+    The AI client, the content layer and the services that run threads or
+    keep SQLite files are created on first use, so booting a worker or running
+    `flask db` does not import the OpenAI SDK, start threads, or touch
+    data/subjects and the instance folder.
 
-#  Initialize DataLoader
-DATA_ROOT_PATH = os.path.join(os.path.dirname(__file__), "data")
-data_loader = DataLoader(DATA_ROOT_PATH)
+    Args:
+        config: Settings overriding those read by load_config()
+
+    Returns:
+        The Flask app, with its services in app.extensions
+    """
+    #  Load Environment Variables
+    load_dotenv()
+
+    #  App Configuration
+    app = Flask(__name__)
+    app.config.from_mapping(load_config())
+    if config:
+        app.config.from_mapping(config)
+    if not app.config["SECRET_KEY"]:
+        app.logger.warning(
+            "FLASK_KEY not set, using a default secret key. Please set this in your .env file for production."
+        )
+        app.config["SECRET_KEY"] = (
+            "your_default_secret_key_for_development_12345_v2"  # Fallback for local dev
+        )
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+
+    #  The logged-in user is loaded once per request into g.user
+    auth_cache_ttl = app.config["AUTH_CACHE_TTL"]
+    Auth(
+        app,
+        load_identity,
+        cache=IdentityCache(ttl=auth_cache_ttl) if auth_cache_ttl > 0 else None,
+    )
+
+    #  Services wrapped in Lazy are created by the first request that uses them,
+    #  so creating the app starts no threads and opens no database files
+
+    #  Password hashing runs in a bounded pool so login storms cannot take every core
+    app.extensions["password_hasher"] = Lazy(
+        lambda: PasswordHasher(
+            method=app.config["PASSWORD_HASH_METHOD"],
+            max_workers=app.config["PASSWORD_HASH_WORKERS"],
+            max_pending=app.config["PASSWORD_HASH_QUEUE"],
+            timeout=app.config["PASSWORD_HASH_TIMEOUT"],
+        )
+    )
+
+    #  All AI calls share one concurrency limit, retry policy and circuit breaker;
+    #  the client's own transient errors are added when it is created
+    gateway = AIGateway(
+        max_concurrency=app.config["AI_MAX_CONCURRENCY"],
+        call_timeout=app.config["AI_CALL_TIMEOUT"],
+        stream_idle_timeout=app.config["AI_STREAM_IDLE_TIMEOUT"],
+        max_retries=app.config["AI_MAX_RETRIES"],
+        failure_threshold=app.config["AI_BREAKER_FAILURES"],
+        reset_timeout=app.config["AI_BREAKER_RESET"],
+        retryable_errors=(TimeoutError, ConnectionError),
+        timeout_errors=(TimeoutError,),
+    )
+    app.extensions["ai_gateway"] = gateway
+    app.extensions["ai_client"] = Lazy(lambda: create_ai_client(app, gateway))
+    # Coalesces identical AI requests that are in flight at the same time
+    app.extensions["ai_flight"] = SingleFlight()
+
+    #  Coding answers to questions with test cases run in a local sandbox pool
+    app.extensions["code_runner"] = Lazy(
+        lambda: CodeRunner(
+            max_workers=app.config["CODE_RUNNER_WORKERS"],
+            timeout=app.config["CODE_RUNNER_TIMEOUT"],
+            cpu_seconds=app.config["CODE_RUNNER_CPU_SECONDS"],
+            memory_mb=app.config["CODE_RUNNER_MEMORY_MB"],
+            require_isolation=app.config["CODE_RUNNER_REQUIRE_ISOLATION"],
+        )
+    )
+
+    #  Content layer over data/subjects
+    app.extensions["data_loader"] = Lazy(
+        lambda: DataLoader(
+            app.config["DATA_ROOT_PATH"],
+            cache_max_bytes=app.config["CONTENT_CACHE_MAX_BYTES"],
+            cache_max_entries=app.config["CONTENT_CACHE_MAX_ENTRIES"],
+            negative_cache_ttl=app.config["CONTENT_NEGATIVE_CACHE_TTL"],
+        )
+    )
+
+    #  Server-side quiz state (the session cookie only carries "quiz_sid")
+    app.extensions["quiz_sessions"] = Lazy(
+        lambda: create_quiz_session_store(
+            app.config["QUIZ_SESSION_DB"]
+            or os.path.join(app.instance_path, "quiz_sessions.sqlite3"),
+            ttl_seconds=app.config["QUIZ_SESSION_TTL"],
+        )
+    )
+
+    #  Cache of AI analyses, keyed by a hash of the graded submission
+    app.extensions["analysis_cache"] = Lazy(
+        lambda: AnalysisCache(
+            app.config["ANALYSIS_CACHE_DB"]
+            or os.path.join(app.instance_path, "analysis_cache.sqlite3"),
+            ttl_seconds=app.config["ANALYSIS_CACHE_TTL"],
+            max_entries=app.config["ANALYSIS_CACHE_MAX_ENTRIES"],
+        )
+    )
+
+    #  Quiz attempts are appended to the database in batches, off the request path
+    app.extensions["attempt_writer"] = Lazy(
+        lambda: BatchWriter(
+            lambda: db.engine,
+            flush_size=app.config["ATTEMPT_FLUSH_SIZE"],
+            flush_interval=app.config["ATTEMPT_FLUSH_INTERVAL"],
+            app=app,
+        )
+    )
+
+    #  Video progress reports are coalesced per (user, topic) and upserted periodically
+    app.extensions["progress_store"] = Lazy(
+        lambda: ProgressStore(
+            lambda: db.engine,
+            TopicProgress.__table__,
+            flush_interval=app.config["PROGRESS_FLUSH_INTERVAL"],
+            app=app,
+        )
+    )
+
+    #  AI analyses run in the background; clients poll or stream the job result
+    app.extensions["analysis_jobs"] = Lazy(
+        lambda: AnalysisJobQueue(
+            app.config["ANALYSIS_JOB_DB"]
+            or os.path.join(app.instance_path, "analysis_jobs.sqlite3"),
+            max_workers=app.config["AI_JOB_WORKERS"],
+            max_pending=app.config["AI_JOB_MAX_PENDING"],
+            job_timeout=app.config["AI_JOB_TIMEOUT"],
+            app=app,
+        )
+    )
+
+    #  Reviews each coding answer with its own request in "parallel" analysis mode
+    app.extensions["parallel_reviewer"] = Lazy(
+        lambda: ParallelReviewer(
+            lambda prompt, system_message, max_tokens: call_openai_api(
+                prompt,
+                system_message,
+                model=ANALYSIS_MODEL,
+                max_tokens=max_tokens,
+                expect_json_output=True,
+            ),
+            app.extensions["analysis_cache"].get(),
+            max_workers=app.config["AI_REVIEW_WORKERS"],
+            budget={
+                "prompt": app.config["AI_PROMPT_MAX_TOKENS"],
+                "answer": app.config["AI_ANSWER_MAX_TOKENS"],
+            },
+            app=app,
+        )
+    )
+
+    app.register_blueprint(bp)
+    return app
+
+
+def _service(name: str):
+    """Proxy to a service of the current app, created on first use if lazy."""
+
+    def resolve():
+        service = current_app.extensions[name]
+        return service.get() if isinstance(service, Lazy) else service
+
+    return LocalProxy(resolve)
+
+
+#  Services of the current app, for the routes and helpers below
+password_hasher = _service("password_hasher")
+client = _service("ai_client")
+ai_gateway = _service("ai_gateway")
+ai_flight = _service("ai_flight")
+code_runner = _service("code_runner")
+data_loader = _service("data_loader")
+quiz_sessions = _service("quiz_sessions")
+analysis_cache = _service("analysis_cache")
+attempt_writer = _service("attempt_writer")
+progress_store = _service("progress_store")
+analysis_jobs = _service("analysis_jobs")
+parallel_reviewer = _service("parallel_reviewer")
 
 
 #  Helper Functions
@@ -72,6 +460,47 @@ def get_session_key(subject: str, subtopic: str, key_type: str) -> str:
     return f"{subject}_{subtopic}_{key_type}"
 
 
+def get_quiz_state(subject: str, subtopic: str) -> dict:
+    """Get the server-side quiz state for the current subject/subtopic."""
+    sid = session.get("quiz_sid")
+    if not sid:
+        return {}
+    return quiz_sessions.get(sid, f"{subject}/{subtopic}") or {}
+
+
+def get_quiz_sid() -> str:
+    """Get the current session's quiz session id, assigning one if needed."""
+    sid = session.get("quiz_sid")
+    if not sid:
+        sid = secrets.token_urlsafe(16)
+        session["quiz_sid"] = sid
+    return sid
+
+
+def set_quiz_state(subject: str, subtopic: str, state: dict) -> None:
+    """Replace the server-side quiz state for the current subject/subtopic."""
+    quiz_sessions.set(get_quiz_sid(), f"{subject}/{subtopic}", state)
+
+
+def update_quiz_state(subject: str, subtopic: str, fields: dict, sid=None) -> None:
+    """
+    Merge fields into the server-side quiz state for subject/subtopic.
+
+    sid defaults to the current session's; background jobs pass it explicitly.
+    """
+    sid = sid or get_quiz_sid()
+    scope = f"{subject}/{subtopic}"
+    state = quiz_sessions.get(sid, scope) or {}
+    state.update(fields)
+    quiz_sessions.set(sid, scope, state)
+
+
+def get_served_questions(subject: str, subtopic: str, state_key: str) -> list:
+    """Resolve question ids stored in the quiz state back to question dicts."""
+    question_ids = get_quiz_state(subject, subtopic).get(state_key, [])
+    return data_loader.resolve_question_ids(subject, subtopic, question_ids)
+
+
 def get_subject_tags(subject: str) -> list:
     """Get allowed AI analysis tags for a subject."""
     return data_loader.get_subject_keywords(subject)
@@ -99,13 +528,22 @@ def get_video_data(subject: str, subtopic: str) -> dict:
     return videos_data.get("videos", {}) if videos_data else {}
 
 
-def format_quiz_bank_for_ai_prompt(quiz_bank, title="Reference Quiz Bank"):
-    """Formats a quiz bank (like FUNCTIONS_QUIZ) into a string for AI prompts."""
+def format_quiz_bank_for_ai_prompt(
+    quiz_bank, title="Reference Quiz Bank", max_tokens=None
+):
+    """
+    Formats a quiz bank (like FUNCTIONS_QUIZ) into a string for AI prompts.
+
+    Questions beyond max_tokens (default: half the prompt budget) are left
+    out, with a note saying how many.
+    """
+    if max_tokens is None:
+        max_tokens = current_app.config["AI_PROMPT_MAX_TOKENS"] // 2
     if not quiz_bank:  # Handles empty or None quiz_bank
         return f"\n--- {title}: Not available or empty. ---\n"
-    text = f"\n--- {title} ---\n"
+    items = []
     for i, q_data in enumerate(quiz_bank):
-        text += f"Q{i+1}: {q_data.get('question', 'N/A')}\n"
+        text = f"Q{i+1}: {q_data.get('question', 'N/A')}\n"
         text += f"Options: {json.dumps(q_data.get('options', []))}\n"
         answer_idx = q_data.get("answer_index")
         options = q_data.get("options", [])
@@ -117,8 +555,19 @@ def format_quiz_bank_for_ai_prompt(quiz_bank, title="Reference Quiz Bank"):
             text += f"Correct Answer: {options[answer_idx]}\n\n"
         else:
             text += f"Correct Answer: Not specified or invalid index (index: {answer_idx}, options_len: {len(options)})\n\n"
-    text += "--- End of Bank ---\n"
-    return text
+        items.append(text)
+
+    builder = PromptBuilder(title, max_tokens)
+    builder.add(f"\n--- {title} ---\n")
+    bank_end = "--- End of Bank ---\n"
+    omitted_note = "(Further questions were left out for length.)\n"
+    omitted = builder.add_fitting(
+        items, part="bank", reserve_tokens=estimate_tokens(omitted_note + bank_end)
+    )
+    if omitted:
+        builder.add(omitted_note, part="bank")
+    builder.add(bank_end)
+    return builder.build()
 
 
 def parse_ai_json_from_text(ai_response_string, expected_type_is_list=True):
@@ -127,7 +576,7 @@ def parse_ai_json_from_text(ai_response_string, expected_type_is_list=True):
     including markdown code blocks.
     """
     if not ai_response_string:
-        app.logger.warning("AI response string is empty in parse_ai_json_from_text.")
+        current_app.logger.warning("AI response string is empty in parse_ai_json_from_text.")
         return None
 
     # Pattern to extract JSON from ```json ... ``` or raw {...} / [...]
@@ -152,63 +601,124 @@ def parse_ai_json_from_text(ai_response_string, expected_type_is_list=True):
             parsed_json = json.loads(json_str_cleaned)
 
             if expected_type_is_list and not isinstance(parsed_json, list):
-                app.logger.warning(
+                current_app.logger.warning(
                     f"AI returned JSON but not the expected list type. Got: {type(parsed_json)}. From: {json_str_cleaned[:100]}"
                 )
                 return None
             if not expected_type_is_list and not isinstance(parsed_json, dict):
-                app.logger.warning(
+                current_app.logger.warning(
                     f"AI returned JSON but not the expected dict type. Got: {type(parsed_json)}. From: {json_str_cleaned[:100]}"
                 )
                 return None
             return parsed_json
         except json.JSONDecodeError as e:
-            app.logger.error(
+            current_app.logger.error(
                 f"JSONDecodeError in parse_ai_json_from_text: {e}. Attempted to parse: {json_str_cleaned[:200]}"
             )
             return None
 
-    app.logger.warning(
+    current_app.logger.warning(
         f"Could not find or parse expected JSON structure in AI response: {ai_response_string[:500]}..."
     )
     return None
 
 
+def build_completion_args(
+    prompt_text, system_message, model="gpt-4", max_tokens=800, expect_json_output=False
+):
+    """Build the keyword arguments for client.chat.completions.create()."""
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": prompt_text},
+    ]
+
+    completion_args = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+    }
+
+    # For newer models that support JSON mode directly
+    # Check OpenAI documentation for the latest models supporting this.
+    # E.g., "gpt-4-1106-preview", "gpt-3.5-turbo-1106", "gpt-4-turbo-preview", "gpt-4o"
+    if expect_json_output and (
+        "1106" in model
+        or "turbo-preview" in model
+        or "gpt-4o" in model
+        or "gpt-4-turbo" in model
+    ):
+        completion_args["response_format"] = {"type": "json_object"}
+
+    return completion_args
+
+
 def call_openai_api(
     prompt_text, system_message, model="gpt-4", max_tokens=800, expect_json_output=False
 ):
     """Helper function to call the OpenAI API."""
     if not client:
-        app.logger.error("OpenAI client not initialized. Cannot make API call.")
+        current_app.logger.error("OpenAI client not initialized. Cannot make API call.")
         return None  # Or raise an exception
     try:
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": prompt_text},
-        ]
+        completion_args = build_completion_args(
+            prompt_text, system_message, model, max_tokens, expect_json_output
+        )
+        # Identical prompts sent at the same time share one API call
+        prompt_hash = hashlib.sha256(
+            json.dumps(completion_args, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        response = ai_flight.do(
+            ("completion", prompt_hash),
+            lambda: ai_gateway.call(
+                lambda timeout: client.chat.completions.create(
+                    **completion_args, timeout=timeout
+                )
+            ),
+        )
+        return response.choices[0].message.content.strip()
+    except AIGatewayError as e:
+        current_app.logger.warning(f"OpenAI API call not made or abandoned: {e}")
+        return None
+    except Exception as e:
+        current_app.logger.error(f"OpenAI API call failed: {e}")
+        return None
 
-        completion_args = {
-            "model": model,
-            "messages": messages,
-            "max_tokens": max_tokens,
-        }
 
-        # For newer models that support JSON mode directly
-        # Check OpenAI documentation for the latest models supporting this.
-        # E.g., "gpt-4-1106-preview", "gpt-3.5-turbo-1106", "gpt-4-turbo-preview", "gpt-4o"
-        if expect_json_output and (
-            "1106" in model
-            or "turbo-preview" in model
-            or "gpt-4o" in model
-            or "gpt-4-turbo" in model
-        ):
-            completion_args["response_format"] = {"type": "json_object"}
+def call_openai_api_stream(
+    prompt_text, system_message, model="gpt-4", max_tokens=800, expect_json_output=False
+):
+    """
+    Call the OpenAI API in streaming mode, yielding text as it is generated.
 
-        response = client.chat.completions.create(**completion_args)
-        return response.choices[0].message.content.strip()
+    Errors are logged and end the stream early, so callers should validate
+    the joined text just like the result of call_openai_api().
+    """
+    if not client:
+        current_app.logger.error("OpenAI client not initialized. Cannot make API call.")
+        return
+    try:
+        completion_args = build_completion_args(
+            prompt_text, system_message, model, max_tokens, expect_json_output
+        )
+        # The concurrency slot is held until the stream is fully consumed. The
+        # request timeout bounds each read, so it must also cover idle gaps
+        idle_timeout = ai_gateway.stream_idle_timeout
+        with ai_gateway.reserve() as gateway_call:
+            stream = gateway_call.run(
+                lambda timeout: client.chat.completions.create(
+                    **completion_args, stream=True, timeout=max(timeout, idle_timeout)
+                )
+            )
+            for delta in iter_completion_text(stream):
+                gateway_call.check_deadline()
+                yield delta
+                # Time spent by the consumer is not idle time of the API
+                gateway_call.touch()
+    except AIGatewayError as e:
+        current_app.logger.warning(f"OpenAI API streaming call not made or abandoned: {e}")
     except Exception as e:
-        app.logger.error(f"OpenAI API call failed: {e}")
-        return None
+        current_app.logger.error(f"OpenAI API streaming call failed: {e}")
+
 
 # -------------------------
 # Helper Functions
@@ -217,15 +727,15 @@ def generate_class_code(length=6):
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
 
 # -------------------------
-@app.route('/')
+@bp.route('/')
 def index():
     session.clear()
     if session.get('user_id'):
-        return redirect(url_for('subject_selection'))
+        return redirect(url_for('main.subject_selection'))
     return redirect('/login')
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -247,7 +757,11 @@ def register():
         code = generate_class_code() if role == 'teacher' else None
 
         # 4. Hash password and create user
-        password_hash = generate_password_hash(password)
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordHasherBusyError:
+            flash("The server is busy, please try again in a moment.", "error")
+            return redirect('/register')
         user = User(
             username=username,
             email=email,
@@ -265,95 +779,147 @@ def register():
     # GET request: show registration form
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
+    version = '1.0.3'
 
     if request.method == 'POST':
         email = request.form['email']
         password = request.form['password']
         user = User.query.filter_by(email=email).first()
 
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            valid = user is not None and password_hasher.verify(
+                user.password_hash, password
+            )
+        except PasswordHasherBusyError:
+            flash('Many students are logging in right now, please try again in a moment.', 'error')
+            return render_template('login.html', version=version), 503
+
+        if valid:
+            # Upgrade hashes made with an older method or work factor
+            if password_hasher.needs_rehash(user.password_hash):
+                try:
+                    user.password_hash = password_hasher.hash(password)
+                    db.session.commit()
+                except PasswordHasherBusyError:
+                    pass  # Upgraded on a later login
+
             session['user_id'] = user.id
             session['role'] = user.role
             flash(f"Welcome {user.username}!")
 
-            return redirect(url_for('subject_selection'))
+            return redirect(url_for('main.subject_selection'))
 
         flash('Invalid email or password', 'error')
-    version = '1.0.3'
     return render_template('login.html', version=version)
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash("Logged out successfully")
     return redirect('/login')
 
-@app.route("/teacher/students")
-def teacher_students():
-    teacher_id = session.get("user_id")
-    if not teacher_id:
-        return redirect("/login")
+def read_roster_page(teacher_id):
+    """Read the roster page selected by the request's after/limit arguments."""
+    cursor = request.args.get("after")
+    after = decode_cursor(cursor) if cursor else None
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    return roster_page(db.session, teacher_id, after=after, limit=limit)
 
-    # Get the teacher
-    teacher = User.query.get(teacher_id)
-    code = teacher.code if teacher else None
 
-    # Find all students enrolled in this teacher's classes
-    students = (
-        db.session.query(User)
-        .join(ClassRegistration, ClassRegistration.student_id == User.id)
-        .join(Class, Class.id == ClassRegistration.class_id)
-        .filter(Class.teacher_id == teacher_id)
-        .distinct()
-        .all()
-    )
+@bp.route("/teacher/students")
+@role_required("teacher")
+def teacher_students():
+    # One page of enrolled students with their progress summaries, in one query
+    students, next_cursor = read_roster_page(g.user.id)
 
     return render_template(
         "teacher_students.html",
         students=students,
-        code=teacher.code  # pass the code to the template
+        next_cursor=next_cursor,
+        code=g.user.code  # pass the code to the template
     )
 
-@app.route('/teacher/student_progress/<int:student_id>')
+
+@bp.route("/api/teacher/students")
+@role_required("teacher")
+def teacher_students_api():
+    """Get a page of the teacher's roster; pass next_cursor as after for more."""
+    students, next_cursor = read_roster_page(g.user.id)
+    for student in students:
+        if student["last_activity"]:
+            student["last_activity"] = student["last_activity"].isoformat()
+    return jsonify({"students": students, "next_cursor": next_cursor})
+
+@bp.route('/teacher/student_progress/<int:student_id>')
+@role_required("teacher")
 def student_progress(student_id):
-    """Temporary page to confirm the 'View Progress' button works."""
-    
-    # You can fetch the student's name here if you have a database function
-    # For now, we'll use a placeholder name:
-    student_name = f"Student {student_id}"
+    """Show an enrolled student's progress per subtopic and concept tag."""
+    teacher_id = g.user.id
+    student = (
+        User.query
+        .join(ClassRegistration, ClassRegistration.student_id == User.id)
+        .join(Class, Class.id == ClassRegistration.class_id)
+        .filter(Class.teacher_id == teacher_id, User.id == student_id)
+        .first()
+    )
+    if not student:
+        flash("That student is not enrolled in your classes.")
+        return redirect("/teacher/students")
+
+    subtopics = (
+        SubtopicProgress.query
+        .filter_by(student_id=student_id)
+        .order_by(SubtopicProgress.subject, SubtopicProgress.subtopic)
+        .all()
+    )
+    # Weakest concepts first
+    tags = sorted(
+        TagMastery.query.filter_by(student_id=student_id).all(),
+        key=lambda tag: tag.mastery,
+    )
 
     return render_template(
-        'student_progress_temp.html',
-        student_name=student_name,
-        student_id=student_id
+        'student_progress.html',
+        student=student,
+        subtopics=subtopics,
+        tags=tags,
+        mastery_threshold=MASTERY_THRESHOLD,
     )
 
 
-@app.route("/teacher/remove_student/<int:student_id>", methods=["POST"])
+@bp.route("/teacher/remove_student/<int:student_id>", methods=["POST"])
+@role_required("teacher")
 def remove_student(student_id):
-    teacher_id = session.get("user_id")
-
     # Remove enrollment of this student from teacher's classes
-    enrollments = (
-        ClassRegistration.query
-        .join(Class, Class.id == ClassRegistration.class_id)
-        .filter(Class.teacher_id == teacher_id, ClassRegistration.student_id == student_id)
-        .all()
-    )
-    for e in enrollments:
-        db.session.delete(e)
+    unenroll(db.session, [student_id], g.user.id)
     db.session.commit()
     return redirect("/teacher/students")
 
-@app.route("/student/add_teacher", methods=["POST"])
-def add_teacher():
-    student_id = session.get("user_id")
 
-    if not student_id:
-        flash("Please log in first.")
-        return redirect("/login")
+def get_or_create_teacher_classes(teacher):
+    """Get the ids of a teacher's classes, creating a default class if none exist."""
+    class_ids = db.session.scalars(
+        db.select(Class.id).filter_by(teacher_id=teacher.id)
+    ).all()
+    if not class_ids:
+        # Create a default class for this teacher
+        default_class = Class(
+            name=f"{teacher.username}'s Class",
+            code=teacher.code,  # optional, can reuse teacher code
+            teacher_id=teacher.id
+        )
+        db.session.add(default_class)
+        db.session.flush()
+        class_ids = [default_class.id]
+    return class_ids
+
+
+@bp.route("/student/add_teacher", methods=["POST"])
+@role_required("student")
+def add_teacher():
+    student_id = g.user.id
 
     code = request.form.get("code")
     if not code:
@@ -365,37 +931,84 @@ def add_teacher():
         flash("Invalid teacher code.")
         return redirect("/student/classes")
 
-    # Get all classes for this teacher, create one if none exists
-    classes = Class.query.filter_by(teacher_id=teacher.id).all()
-    if not classes:
-        # Create a default class for this teacher
-        default_class = Class(
-            name=f"{teacher.username}'s Class",
-            code=code,  # optional, can reuse teacher code
-            teacher_id=teacher.id
-        )
-        db.session.add(default_class)
-        db.session.commit()
-        classes = [default_class]
-
     # Enroll the student in all of the teacher's classes
-    for c in classes:
-        existing = ClassRegistration.query.filter_by(student_id=student_id, class_id=c.id).first()
-        if not existing:
-            db.session.add(ClassRegistration(student_id=student_id, class_id=c.id))
-
+    enroll(db.session, [student_id], get_or_create_teacher_classes(teacher))
     db.session.commit()
     flash(f"Successfully joined {teacher.username}'s class!")
     return redirect("/student/classes")
 
 
+@bp.route("/teacher/roster/import", methods=["POST"])
+@role_required("teacher")
+def import_roster():
+    """
+    Enroll a list of existing student accounts in the teacher's classes.
+
+    Accepts a CSV upload (form field "roster") with an "email" or "username"
+    column, or JSON of the form {"students": [...]}. An optional class_id
+    limits enrollment to one of the teacher's classes. Form uploads are
+    answered with a flashed summary, JSON requests with a JSON summary.
+    """
+    def respond(summary, status=200):
+        if request.is_json:
+            return jsonify(summary), status
+        if "error" in summary:
+            flash(summary["error"], "error")
+        else:
+            flash(
+                f"Enrolled {summary['enrolled']} new registrations for "
+                f"{summary['students']} students."
+                + (
+                    f" Not found: {', '.join(summary['not_found'])}"
+                    if summary["not_found"]
+                    else ""
+                )
+            )
+        return redirect("/teacher/students")
+
+    if request.is_json:
+        data = request.get_json(silent=True)
+        class_id = data.get("class_id") if isinstance(data, dict) else None
+    else:
+        upload = request.files.get("roster")
+        if not upload:
+            return respond({"error": "Choose a roster file to upload."}, 400)
+        data = upload.read(ROSTER_IMPORT_MAX_BYTES + 1)
+        if len(data) > ROSTER_IMPORT_MAX_BYTES:
+            return respond({"error": "The roster file is too large."}, 413)
+        data = data.decode("utf-8-sig", errors="replace")
+        class_id = request.form.get("class_id", type=int)
+
+    try:
+        identifiers = parse_roster(data, current_app.config["ROSTER_IMPORT_MAX_ROWS"])
+    except ValueError as e:
+        return respond({"error": str(e)}, 400)
+
+    class_ids = get_or_create_teacher_classes(g.user)
+    if class_id is not None:
+        if class_id not in class_ids:
+            return respond({"error": "That class does not belong to you."}, 404)
+        class_ids = [class_id]
+
+    student_ids, not_found = resolve_students(db.session, identifiers)
+    enrolled = enroll(db.session, student_ids, class_ids)
+    db.session.commit()
+
+    return respond(
+        {
+            "students": len(student_ids),
+            "classes": len(class_ids),
+            "enrolled": enrolled,
+            "not_found": not_found[:100],
+            "not_found_count": len(not_found),
+        }
+    )
+
 
-@app.route("/student/classes")
+@bp.route("/student/classes")
+@role_required("student")
 def student_classes():
-    student_id = session.get("user_id")
-    if not student_id:
-        flash("Please log in first.")
-        return redirect("/login")
+    student_id = g.user.id
 
     # Query all classes the student is enrolled in, joined with teacher info
     results = (
@@ -422,7 +1035,7 @@ def student_classes():
 
 
 #  Main Application Routes
-@app.route("/subjects")
+@bp.route("/subjects")
 def subject_selection():
     """New home page showing all available subjects."""
     try:
@@ -450,13 +1063,13 @@ def subject_selection():
             user_role=user_role  # <-- pass it here
         )
     except Exception as e:
-        app.logger.error(f"Error loading subject selection: {e}")
+        current_app.logger.error(f"Error loading subject selection: {e}")
         # Fallback to legacy index if there's an error
-        return redirect(url_for("python_subject_page"))
+        return redirect(url_for("main.python_subject_page"))
 
 
 
-@app.route("/subjects/<subject>")
+@bp.route("/subjects/<subject>")
 def subject_page(subject):
     """Display subtopics for a specific subject."""
     try:
@@ -465,37 +1078,17 @@ def subject_page(subject):
         subject_info = data_loader.load_subject_info(subject)
 
         if not subject_config or not subject_info:
-            app.logger.error(f"Subject data not found for: {subject}")
-            return redirect(url_for("subject_selection"))
-
-        subtopics = subject_config.get("subtopics", {})
-
-        # Calculate actual counts for each subtopic by checking the files
-        for subtopic_id, subtopic_data in subtopics.items():
-            try:
-                # Count quiz questions
-                quiz_data = get_quiz_data(subject, subtopic_id)
-                question_count = len(quiz_data) if quiz_data else 0
-
-                # Count lesson plans
-                lesson_plans = get_lesson_plans(subject, subtopic_id)
-                lesson_count = len(lesson_plans) if lesson_plans else 0
-
-                # Count videos
-                video_data = get_video_data(subject, subtopic_id)
-                video_count = len(video_data) if video_data else 0
-
-                # Update the counts with actual values
-                subtopic_data["question_count"] = question_count
-                subtopic_data["lesson_count"] = lesson_count
-                subtopic_data["video_count"] = video_count
-
-            except Exception as e:
-                app.logger.warning(
-                    f"Error calculating counts for {subject}/{subtopic_id}: {e}"
-                )
-                # Keep original counts if there's an error
-                pass
+            current_app.logger.error(f"Subject data not found for: {subject}")
+            return redirect(url_for("main.subject_selection"))
+
+        # Merge in precomputed content counts; copies keep the cached config intact
+        subtopic_stats = data_loader.get_subtopic_stats(subject)
+        subtopics = {
+            subtopic_id: {**subtopic_data, **subtopic_stats.get(subtopic_id, {})}
+            for subtopic_id, subtopic_data in subject_config.get(
+                "subtopics", {}
+            ).items()
+        }
 
         # Sort subtopics by order
         sorted_subtopics = dict(
@@ -509,22 +1102,22 @@ def subject_page(subject):
             subtopics=sorted_subtopics,
         )
     except Exception as e:
-        app.logger.error(f"Error loading subject page for {subject}: {e}")
-        return redirect(url_for("subject_selection"))
+        current_app.logger.error(f"Error loading subject page for {subject}: {e}")
+        return redirect(url_for("main.subject_selection"))
 
-@app.route("/legacy")
+@bp.route("/legacy")
 def legacy_index():
     """Legacy route - redirects to Python subject page."""
-    return redirect(url_for("subject_page", subject="python"))
+    return redirect(url_for("main.subject_page", subject="python"))
 
 
-@app.route("/python")
+@bp.route("/python")
 def python_subject_page():
     """Direct route to Python subject - for backward compatibility."""
-    return redirect(url_for("subject_page", subject="python"))
+    return redirect(url_for("main.subject_page", subject="python"))
 
 
-@app.route("/api/video/<topic_key>")
+@bp.route("/api/video/<topic_key>")
 def get_video_api_legacy(topic_key):
     """Legacy video API route for backward compatibility."""
     VIDEO_DATA = {
@@ -564,7 +1157,7 @@ def get_video_api_legacy(topic_key):
     return jsonify({"error": "Topic not found"}), 404
 
 
-@app.route("/api/video/<subject>/<subtopic>/<topic_key>")
+@bp.route("/api/video/<subject>/<subtopic>/<topic_key>")
 def get_video_api(subject, subtopic, topic_key):
     """Get video data for a specific subject/subtopic/topic."""
     video_data = get_video_data(subject, subtopic)
@@ -573,26 +1166,84 @@ def get_video_api(subject, subtopic, topic_key):
     return jsonify({"error": "Video not found"}), 404
 
 
-@app.route("/api/progress/update", methods=["POST"])
+def parse_progress_updates(raw) -> list:
+    """
+    Validate progress updates from the client.
+
+    Args:
+        raw: Dictionary mapping topic to progress percentage
+
+    Returns:
+        List of (topic, progress) tuples with progress clamped to 0-100, or
+        None if the updates are malformed
+    """
+    if not isinstance(raw, dict) or len(raw) > PROGRESS_MAX_BATCH:
+        return None
+    updates = []
+    for topic_key, progress in raw.items():
+        if not topic_key or len(topic_key) > PROGRESS_TOPIC_MAX_LENGTH:
+            return None
+        if isinstance(progress, bool) or not isinstance(progress, (int, float)):
+            return None
+        updates.append((topic_key, min(max(float(progress), 0.0), 100.0)))
+    return updates
+
+
+def save_progress_updates(updates: list) -> None:
+    """Record progress for the logged-in user, or in the session otherwise."""
+    user_id = session.get("user_id")
+    if user_id:
+        progress_store.update_many(user_id, updates)
+        return
+    user_progress = session.get("progress", {})
+    user_progress.update(updates)
+    session["progress"] = user_progress
+
+
+@bp.route("/api/progress/update", methods=["POST"])
 def update_progress_api():
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Missing data"}), 400
     topic_key = data.get("topic")
     progress = data.get("progress")
-    if not topic_key or progress is None:
+    if not isinstance(topic_key, str) or not topic_key or progress is None:
         return jsonify({"error": "Missing data"}), 400
-    user_progress = session.get("progress", {})
-    user_progress[topic_key] = progress
-    session["progress"] = user_progress
-    return jsonify({"success": True, "progress": user_progress})
+    updates = parse_progress_updates({topic_key: progress})
+    if updates is None:
+        return jsonify({"error": "Invalid progress"}), 400
+    save_progress_updates(updates)
+    return jsonify({"success": True, "progress": dict(updates)})
+
+
+@bp.route("/api/progress/batch", methods=["POST"])
+def update_progress_batch_api():
+    """
+    Record progress for several topics at once.
+
+    Expects {"updates": {topic: progress, ...}}. Also accepts bodies sent
+    with navigator.sendBeacon, which are not labelled as JSON.
+    """
+    data = request.get_json(force=True, silent=True)
+    updates = parse_progress_updates(
+        data.get("updates") if isinstance(data, dict) else None
+    )
+    if updates is None:
+        return jsonify({"error": "Invalid progress updates"}), 400
+    save_progress_updates(updates)
+    return jsonify({"success": True, "updated": len(updates)})
 
 
-@app.route("/api/progress")
+@bp.route("/api/progress")
 def get_all_progress_api():
+    user_id = session.get("user_id")
+    if user_id:
+        return jsonify(progress_store.get_all(user_id))
     user_progress = session.get("progress", {})
     return jsonify(user_progress)
 
 
-@app.route("/quiz/<subject>/<subtopic>")
+@bp.route("/quiz/<subject>/<subtopic>")
 def quiz_page(subject, subtopic):
     """Serves the initial quiz for any subject/subtopic."""
     # Validate that the subject/subtopic exists
@@ -612,10 +1263,14 @@ def quiz_page(subject, subtopic):
     if not quiz_questions:
         return f"Error: No quiz questions found for {subject}/{subtopic}.", 404
 
-    # Set session data with prefixed keys
-    session[get_session_key(subject, subtopic, "current_quiz_type")] = "initial"
-    session[get_session_key(subject, subtopic, "questions_served_for_analysis")] = (
-        quiz_questions
+    # Quiz state is kept server-side; only question ids are stored
+    set_quiz_state(
+        subject,
+        subtopic,
+        {
+            "current_quiz_type": "initial",
+            "questions_served_for_analysis": [question_id(q) for q in quiz_questions],
+        },
     )
     session["current_subject"] = subject
     session["current_subtopic"] = subtopic
@@ -629,13 +1284,13 @@ def quiz_page(subject, subtopic):
 
 
 # Legacy route for backward compatibility
-@app.route("/quiz/functions")
+@bp.route("/quiz/functions")
 def quiz_functions_page():
     """Legacy route - redirects to the new structure."""
-    return redirect(url_for("quiz_page", subject="python", subtopic="functions"))
+    return redirect(url_for("main.quiz_page", subject="python", subtopic="functions"))
 
 
-@app.route("/analyze", methods=["POST"])
+@bp.route("/analyze", methods=["POST"])
 def analyze_quiz():
     user_submitted_answers = request.json.get("answers", {})
 
@@ -644,7 +1299,7 @@ def analyze_quiz():
     current_subtopic = session.get("current_subtopic")
 
     if not current_subject or not current_subtopic:
-        app.logger.error("No current subject/subtopic found in session for analysis.")
+        current_app.logger.error("No current subject/subtopic found in session for analysis.")
         return (
             jsonify(
                 {"feedback": "Error: Quiz session data not found.", "weak_topics": []}
@@ -652,16 +1307,16 @@ def analyze_quiz():
             400,
         )
 
-    # Get questions that were served for analysis using prefixed session key
-    questions_for_analysis = session.get(
-        get_session_key(
-            current_subject, current_subtopic, "questions_served_for_analysis"
-        ),
-        [],
+    # Get questions that were served for analysis from the server-side quiz state
+    quiz_state = get_quiz_state(current_subject, current_subtopic)
+    questions_for_analysis = data_loader.resolve_question_ids(
+        current_subject,
+        current_subtopic,
+        quiz_state.get("questions_served_for_analysis", []),
     )
 
     if not questions_for_analysis:
-        app.logger.error("No questions found in session for analysis.")
+        current_app.logger.error("No questions found in session for analysis.")
         return (
             jsonify(
                 {"feedback": "Error: Quiz session data not found.", "weak_topics": []}
@@ -669,181 +1324,526 @@ def analyze_quiz():
             400,
         )
 
-    submission_details_list = []
-    correct_answers = 0
-    total_questions = len(questions_for_analysis)
-
-    for i, q_data in enumerate(questions_for_analysis):
-        user_answer = user_submitted_answers.get(f"q{i}", "[No answer provided]")
-        question_type = q_data.get(
-            "type", "multiple_choice"
-        )  # Default to multiple_choice for backward compatibility
-        status = "Incorrect"  # Default status
-
-        detail = (
-            f"Question {i+1} (Type: {question_type}): {q_data.get('question', 'N/A')}\n"
-        )
-        detail += f"Student's Answer:\n---\n{user_answer}\n---\n"
-
-        #  Grading Logic
-        if question_type == "multiple_choice":
-            correct_answer_index = q_data.get("answer_index")
-            options = q_data.get("options", [])
-            if 0 <= correct_answer_index < len(options):
-                correct_answer_text = options[correct_answer_index]
-                if user_answer == correct_answer_text:
-                    status = "Correct"
-                    correct_answers += 1
-                else:
-                    detail += f"Correct Answer: {correct_answer_text}\n"
-            else:
-                status = "Invalid Question Data"
-
-        elif question_type == "fill_in_the_blank":
-            correct_answer_text = q_data.get("correct_answer", "")
-            # Make comparison case-insensitive and trim whitespace
-            # Allow for multiple correct answers separated by commas
-            correct_answers_list = [
-                ans.strip().lower() for ans in correct_answer_text.split(",")
-            ]
-            user_answer_clean = user_answer.strip().lower()
-            if user_answer_clean in correct_answers_list:
-                status = "Correct"
-                correct_answers += 1
-            else:
-                detail += f"Correct Answer(s): {correct_answer_text}\n"
-
-        elif question_type == "coding":
-            # For coding questions, we don't grade automatically.
-            # We will let the AI review the code.
-            status = "For AI Review"
-            # Provide the sample solution for the AI's reference.
-            sample_solution = q_data.get("sample_solution", "")
-            if sample_solution:
-                detail += f"Sample Solution:\n---\n{sample_solution}\n---\n"
-
-        detail += f"Status: {status}\n\n"
-        submission_details_list.append(detail)
-
-    full_submission_text = "".join(submission_details_list)
-
-    #  system message to include code evaluation
-    system_message = (
-        "You are an expert instructor. Your task is to analyze a student's quiz performance, "
-        "classify their errors against a predefined list of topics, and evaluate their submitted code. "
-        "For 'coding' questions, determine if the student's code correctly solves the problem."
+    graded = grade_submission(
+        questions_for_analysis, user_submitted_answers, code_runner=code_runner
     )
+    correct_answers = count_correct(graded)
+    total_questions = len(graded)
 
     # Get allowed tags for the current subject
     allowed_topic_tags = get_subject_tags(current_subject)
-    allowed_tags_str = json.dumps(allowed_topic_tags)
-
-    prompt = (
-        "You are analyzing a student's quiz submission which includes multiple choice, fill-in-the-blank, and coding questions.\n"
-        "Based on the incorrect answers and their submitted code, identify the concepts they are weak in.\n"
-        f"You **MUST** choose the weak concepts from this predefined list ONLY: {allowed_tags_str}\n\n"
-        "For coding questions marked 'For AI Review', evaluate if the student's code:\n"
-        "1. Correctly solves the problem\n"
-        "2. Uses appropriate syntax and conventions\n"
-        "3. Demonstrates understanding of the underlying concepts\n"
-        "Compare their code with the provided sample solution.\n\n"
-        "Provide your analysis as a single JSON object with two keys:\n"
-        ' - "detailed_feedback": (string) Your textual analysis, including specific feedback on coding attempts, what they did well, and areas for improvement.\n'
-        ' - "weak_concept_tags": (JSON list of strings) The list of weak concepts from the ALLOWED TAGS list. If there are no weaknesses, provide an empty list `[]`.\n\n'
-        "Here is the student's submission:\n"
-        "--- START OF SUBMISSION ---\n"
-        f"{full_submission_text}"
-        "--- END OF SUBMISSION ---\n"
-    )
 
-    ai_response_content = call_openai_api(
-        prompt,
-        system_message,
-        model="gpt-4",
-        max_tokens=1500,  # Increased tokens for more detailed feedback
-        expect_json_output=True,
+    # Weak topics are attributed locally from the tags of missed questions
+    local_weak_topics = infer_weak_tags(graded, allowed_topic_tags, MASTERY_THRESHOLD)
+
+    record_quiz_attempt(
+        current_subject,
+        current_subtopic,
+        quiz_state.get("current_quiz_type", "initial"),
+        graded,
+        local_weak_topics,
+        score_tags(graded, allowed_topic_tags),
     )
 
-    if not ai_response_content:
-        return (
-            jsonify(
-                {
-                    "feedback": "Error: Could not get analysis from AI.",
-                    "weak_topics": [],
-                }
-            ),
-            500,
+    # The AI is only needed to review code, or when narrative feedback is
+    # configured; in "parallel" mode it only classifies missed answers, so a
+    # fully correct submission needs no request at all
+    narrative_feedback = current_app.config["AI_NARRATIVE_FEEDBACK"]
+    analysis_mode = current_app.config["AI_ANALYSIS_MODE"]
+    nothing_missed = analysis_mode == "parallel" and correct_answers == total_questions
+    if nothing_missed or (not needs_ai_review(graded) and not narrative_feedback):
+        return build_analysis_response(
+            current_subject,
+            current_subtopic,
+            build_local_feedback(graded, local_weak_topics),
+            local_weak_topics,
+            correct_answers,
+            total_questions,
+            analysis_source="local",
         )
 
-    json_match = re.search(r"\{[\s\S]*\}", ai_response_content)
-    if not json_match:
-        app.logger.error(
-            f"Could not find JSON in AI response.\nResponse was: {ai_response_content}"
+    system_message = ANALYSIS_SYSTEM_MESSAGE
+    prompt = build_analysis_prompt(graded, allowed_topic_tags)
+
+    # Identical graded submissions on the same content reuse a cached analysis
+    analysis_cache_key = AnalysisCache.make_key(
+        current_subject,
+        current_subtopic,
+        data_loader.get_content_version(current_subject),
+        graded,
+        ANALYSIS_MODEL if analysis_mode != "parallel" else f"{ANALYSIS_MODEL}/parallel",
+    )
+    cached_response = analysis_cache.get(analysis_cache_key)
+    if cached_response is not None:
+        try:
+            feedback, weak_topics = parse_ai_analysis(
+                cached_response, allowed_topic_tags, local_weak_topics
+            )
+            return build_analysis_response(
+                current_subject,
+                current_subtopic,
+                feedback,
+                weak_topics,
+                correct_answers,
+                total_questions,
+                analysis_source="cache",
+            )
+        except ValueError as e:
+            current_app.logger.warning(f"Ignoring unusable cached analysis: {e}")
+
+    local_feedback = build_local_feedback(graded, local_weak_topics)
+    if not ai_gateway.is_available():
+        # Fail fast with the local grading result while the AI API is unhealthy
+        current_app.logger.warning("AI circuit breaker is open, returning local analysis.")
+        return build_analysis_response(
+            current_subject,
+            current_subtopic,
+            local_feedback,
+            local_weak_topics,
+            correct_answers,
+            total_questions,
+            analysis_source="local",
         )
-        return (
-            jsonify(
+
+    # The locally graded result is returned right away; the AI analysis runs
+    # in the background and the results page polls for it
+    local_result = build_analysis_result(
+        local_feedback,
+        local_weak_topics,
+        correct_answers,
+        total_questions,
+        analysis_source="local",
+    )
+    sid = get_quiz_sid()
+    job_id = analysis_jobs.new_job_id()
+    update_quiz_state(
+        current_subject,
+        current_subtopic,
+        {"weak_topics": local_weak_topics, "analysis_job_id": job_id},
+    )
+
+    def review_in_parallel():
+        # Each finished review is shown as soon as it arrives; the merged
+        # result is cached like a single-prompt analysis
+        review = parallel_reviewer.review(
+            current_subject,
+            current_subtopic,
+            data_loader.get_content_version(current_subject),
+            ANALYSIS_MODEL,
+            graded,
+            allowed_topic_tags,
+            on_progress=lambda text: analysis_jobs.report_progress(
+                job_id, {"feedback": text}
+            ),
+        )
+        weak_topics = list(dict.fromkeys(local_weak_topics + review["weak_topics"]))
+        analysis_cache.set(
+            analysis_cache_key,
+            json.dumps(
                 {
-                    "feedback": "Error: The analysis response did not contain a valid JSON object.",
-                    "weak_topics": [],
+                    "detailed_feedback": review["feedback"],
+                    "weak_concept_tags": weak_topics,
                 }
             ),
-            500,
+            review["tokens"],
         )
-
-    try:
-        parsed_ai_response = json.loads(json_match.group(0))
-        feedback = parsed_ai_response.get(
-            "detailed_feedback", "No detailed feedback provided."
+        return review["feedback"], weak_topics
+
+    def analyze_with_ai():
+        if analysis_mode == "parallel":
+            return review_in_parallel()
+
+        # Stream the completion so the feedback text can be shown as it is
+        # generated; the weak topics are parsed once the JSON is complete
+        feedback_stream = JsonStringFieldStream("detailed_feedback")
+        chunks = []
+        streamed_feedback = ""
+        last_report = 0.0
+        for delta in call_openai_api_stream(
+            prompt,
+            system_message,
+            model=ANALYSIS_MODEL,
+            max_tokens=ANALYSIS_MAX_COMPLETION_TOKENS,
+            expect_json_output=True,
+        ):
+            chunks.append(delta)
+            new_text = feedback_stream.feed(delta)
+            if not new_text:
+                continue
+            streamed_feedback += new_text
+            now = time.monotonic()
+            if now - last_report >= current_app.config["AI_STREAM_REPORT_INTERVAL"] or feedback_stream.done:
+                analysis_jobs.report_progress(job_id, {"feedback": streamed_feedback})
+                last_report = now
+
+        ai_response_content = "".join(chunks).strip()
+        if not ai_response_content:
+            raise RuntimeError("Could not get analysis from AI.")
+
+        feedback, weak_topics = parse_ai_analysis(
+            ai_response_content, allowed_topic_tags, local_weak_topics
         )
-        weak_topics = parsed_ai_response.get("weak_concept_tags", [])
-        validated_weak_topics = [
-            topic for topic in weak_topics if topic in allowed_topic_tags
-        ]
+        analysis_cache.set(
+            analysis_cache_key,
+            ai_response_content,
+            estimate_tokens(system_message + prompt + ai_response_content),
+        )
+        return feedback, weak_topics
 
-        # Store weak topics with subject/subtopic prefix
-        session[get_session_key(current_subject, current_subtopic, "weak_topics")] = (
-            validated_weak_topics
+    def run_analysis():
+        # Identical submissions analyzed at the same time share one AI call;
+        # only the leader's job streams progress
+        feedback, weak_topics = ai_flight.do(
+            ("analysis", analysis_cache_key), analyze_with_ai
         )
-        app.logger.info(
-            f"AI identified weak topics for {current_subject}/{current_subtopic}: {validated_weak_topics}"
+        current_app.logger.info(
+            f"AI identified weak topics for {current_subject}/{current_subtopic}: {weak_topics}"
         )
-
-        # Calculate score percentage
-        score_percentage = (
-            round((correct_answers / total_questions) * 100)
-            if total_questions > 0
-            else 0
+        store_job_weak_topics(
+            sid, current_subject, current_subtopic, job_id, weak_topics
         )
+        return {
+            "feedback": feedback,
+            "weak_topics": weak_topics,
+            "analysis_source": "ai",
+        }
 
-        return jsonify(
+    try:
+        analysis_jobs.submit(run_analysis, local_result, owner=sid, job_id=job_id)
+    except QueueFullError as e:
+        current_app.logger.warning(f"AI analysis queue is full, returning local analysis: {e}")
+        return jsonify(local_result)
+
+    return (
+        jsonify(
             {
-                "feedback": feedback,
-                "weak_topics": validated_weak_topics,
-                "score": {
-                    "correct": correct_answers,
-                    "total": total_questions,
-                    "percentage": score_percentage,
-                },
+                **local_result,
+                "status": "pending",
+                "job_id": job_id,
+                "status_url": url_for("main.get_analysis_job", job_id=job_id),
+                **(
+                    {"events_url": url_for("main.stream_analysis_job", job_id=job_id)}
+                    if current_app.config["AI_STREAM_EVENTS"]
+                    else {}
+                ),
             }
+        ),
+        202,
+    )
+
+
+def record_quiz_attempt(
+    subject, subtopic, quiz_type, graded, weak_topics, tag_scores
+):
+    """
+    Queue a graded submission for the logged-in student's attempt history.
+
+    The attempt, one response row per question and the updates of the
+    student's subtopic and tag aggregates are handed to the batched attempt
+    writer together, so the request does not wait on the database and the
+    aggregates always match the recorded attempts.
+
+    Returns:
+        The new attempt's id, or None if no student is logged in
+    """
+    student_id = session.get("user_id")
+    if not student_id:
+        return None
+
+    attempt_id = secrets.token_hex(16)
+    submitted_at = datetime.utcnow()
+    correct = count_correct(graded)
+    score = 100.0 * correct / len(graded) if graded else 0.0
+    attempt_writer.add(
+        (
+            QuizAttempt.__table__,
+            [
+                {
+                    "id": attempt_id,
+                    "student_id": student_id,
+                    "subject": subject,
+                    "subtopic": subtopic,
+                    "quiz_type": quiz_type,
+                    "correct": correct,
+                    "total": len(graded),
+                    "weak_topics": weak_topics,
+                    "submitted_at": submitted_at,
+                }
+            ],
+        ),
+        (
+            QuestionResponse.__table__,
+            [
+                {
+                    "attempt_id": attempt_id,
+                    "question_index": result["index"],
+                    "question_id": question_id(result["question"]),
+                    "question_type": result["type"],
+                    "answer": str(result["answer"]),
+                    "status": result["status"],
+                    "is_correct": result["status"] == STATUS_CORRECT,
+                }
+                for result in graded
+            ],
+        ),
+        (
+            subtopic_progress_upsert,
+            [
+                {
+                    "student_id": student_id,
+                    "subject": subject,
+                    "subtopic": subtopic,
+                    "attempts": 1,
+                    "best_score": score,
+                    "last_score": score,
+                    "last_activity": submitted_at,
+                }
+            ],
+        ),
+        (
+            tag_mastery_upsert,
+            [
+                {
+                    "student_id": student_id,
+                    "subject": subject,
+                    "tag": tag,
+                    "answered": tag_score["total"],
+                    "missed": tag_score["missed"],
+                    "last_activity": submitted_at,
+                }
+                for tag, tag_score in tag_scores.items()
+            ],
+        ),
+    )
+    return attempt_id
+
+
+def build_analysis_prompt(graded, allowed_topic_tags):
+    """
+    Build the whole-submission analysis prompt within the prompt token budget.
+
+    The static instructions come first so that every request shares the same
+    prefix. Correct answers are only summarized, long answers are shortened
+    and questions beyond the budget are left out.
+    """
+    builder = PromptBuilder(
+        "analysis", current_app.config["AI_PROMPT_MAX_TOKENS"], system_message=ANALYSIS_SYSTEM_MESSAGE
+    )
+    builder.add(ANALYSIS_PROMPT_PREFIX)
+    builder.add(
+        "You **MUST** choose the weak concepts from this predefined list ONLY: "
+        f"{json.dumps(allowed_topic_tags)}\n\n",
+        part="tags",
+    )
+    builder.add(
+        "Here is the student's submission:\n--- START OF SUBMISSION ---\n"
+    )
+
+    items, correct_summary = format_submission_items(graded, current_app.config["AI_ANSWER_MAX_TOKENS"])
+    builder.add(correct_summary, part="submission")
+    submission_end = "--- END OF SUBMISSION ---\n"
+    omitted_note = "(Further answers were left out for length.)\n"
+    omitted = builder.add_fitting(
+        items,
+        part="submission",
+        reserve_tokens=estimate_tokens(omitted_note + submission_end),
+    )
+    if omitted:
+        builder.add(omitted_note, part="submission")
+    builder.add(submission_end)
+
+    builder.log_budget(ANALYSIS_MAX_COMPLETION_TOKENS)
+    return builder.build()
+
+
+def parse_ai_analysis(ai_response_content, allowed_topic_tags, local_weak_topics):
+    """
+    Extract feedback and weak topics from an AI analysis response.
+
+    Weak topics are restricted to the allowed tags, and locally attributed
+    topics are always kept since they are deterministic.
+
+    Returns:
+        Tuple of (feedback, weak_topics)
+
+    Raises:
+        ValueError: If the response does not contain a valid JSON object
+    """
+    json_match = re.search(r"\{[\s\S]*\}", ai_response_content)
+    if not json_match:
+        current_app.logger.error(
+            f"Could not find JSON in AI response.\nResponse was: {ai_response_content}"
         )
+        raise ValueError("The analysis response did not contain a valid JSON object.")
 
+    try:
+        parsed_ai_response = json.loads(json_match.group(0))
     except json.JSONDecodeError as e:
-        app.logger.error(
+        current_app.logger.error(
             f"Failed to parse extracted AI JSON response: {e}\nExtracted text was: {json_match.group(0)}"
         )
-        return (
-            jsonify(
-                {
-                    "feedback": "Error: The analysis response format was invalid.",
-                    "weak_topics": [],
-                }
-            ),
-            500,
+        raise ValueError("The analysis response format was invalid.")
+
+    feedback = parsed_ai_response.get(
+        "detailed_feedback", "No detailed feedback provided."
+    )
+    weak_topics = parsed_ai_response.get("weak_concept_tags", [])
+    validated_weak_topics = [
+        topic for topic in weak_topics if topic in allowed_topic_tags
+    ]
+    validated_weak_topics += [
+        topic for topic in local_weak_topics if topic not in validated_weak_topics
+    ]
+    return feedback, validated_weak_topics
+
+
+def build_analysis_result(
+    feedback, weak_topics, correct_answers, total_questions, analysis_source
+):
+    """Build the JSON body describing a finished analysis."""
+    # Calculate score percentage
+    score_percentage = (
+        round((correct_answers / total_questions) * 100) if total_questions > 0 else 0
+    )
+
+    return {
+        "status": "done",
+        "feedback": feedback,
+        "weak_topics": weak_topics,
+        "score": {
+            "correct": correct_answers,
+            "total": total_questions,
+            "percentage": score_percentage,
+        },
+        "analysis_source": analysis_source,
+    }
+
+
+def build_analysis_response(
+    subject,
+    subtopic,
+    feedback,
+    weak_topics,
+    correct_answers,
+    total_questions,
+    analysis_source,
+):
+    """Store weak topics in the quiz state and build the /analyze JSON response."""
+    update_quiz_state(
+        subject, subtopic, {"weak_topics": weak_topics, "analysis_job_id": None}
+    )
+    return jsonify(
+        build_analysis_result(
+            feedback, weak_topics, correct_answers, total_questions, analysis_source
         )
+    )
 
 
-@app.route("/api/recommend_videos", methods=["GET"])
+def store_job_weak_topics(sid, subject, subtopic, job_id, weak_topics):
+    """Record a background analysis's weak topics unless a newer quiz replaced it."""
+    scope = f"{subject}/{subtopic}"
+    state = quiz_sessions.get(sid, scope) or {}
+    if state.get("analysis_job_id") != job_id:
+        return
+    state["weak_topics"] = weak_topics
+    quiz_sessions.set(sid, scope, state)
+
+
+def build_job_response(job):
+    """
+    Build the JSON body for an analysis job: the local result, then the AI's.
+
+    While the job runs, "partial_feedback" carries the feedback text the AI
+    has generated so far, so polling clients can render it incrementally.
+    """
+    response = {**job["payload"], "job_id": job["job_id"], "status": job["status"]}
+    progress = job["progress"] or {}
+    if job["status"] not in FINISHED_STATUSES and progress.get("feedback"):
+        response["partial_feedback"] = progress["feedback"]
+    if job["result"]:
+        response.update(job["result"])
+    if job["error"]:
+        response["analysis_error"] = job["error"]
+    return response
+
+
+@bp.route("/api/analysis/<job_id>")
+def get_analysis_job(job_id):
+    """Return the status of a background AI analysis, with its result once done."""
+    job = analysis_jobs.get(job_id)
+    if not job or job["owner"] != session.get("quiz_sid"):
+        return jsonify({"error": "Analysis job not found"}), 404
+    return jsonify(build_job_response(job))
+
+
+@bp.route("/api/analysis/<job_id>/events")
+def stream_analysis_job(job_id):
+    """
+    Stream a background AI analysis as Server-Sent Events.
+
+    Emits a "delta" event for each new piece of feedback text while the AI
+    is generating it, and an event named after each status change; the
+    final "done" or "failed" event carries the full result. Only served when
+    AI_STREAM_EVENTS is set; clients poll get_analysis_job otherwise.
+    """
+    if not current_app.config["AI_STREAM_EVENTS"]:
+        return jsonify({"error": "Event streams are disabled"}), 404
+
+    job = analysis_jobs.get(job_id)
+    if not job or job["owner"] != session.get("quiz_sid"):
+        return jsonify({"error": "Analysis job not found"}), 404
+
+    def generate(job):
+        last_status = None
+        sent_feedback = 0
+        last_sent = time.monotonic()
+        deadline = last_sent + analysis_jobs.job_timeout
+        while job is not None:
+            if job["status"] != last_status:
+                last_status = job["status"]
+                last_sent = time.monotonic()
+                yield format_sse_event(last_status, build_job_response(job))
+            if last_status in FINISHED_STATUSES or time.monotonic() > deadline:
+                return
+
+            feedback = (job["progress"] or {}).get("feedback", "")
+            if len(feedback) > sent_feedback:
+                last_sent = time.monotonic()
+                yield format_sse_event("delta", {"text": feedback[sent_feedback:]})
+                sent_feedback = len(feedback)
+            elif time.monotonic() - last_sent > 15:
+                # Comment line keeps proxies from closing an idle stream
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+
+            # Jobs in this process wake the stream at once; the timeout
+            # picks up jobs running in other worker processes
+            analysis_jobs.wait(timeout=0.25)
+            job = analysis_jobs.get(job_id)
+
+    # The stream outlives the view; keep its context for the service proxies
+    return Response(
+        stream_with_context(generate(job)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def format_sse_event(event, data):
+    """Format one Server-Sent Event with a JSON data payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@bp.route("/api/recommend_videos", methods=["GET"])
 def recommend_videos_api():
+    """
+    Recommend videos for weak topics from the local TF-IDF video index.
+
+    Query parameters:
+        topics: Comma-separated weak topics (required)
+        subject: Only recommend videos of this subject (optional)
+        limit: Maximum number of videos to return (default 5)
+    """
     weak_topics_str = request.args.get("topics", "")
 
     if not weak_topics_str:
@@ -856,140 +1856,33 @@ def recommend_videos_api():
         topic.strip().lower() for topic in weak_topics_str.split(",") if topic.strip()
     ]
     if not weak_topics_list:
-        app.logger.info("Empty list of weak topics received for video recommendation.")
+        current_app.logger.info("Empty list of weak topics received for video recommendation.")
         return jsonify({"recommended_video_keys": []})
 
-    # Use the legacy VIDEO_DATA structure for compatibility
-    VIDEO_DATA = {
-        "loops": {
-            "title": "Python Loops: For and While",
-            "url": "https://www.youtube.com/watch?v=94UHCEmprCY",
-            "description": "Learn how to automate repetitive tasks using for and while loops, understand iterables, and control flow statements.",
-        },
-        "functions": {
-            "title": "Python Functions Masterclass",
-            "url": "https://www.youtube.com/embed/94UHCEmprCY?enablejsapi=1",
-            "description": "Master Python functions, parameters, return values, and scope. Learn how to write reusable code blocks.",
-        },
-        "arrays": {
-            "title": "Understanding NumPy Arrays",
-            "url": "#",
-            "description": "Discover how to use NumPy arrays for efficient numerical computations and data processing in Python.",
-        },
-        "lists": {
-            "title": "Python Lists and List Comprehensions",
-            "url": "#",
-            "description": "Understand Python's built-in list data structure, methods, and operations for storing collections of items.",
-        },
-        "sets": {
-            "title": "Working with Python Sets",
-            "url": "#",
-            "description": "Learn about Python's unordered collection of unique elements and set operations like union and intersection.",
-        },
-        "dictionaries": {
-            "title": "Python Dictionaries and Dictionary Comprehensions",
-            "url": "#",
-            "description": "Explore key-value mappings in Python dictionaries, methods for accessing, modifying, and iterating through data.",
-        },
-    }
-
-    video_data_for_prompt = ""
-    for key, video_info in VIDEO_DATA.items():
-        video_data_for_prompt += f"Video Key: \"{key}\"\nTitle: \"{video_info['title']}\"\nDescription: \"{video_info['description']}\"\n\n"
-
-    system_message = "You assist by recommending relevant educational video keys based on topic keywords and video descriptions. Output only a JSON list of video keys."
-    prompt = (
-        "Based on the following list of weak programming concepts a student has, "
-        "and the provided list of available video materials (with their keys, titles, and descriptions), "
-        "identify which video *keys* are most relevant for the student to review. "
-        "Focus solely on matching the weak concepts to the video descriptions.\n\n"
-        f"Weak Concepts:\n{', '.join(weak_topics_list)}\n\n"
-        "Available Video Materials:\n"
-        f"{video_data_for_prompt}\n"
-        'Return your answer ONLY as a JSON formatted list of unique Video Keys. For example: ["key1", "key2"]. '
-        "If no videos seem relevant for a particular concept, do not force a recommendation. "
-        "If multiple videos seem relevant for the same concept, you can include all of them."
-    )
-
-    ai_response_content = call_openai_api(
-        prompt,
-        system_message,
-        model="gpt-3.5-turbo",
-        max_tokens=250,
-        expect_json_output=True,
+    limit = min(max(request.args.get("limit", 5, type=int), 1), 50)
+    recommendations = data_loader.get_video_recommender().recommend(
+        weak_topics_list, limit=limit, subject=request.args.get("subject") or None
     )
+    recommended_keys = list(dict.fromkeys(video["key"] for video in recommendations))
 
-    recommended_keys = None
-    if ai_response_content:
-        try:
-            parsed_data = json.loads(ai_response_content)
-            if isinstance(parsed_data, list):
-                recommended_keys = parsed_data
-            elif isinstance(parsed_data, dict):  # Handle if AI wraps in an object
-                for key_in_dict in ["recommended_video_keys", "video_keys", "keys"]:
-                    if isinstance(parsed_data.get(key_in_dict), list):
-                        recommended_keys = parsed_data[key_in_dict]
-                        break
-            if (
-                recommended_keys is None
-            ):  # If direct parsing and common dict keys failed
-                recommended_keys = parse_ai_json_from_text(
-                    ai_response_content, expected_type_is_list=True
-                )
-        except json.JSONDecodeError:
-            recommended_keys = parse_ai_json_from_text(
-                ai_response_content, expected_type_is_list=True
-            )
-
-        if recommended_keys is not None and isinstance(recommended_keys, list):
-            valid_recommended_keys = sorted(
-                list(
-                    set(
-                        key
-                        for key in recommended_keys
-                        if key in VIDEO_DATA and isinstance(key, str)
-                    )
-                )
-            )
-
-            # Get current subject/subtopic from session for storage key
-            current_subject = session.get("current_subject", "python")
-            current_subtopic = session.get("current_subtopic", "functions")
-            session[
-                get_session_key(
-                    current_subject,
-                    current_subtopic,
-                    "recommended_videos_for_weak_topics",
-                )
-            ] = valid_recommended_keys
-
-            return jsonify({"recommended_video_keys": valid_recommended_keys})
-        else:
-            app.logger.error(
-                f"Could not parse valid JSON list of video keys from AI (recommend_videos). Raw AI response: {ai_response_content}"
-            )
-
-    # Store empty result with prefix
+    # Get current subject/subtopic from session for storage key
     current_subject = session.get("current_subject", "python")
     current_subtopic = session.get("current_subtopic", "functions")
     session[
         get_session_key(
             current_subject, current_subtopic, "recommended_videos_for_weak_topics"
         )
-    ] = []
+    ] = recommended_keys
 
-    return (
-        jsonify(
-            {
-                "error": "AI did not return valid video recommendations",
-                "details": ai_response_content or "No response from AI",
-            }
-        ),
-        500,
+    return jsonify(
+        {
+            "recommended_video_keys": recommended_keys,
+            "recommended_videos": recommendations,
+        }
     )
 
 
-@app.route("/generate_remedial_quiz", methods=["GET"])
+@bp.route("/generate_remedial_quiz", methods=["GET"])
 def generate_remedial_quiz():
     """
     Selects questions from the human-made question pool based on the
@@ -1000,119 +1893,96 @@ def generate_remedial_quiz():
     current_subtopic = session.get("current_subtopic")
 
     if not current_subject or not current_subtopic:
-        app.logger.error(
+        current_app.logger.error(
             "No current subject/subtopic found in session for remedial quiz generation."
         )
         session["quiz_generation_error"] = (
             "Session error: Please take the main quiz first."
         )
-        return redirect(url_for("show_results_page"))
+        return redirect(url_for("main.show_results_page"))
 
-    # Get weak topics with subject/subtopic prefix
-    weak_topics = session.get(
-        get_session_key(current_subject, current_subtopic, "weak_topics"), []
+    # Weak topics are stored in the quiz state by /analyze or its background job
+    weak_topics = get_quiz_state(current_subject, current_subtopic).get(
+        "weak_topics", []
     )
 
     if not weak_topics:
-        app.logger.info(
+        current_app.logger.info(
             f"No weak topics in session for {current_subject}/{current_subtopic}; cannot generate remedial quiz."
         )
         session["quiz_generation_error"] = (
             "You've mastered all identified topics! No remedial quiz needed."
         )
-        return redirect(url_for("show_results_page"))
+        return redirect(url_for("main.show_results_page"))
 
-    # Get question pool for current subject/subtopic
-    question_pool = get_question_pool(current_subject, current_subtopic)
-
-    # Select questions from the pool that match the weak topics
-    remedial_questions = []
-    selected_questions_set = set()  # To avoid duplicate questions
-
-    app.logger.info(
+    current_app.logger.info(
         f"Filtering question pool for weak topics in {current_subject}/{current_subtopic}: {weak_topics}"
     )
 
-    for question in question_pool:
-        # Check if any of the question's tags are in the user's weak topics
-        question_tags = set(question.get("tags", []))
-        if not question_tags.isdisjoint(weak_topics):
-            # Use the question's text as a unique identifier to avoid duplicates
-            if question["question"] not in selected_questions_set:
-                remedial_questions.append(question)
-                selected_questions_set.add(question["question"])
+    # Select pool questions tagged with any weak topic (deduplicated by text)
+    remedial_questions = data_loader.find_questions_by_tags(
+        current_subject, current_subtopic, weak_topics
+    )
 
     if not remedial_questions:
-        app.logger.warning(
+        current_app.logger.warning(
             f"No questions found in question pool for topics: {weak_topics} in {current_subject}/{current_subtopic}"
         )
         session["quiz_generation_error"] = (
             "We couldn't find specific follow-up questions for your weak topics. Please review the materials and try the main quiz again."
         )
-        return redirect(url_for("show_results_page"))
+        return redirect(url_for("main.show_results_page"))
 
-    # Store the selected questions with subject/subtopic prefixes
-    session[
-        get_session_key(
-            current_subject, current_subtopic, "current_remedial_quiz_questions"
-        )
-    ] = remedial_questions
-    session[
-        get_session_key(
-            current_subject, current_subtopic, "questions_served_for_analysis"
-        )
-    ] = remedial_questions
-    session[get_session_key(current_subject, current_subtopic, "current_quiz_type")] = (
-        "remedial"
+    # Store the selected question ids in the server-side quiz state
+    remedial_question_ids = [question_id(q) for q in remedial_questions]
+    update_quiz_state(
+        current_subject,
+        current_subtopic,
+        {
+            "current_remedial_quiz_questions": remedial_question_ids,
+            "questions_served_for_analysis": remedial_question_ids,
+            "current_quiz_type": "remedial",
+            "topics_for_current_remedial_quiz": weak_topics,
+        },
     )
-    session[
-        get_session_key(
-            current_subject, current_subtopic, "topics_for_current_remedial_quiz"
-        )
-    ] = weak_topics
 
-    app.logger.info(
+    current_app.logger.info(
         f"Selected {len(remedial_questions)} questions for the remedial quiz in {current_subject}/{current_subtopic}."
     )
 
-    return redirect(url_for("take_remedial_quiz_page"))
+    return redirect(url_for("main.take_remedial_quiz_page"))
 
 
-@app.route("/take_remedial_quiz")
+@bp.route("/take_remedial_quiz")
 def take_remedial_quiz_page():
     # Get current subject/subtopic from session
     current_subject = session.get("current_subject")
     current_subtopic = session.get("current_subtopic")
 
     if not current_subject or not current_subtopic:
-        app.logger.info("No current subject/subtopic in session for remedial quiz.")
+        current_app.logger.info("No current subject/subtopic in session for remedial quiz.")
         session["quiz_generation_error"] = (
             "Session error: Please take the main quiz first."
         )
-        return redirect(url_for("show_results_page"))
+        return redirect(url_for("main.show_results_page"))
 
-    # Get remedial questions with subject/subtopic prefix
-    remedial_questions = session.get(
-        get_session_key(
-            current_subject, current_subtopic, "current_remedial_quiz_questions"
-        ),
-        [],
+    # Get remedial questions from the server-side quiz state
+    remedial_questions = get_served_questions(
+        current_subject, current_subtopic, "current_remedial_quiz_questions"
     )
 
     if not remedial_questions:
-        app.logger.info(
+        current_app.logger.info(
             f"No remedial quiz in session for {current_subject}/{current_subtopic}, redirecting to results with error."
         )
         session["quiz_generation_error"] = (
             "No remedial quiz was available to take. Perhaps try again or review more."
         )
-        return redirect(url_for("show_results_page"))
+        return redirect(url_for("main.show_results_page"))
 
     quiz_title = "Remedial Quiz"
-    targeted_topics = session.get(
-        get_session_key(
-            current_subject, current_subtopic, "topics_for_current_remedial_quiz"
-        )
+    targeted_topics = get_quiz_state(current_subject, current_subtopic).get(
+        "topics_for_current_remedial_quiz"
     )
     if targeted_topics:
         quiz_title += " (Focusing on: " + ", ".join(targeted_topics) + ")"
@@ -1125,7 +1995,7 @@ def take_remedial_quiz_page():
     )
 
 
-@app.route("/results")
+@bp.route("/results")
 def show_results_page():
     quiz_gen_error = session.pop("quiz_generation_error", None)
 
@@ -1135,8 +2005,8 @@ def show_results_page():
 
     # If no session context, redirect to subject selection
     if not current_subject or not current_subtopic:
-        app.logger.warning("No subject/subtopic context in session for results page")
-        return redirect(url_for("subject_selection"))
+        current_app.logger.warning("No subject/subtopic context in session for results page")
+        return redirect(url_for("main.subject_selection"))
 
     # Load video data using the new system
     try:
@@ -1165,7 +2035,7 @@ def show_results_page():
                 },
             }
     except Exception as e:
-        app.logger.error(f"Error loading video data for results page: {e}")
+        current_app.logger.error(f"Error loading video data for results page: {e}")
         VIDEO_DATA = {}
 
     # Try to get lesson plans from the new system
@@ -1181,14 +2051,16 @@ def show_results_page():
         LESSON_PLANS=lesson_plans,
         current_subject=current_subject,
         current_subtopic=current_subtopic,
+        stream_events=current_app.config["AI_STREAM_EVENTS"],
     )
 
 
 #  ADMIN PANEL ROUTES
 
 
-@app.route("/admin")
-@app.route("/admin/")
+@bp.route("/admin")
+@bp.route("/admin/")
+@role_required("teacher")
 def admin_dashboard():
     """Admin dashboard overview."""
     try:
@@ -1203,16 +2075,14 @@ def admin_dashboard():
 
         for subject_id in subjects.keys():
             try:
-                subject_config = data_loader.load_subject_config(subject_id)
-                if subject_config and "subtopics" in subject_config:
-                    subtopics = subject_config["subtopics"]
-                    total_subtopics += len(subtopics)
-
-                    for subtopic_id, subtopic_data in subtopics.items():
-                        total_lessons += subtopic_data.get("lesson_count", 0)
-                        total_questions += subtopic_data.get("question_count", 0)
+                subtopic_stats = data_loader.get_subtopic_stats(subject_id)
+                total_subtopics += len(subtopic_stats)
+
+                for stats in subtopic_stats.values():
+                    total_lessons += stats["lesson_count"]
+                    total_questions += stats["question_count"]
             except Exception as e:
-                app.logger.error(f"Error loading stats for subject {subject_id}: {e}")
+                current_app.logger.error(f"Error loading stats for subject {subject_id}: {e}")
 
         stats = {
             "total_subjects": total_subjects,
@@ -1223,11 +2093,12 @@ def admin_dashboard():
 
         return render_template("admin/dashboard.html", subjects=subjects, stats=stats)
     except Exception as e:
-        app.logger.error(f"Error loading admin dashboard: {e}")
+        current_app.logger.error(f"Error loading admin dashboard: {e}")
         return f"Error loading admin dashboard: {e}", 500
 
 
-@app.route("/admin/subjects")
+@bp.route("/admin/subjects")
+@role_required("teacher")
 def admin_subjects():
     """Manage subjects."""
     try:
@@ -1235,11 +2106,12 @@ def admin_subjects():
         subjects = data_loader.discover_subjects()
         return render_template("admin/subjects.html", subjects=subjects)
     except Exception as e:
-        app.logger.error(f"Error loading subjects admin: {e}")
+        current_app.logger.error(f"Error loading subjects admin: {e}")
         return f"Error loading subjects: {e}", 500
 
 
-@app.route("/admin/subjects/create", methods=["GET", "POST"])
+@bp.route("/admin/subjects/create", methods=["GET", "POST"])
+@role_required("teacher")
 def admin_create_subject():
     """Create a new subject."""
     if request.method == "POST":
@@ -1255,7 +2127,7 @@ def admin_create_subject():
                 return jsonify({"error": "Subject ID and name are required"}), 400
 
             # Check if subject already exists by checking if directory exists
-            subject_dir = os.path.join(DATA_ROOT_PATH, "subjects", subject_id)
+            subject_dir = os.path.join(current_app.config["DATA_ROOT_PATH"], "subjects", subject_id)
             if os.path.exists(subject_dir):
                 return jsonify({"error": "Subject already exists"}), 400
 
@@ -1292,19 +2164,20 @@ def admin_create_subject():
             with open(config_path, "w", encoding="utf-8") as f:
                 json.dump(subject_config, f, indent=2)
 
-            # Clear cache to refresh subject list
-            data_loader.clear_cache()
+            # Add the new subject to the manifest
+            data_loader.notify_content_changed(subject_id)
 
             return jsonify({"success": True, "message": "Subject created successfully"})
 
         except Exception as e:
-            app.logger.error(f"Error creating subject: {e}")
+            current_app.logger.error(f"Error creating subject: {e}")
             return jsonify({"error": str(e)}), 500
 
     return render_template("admin/create_subject.html")
 
 
-@app.route("/admin/subjects/<subject>/edit")
+@bp.route("/admin/subjects/<subject>/edit")
+@role_required("teacher")
 def admin_edit_subject(subject):
     """Edit a subject."""
     try:
@@ -1325,11 +2198,12 @@ def admin_edit_subject(subject):
             "admin/edit_subject.html", subject=subject, config=config
         )
     except Exception as e:
-        app.logger.error(f"Error loading subject editor for {subject}: {e}")
+        current_app.logger.error(f"Error loading subject editor for {subject}: {e}")
         return f"Error: {e}", 500
 
 
-@app.route("/admin/subjects/<subject>/<subtopic>")
+@bp.route("/admin/subjects/<subject>/<subtopic>")
+@role_required("teacher")
 def admin_edit_subtopic(subject, subtopic):
     """Edit a subtopic."""
     try:
@@ -1354,32 +2228,31 @@ def admin_edit_subtopic(subject, subtopic):
             videos=videos,
         )
     except Exception as e:
-        app.logger.error(f"Error loading subtopic editor for {subject}/{subtopic}: {e}")
+        current_app.logger.error(f"Error loading subtopic editor for {subject}/{subtopic}: {e}")
         return f"Error: {e}", 500
 
 
-@app.route("/admin/subjects/<subject>/delete", methods=["DELETE"])
+@bp.route("/admin/subjects/<subject>/delete", methods=["DELETE"])
+@role_required("teacher")
 def admin_delete_subject(subject):
     """Delete a subject and all its associated data."""
     try:
         # Check if subject exists by checking directory
-        subject_dir = os.path.join(DATA_ROOT_PATH, "subjects", subject)
+        subject_dir = os.path.join(current_app.config["DATA_ROOT_PATH"], "subjects", subject)
         if not os.path.exists(subject_dir):
             return jsonify({"error": "Subject not found"}), 404
 
         # Remove subject directory and all its contents
         shutil.rmtree(subject_dir)
-        app.logger.info(f"Removed subject directory: {subject_dir}")
-
-        # Clear cache to refresh subject list
-        data_loader.clear_cache()
+        current_app.logger.info(f"Removed subject directory: {subject_dir}")
+        data_loader.notify_subject_removed(subject)
 
         return jsonify(
             {"success": True, "message": f"Subject '{subject}' deleted successfully"}
         )
 
     except Exception as e:
-        app.logger.error(f"Error deleting subject {subject}: {e}")
+        current_app.logger.error(f"Error deleting subject {subject}: {e}")
         return jsonify({"error": str(e)}), 500
 
 
@@ -1388,7 +2261,8 @@ def admin_delete_subject(subject):
 # ============================================================================
 
 
-@app.route("/admin/toggle-override", methods=["GET", "POST"])
+@bp.route("/admin/toggle-override", methods=["GET", "POST"])
+@role_required("teacher")
 def admin_toggle_override():
     """Toggle or check admin override status for debugging/testing."""
     try:
@@ -1404,14 +2278,14 @@ def admin_toggle_override():
             session["admin_override"] = new_status
 
             message = f"Admin override {'enabled' if new_status else 'disabled'}"
-            app.logger.info(f"Admin override toggled: {message}")
+            current_app.logger.info(f"Admin override toggled: {message}")
 
             return jsonify(
                 {"success": True, "admin_override": new_status, "message": message}
             )
 
     except Exception as e:
-        app.logger.error(f"Error in admin override toggle: {e}")
+        current_app.logger.error(f"Error in admin override toggle: {e}")
         return jsonify({"error": str(e)}), 500
 
 
@@ -1429,7 +2303,7 @@ def get_all_lessons():
         subjects = data_loader.discover_subjects()
 
         for subject_id, subject_info in subjects.items():
-            subject_dir = os.path.join(DATA_ROOT_PATH, "subjects", subject_id)
+            subject_dir = os.path.join(current_app.config["DATA_ROOT_PATH"], "subjects", subject_id)
             if not os.path.exists(subject_dir):
                 continue
 
@@ -1461,7 +2335,7 @@ def get_all_lessons():
                                 }
                             )
     except Exception as e:
-        app.logger.error(f"Error getting all lessons: {e}")
+        current_app.logger.error(f"Error getting all lessons: {e}")
 
     return lessons_data
 
@@ -1469,7 +2343,7 @@ def get_all_lessons():
 def save_lesson_to_file(subject, subtopic, lesson_id, lesson_data):
     """Save a lesson to the lesson_plans.json file."""
     lesson_plans_path = os.path.join(
-        DATA_ROOT_PATH, "subjects", subject, subtopic, "lesson_plans.json"
+        current_app.config["DATA_ROOT_PATH"], "subjects", subject, subtopic, "lesson_plans.json"
     )
 
     try:
@@ -1487,16 +2361,17 @@ def save_lesson_to_file(subject, subtopic, lesson_id, lesson_data):
         with open(lesson_plans_path, "w", encoding="utf-8") as f:
             json.dump(lesson_plans, f, indent=2)
 
+        data_loader.notify_content_changed(subject, subtopic)
         return True
     except Exception as e:
-        app.logger.error(f"Error saving lesson {lesson_id}: {e}")
+        current_app.logger.error(f"Error saving lesson {lesson_id}: {e}")
         return False
 
 
 def delete_lesson_from_file(subject, subtopic, lesson_id):
     """Delete a lesson from the lesson_plans.json file."""
     lesson_plans_path = os.path.join(
-        DATA_ROOT_PATH, "subjects", subject, subtopic, "lesson_plans.json"
+        current_app.config["DATA_ROOT_PATH"], "subjects", subject, subtopic, "lesson_plans.json"
     )
 
     try:
@@ -1512,14 +2387,16 @@ def delete_lesson_from_file(subject, subtopic, lesson_id):
             with open(lesson_plans_path, "w", encoding="utf-8") as f:
                 json.dump(lesson_plans, f, indent=2)
 
+            data_loader.notify_content_changed(subject, subtopic)
             return True
         return False
     except Exception as e:
-        app.logger.error(f"Error deleting lesson {lesson_id}: {e}")
+        current_app.logger.error(f"Error deleting lesson {lesson_id}: {e}")
         return False
 
 
-@app.route("/admin/lessons")
+@bp.route("/admin/lessons")
+@role_required("teacher")
 def admin_lessons():
     """List all lessons across all subjects."""
     lessons = get_all_lessons()
@@ -1530,7 +2407,8 @@ def admin_lessons():
     return render_template("admin/lessons.html", lessons=lessons, subjects=subjects)
 
 
-@app.route("/admin/lessons/create", methods=["GET", "POST"])
+@bp.route("/admin/lessons/create", methods=["GET", "POST"])
+@role_required("teacher")
 def admin_create_lesson():
     """Create a new lesson."""
     if request.method == "POST":
@@ -1588,7 +2466,7 @@ def admin_create_lesson():
                 return jsonify({"error": "Failed to save lesson"}), 500
 
         except Exception as e:
-            app.logger.error(f"Error creating lesson: {e}")
+            current_app.logger.error(f"Error creating lesson: {e}")
             return jsonify({"error": str(e)}), 500
 
     # GET request - show form
@@ -1597,13 +2475,14 @@ def admin_create_lesson():
         subjects = data_loader.discover_subjects()
         return render_template("admin/create_lesson.html", subjects=subjects)
     except Exception as e:
-        app.logger.error(f"Error loading lesson creation form: {e}")
+        current_app.logger.error(f"Error loading lesson creation form: {e}")
         return f"Error: {e}", 500
 
 
-@app.route(
+@bp.route(
     "/admin/lessons/<subject>/<subtopic>/<lesson_id>/edit", methods=["GET", "POST"]
 )
+@role_required("teacher")
 def admin_edit_lesson(subject, subtopic, lesson_id):
     """Edit an existing lesson."""
     if request.method == "POST":
@@ -1635,7 +2514,7 @@ def admin_edit_lesson(subject, subtopic, lesson_id):
                 return jsonify({"error": "Failed to update lesson"}), 500
 
         except Exception as e:
-            app.logger.error(f"Error updating lesson: {e}")
+            current_app.logger.error(f"Error updating lesson: {e}")
             return jsonify({"error": str(e)}), 500
 
     # GET request - show edit form
@@ -1667,11 +2546,12 @@ def admin_edit_lesson(subject, subtopic, lesson_id):
             subject_subtopics=subject_subtopics,
         )
     except Exception as e:
-        app.logger.error(f"Error loading lesson editor: {e}")
+        current_app.logger.error(f"Error loading lesson editor: {e}")
         return f"Error: {e}", 500
 
 
-@app.route("/admin/lessons/<subject>/<subtopic>/<lesson_id>/delete", methods=["DELETE"])
+@bp.route("/admin/lessons/<subject>/<subtopic>/<lesson_id>/delete", methods=["DELETE"])
+@role_required("teacher")
 def admin_delete_lesson(subject, subtopic, lesson_id):
     """Delete a lesson."""
     try:
@@ -1681,11 +2561,12 @@ def admin_delete_lesson(subject, subtopic, lesson_id):
             return jsonify({"error": "Lesson not found or could not be deleted"}), 404
 
     except Exception as e:
-        app.logger.error(f"Error deleting lesson: {e}")
+        current_app.logger.error(f"Error deleting lesson: {e}")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/admin/subtopics")
+@bp.route("/admin/subtopics")
+@role_required("teacher")
 def admin_subtopics():
     """Manage subtopics across all subjects."""
     try:
@@ -1693,42 +2574,22 @@ def admin_subtopics():
         subjects = data_loader.discover_subjects()
 
         # Enhance subjects data with subtopic information from subject_config.json
-        for subject_id, subject_info in subjects.items():
-            subject_dir = os.path.join(DATA_ROOT_PATH, "subjects", subject_id)
-            subject_config_path = os.path.join(subject_dir, "subject_config.json")
-
-            if os.path.exists(subject_config_path):
-                try:
-                    with open(subject_config_path, "r", encoding="utf-8") as f:
-                        config = json.load(f)
-
-                    # Get subtopics from subject_config.json
-                    config_subtopics = config.get("subtopics", {})
-                    allowed_tags = config.get(
-                        "allowed_tags", config.get("allowed_keywords", [])
-                    )
-
-                    subjects[subject_id]["subtopics"] = config_subtopics
-                    subjects[subject_id]["allowed_tags"] = allowed_tags
-
-                except Exception as e:
-                    app.logger.error(
-                        f"Error reading subject config for {subject_id}: {e}"
-                    )
-                    subjects[subject_id]["subtopics"] = {}
-                    subjects[subject_id]["allowed_tags"] = []
-            else:
-                subjects[subject_id]["subtopics"] = {}
-                subjects[subject_id]["allowed_tags"] = []
+        for subject_id in subjects:
+            config = data_loader.load_subject_config(subject_id) or {}
+            subjects[subject_id]["subtopics"] = config.get("subtopics", {})
+            subjects[subject_id]["allowed_tags"] = config.get(
+                "allowed_tags", config.get("allowed_keywords", [])
+            )
 
         return render_template("admin/subtopics.html", subjects=subjects)
 
     except Exception as e:
-        app.logger.error(f"Error loading subtopics: {e}")
+        current_app.logger.error(f"Error loading subtopics: {e}")
         return render_template("admin/subtopics.html", subjects={})
 
 
-@app.route("/admin/questions")
+@bp.route("/admin/questions")
+@role_required("teacher")
 def admin_questions():
     """Questions management page."""
     try:
@@ -1753,17 +2614,15 @@ def admin_questions():
                     "description": subject_info.get("description", ""),
                     "subtopics": {},
                 }
+                subtopic_stats = data_loader.get_subtopic_stats(subject_id)
 
-                for subtopic_id, subtopic_data in subject_config["subtopics"].items():
-                    # Load quiz data and question pool to get counts
-                    quiz_data = data_loader.load_quiz_data(subject_id, subtopic_id)
-                    pool_data = data_loader.get_question_pool_questions(
-                        subject_id, subtopic_id
-                    )
-
-                    quiz_count = len(quiz_data.get("questions", [])) if quiz_data else 0
-                    pool_count = len(pool_data) if pool_data else 0
+                for subtopic_id, config_data in subject_config["subtopics"].items():
+                    # Counts come from the content stats index
+                    counts = subtopic_stats.get(subtopic_id, {})
+                    quiz_count = counts.get("question_count", 0)
+                    pool_count = counts.get("pool_count", 0)
 
+                    subtopic_data = dict(config_data)
                     subtopic_data["quiz_questions_count"] = quiz_count
                     subtopic_data["pool_questions_count"] = pool_count
 
@@ -1784,11 +2643,12 @@ def admin_questions():
         )
 
     except Exception as e:
-        app.logger.error(f"Error loading questions admin page: {e}")
+        current_app.logger.error(f"Error loading questions admin page: {e}")
         return f"Error: {e}", 500
 
 
-@app.route("/admin/quiz/<subject>/<subtopic>")
+@bp.route("/admin/quiz/<subject>/<subtopic>")
+@role_required("teacher")
 def admin_quiz_editor(subject, subtopic):
     """Quiz editor page for a specific subject/subtopic."""
     try:
@@ -1823,11 +2683,12 @@ def admin_quiz_editor(subject, subtopic):
         )
 
     except Exception as e:
-        app.logger.error(f"Error loading quiz editor: {e}")
+        current_app.logger.error(f"Error loading quiz editor: {e}")
         return f"Error: {e}", 500
 
 
-@app.route("/admin/quiz/<subject>/<subtopic>/initial", methods=["GET", "POST"])
+@bp.route("/admin/quiz/<subject>/<subtopic>/initial", methods=["GET", "POST"])
+@role_required("teacher")
 def admin_quiz_initial(subject, subtopic):
     """Manage initial quiz questions."""
     if request.method == "GET":
@@ -1835,7 +2696,7 @@ def admin_quiz_initial(subject, subtopic):
             quiz_data = data_loader.load_quiz_data(subject, subtopic)
             return jsonify(quiz_data if quiz_data else {"questions": []})
         except Exception as e:
-            app.logger.error(f"Error loading initial quiz data: {e}")
+            current_app.logger.error(f"Error loading initial quiz data: {e}")
             return jsonify({"error": str(e)}), 500
 
     elif request.method == "POST":
@@ -1852,7 +2713,7 @@ def admin_quiz_initial(subject, subtopic):
 
             # Save to file
             quiz_file_path = os.path.join(
-                DATA_ROOT_PATH, "subjects", subject, subtopic, "quiz_data.json"
+                current_app.config["DATA_ROOT_PATH"], "subjects", subject, subtopic, "quiz_data.json"
             )
 
             # Ensure directory exists
@@ -1861,16 +2722,19 @@ def admin_quiz_initial(subject, subtopic):
             with open(quiz_file_path, "w", encoding="utf-8") as f:
                 json.dump(quiz_data, f, indent=2)
 
+            data_loader.notify_content_changed(subject, subtopic)
+
             return jsonify(
                 {"success": True, "message": "Initial quiz updated successfully"}
             )
 
         except Exception as e:
-            app.logger.error(f"Error updating initial quiz: {e}")
+            current_app.logger.error(f"Error updating initial quiz: {e}")
             return jsonify({"error": str(e)}), 500
 
 
-@app.route("/admin/quiz/<subject>/<subtopic>/pool", methods=["GET", "POST"])
+@bp.route("/admin/quiz/<subject>/<subtopic>/pool", methods=["GET", "POST"])
+@role_required("teacher")
 def admin_quiz_pool(subject, subtopic):
     """Manage question pool for remedial quizzes."""
     if request.method == "GET":
@@ -1878,7 +2742,7 @@ def admin_quiz_pool(subject, subtopic):
             pool_data = data_loader.get_question_pool_questions(subject, subtopic)
             return jsonify({"questions": pool_data if pool_data else []})
         except Exception as e:
-            app.logger.error(f"Error loading question pool: {e}")
+            current_app.logger.error(f"Error loading question pool: {e}")
             return jsonify({"error": str(e)}), 500
 
     elif request.method == "POST":
@@ -1895,7 +2759,7 @@ def admin_quiz_pool(subject, subtopic):
 
             # Save to file
             pool_file_path = os.path.join(
-                DATA_ROOT_PATH, "subjects", subject, subtopic, "question_pool.json"
+                current_app.config["DATA_ROOT_PATH"], "subjects", subject, subtopic, "question_pool.json"
             )
 
             # Ensure directory exists
@@ -1904,16 +2768,18 @@ def admin_quiz_pool(subject, subtopic):
             with open(pool_file_path, "w", encoding="utf-8") as f:
                 json.dump(pool_data, f, indent=2)
 
+            data_loader.notify_content_changed(subject, subtopic)
+
             return jsonify(
                 {"success": True, "message": "Question pool updated successfully"}
             )
 
         except Exception as e:
-            app.logger.error(f"Error updating question pool: {e}")
+            current_app.logger.error(f"Error updating question pool: {e}")
             return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/subjects/<subject>/tags")
+@bp.route("/api/subjects/<subject>/tags")
 def api_get_subject_tags(subject):
     """API endpoint to get available tags for a subject."""
     try:
@@ -1922,11 +2788,11 @@ def api_get_subject_tags(subject):
         return jsonify({"success": True, "tags": tags, "count": len(tags)})
 
     except Exception as e:
-        app.logger.error(f"Error getting tags for {subject}: {e}")
+        current_app.logger.error(f"Error getting tags for {subject}: {e}")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/subjects/<subject>/subtopics")
+@bp.route("/api/subjects/<subject>/subtopics")
 def api_get_subtopics(subject):
     """API endpoint to get subtopics for a subject."""
     try:
@@ -1941,11 +2807,11 @@ def api_get_subtopics(subject):
         return jsonify({"subtopics": subtopics})
 
     except Exception as e:
-        app.logger.error(f"Error getting subtopics for {subject}: {e}")
+        current_app.logger.error(f"Error getting subtopics for {subject}: {e}")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/lessons/find-by-tags", methods=["POST"])
+@bp.route("/api/lessons/find-by-tags", methods=["POST"])
 def api_find_lessons_by_tags():
     """API endpoint to find lessons matching specific tags."""
     try:
@@ -1962,7 +2828,7 @@ def api_find_lessons_by_tags():
         # Use the DataLoader method to find matching lessons
         matching_lessons = data_loader.find_lessons_by_tags(subject, target_tags)
 
-        app.logger.info(
+        current_app.logger.info(
             f"Found {len(matching_lessons)} lessons for subject '{subject}' with tags {target_tags}"
         )
 
@@ -1975,24 +2841,26 @@ def api_find_lessons_by_tags():
         )
 
     except Exception as e:
-        app.logger.error(f"Error finding lessons by tags: {e}")
+        current_app.logger.error(f"Error finding lessons by tags: {e}")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/admin/export")
+@bp.route("/admin/export")
+@role_required("teacher")
 def admin_export():
     """Export/Import functionality placeholder."""
     return render_template("admin/export.html")
 
 
-@app.route("/admin/clear-cache", methods=["POST"])
+@bp.route("/admin/clear-cache", methods=["POST"])
+@role_required("teacher")
 def admin_clear_cache():
     """Clear the DataLoader cache."""
     try:
         # Clear the DataLoader cache
-        data_loader._cache.clear()
+        data_loader.clear_cache()
 
-        app.logger.info("DataLoader cache cleared successfully")
+        current_app.logger.info("DataLoader cache cleared successfully")
         return jsonify(
             {
                 "success": True,
@@ -2001,14 +2869,48 @@ def admin_clear_cache():
         )
 
     except Exception as e:
-        app.logger.error(f"Error clearing cache: {e}")
+        current_app.logger.error(f"Error clearing cache: {e}")
         return (
             jsonify({"success": False, "error": f"Failed to clear cache: {str(e)}"}),
             500,
         )
 
 
-@app.route("/admin/migrate-tags", methods=["POST"])
+@bp.route("/admin/cache-stats")
+@role_required("teacher")
+def admin_cache_stats():
+    """Report DataLoader and AI analysis cache counters."""
+    try:
+        return jsonify(
+            {
+                "success": True,
+                "pid": os.getpid(),
+                **data_loader.get_cache_stats(),
+                "analysis_cache": analysis_cache.stats(),
+            }
+        )
+    except Exception as e:
+        current_app.logger.error(f"Error reading cache stats: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route("/admin/ai-stats")
+@role_required("teacher")
+def admin_ai_stats():
+    """Report AI gateway saturation, circuit breaker state and job queue load."""
+    return jsonify(
+        {
+            "success": True,
+            "pid": os.getpid(),
+            "gateway": ai_gateway.stats(),
+            "single_flight": ai_flight.stats(),
+            "analysis_jobs": analysis_jobs.stats(),
+        }
+    )
+
+
+@bp.route("/admin/migrate-tags", methods=["POST"])
+@role_required("teacher")
 def admin_migrate_tags():
     """Migrate all subjects from keywords to tags format."""
     try:
@@ -2022,14 +2924,11 @@ def admin_migrate_tags():
             subject for subject, success in results.items() if not success
         ]
 
-        # Clear cache to ensure new data is loaded
-        data_loader._cache.clear()
-
         message = f"Migration completed! Successfully migrated {len(successful_migrations)} subjects."
         if failed_migrations:
             message += f" Failed to migrate: {', '.join(failed_migrations)}"
 
-        app.logger.info(f"Tag migration results: {results}")
+        current_app.logger.info(f"Tag migration results: {results}")
 
         return jsonify(
             {
@@ -2042,14 +2941,14 @@ def admin_migrate_tags():
         )
 
     except Exception as e:
-        app.logger.error(f"Error during tag migration: {e}")
+        current_app.logger.error(f"Error during tag migration: {e}")
         return (
             jsonify({"success": False, "error": f"Failed to migrate tags: {str(e)}"}),
             500,
         )
 
 
-@app.route("/api/lessons/<subject>/<subtopic>/<lesson_id>")
+@bp.route("/api/lessons/<subject>/<subtopic>/<lesson_id>")
 def api_get_lesson(subject, subtopic, lesson_id):
     """Return a specific lesson by subject/subtopic/lesson_id."""
     try:
@@ -2071,7 +2970,7 @@ def api_get_lesson(subject, subtopic, lesson_id):
 
         return jsonify({"error": "Lesson not found"}), 404
     except Exception as e:
-        app.logger.error(f"Error fetching lesson {subject}/{subtopic}/{lesson_id}: {e}")
+        current_app.logger.error(f"Error fetching lesson {subject}/{subtopic}/{lesson_id}: {e}")
         return jsonify({"error": str(e)}), 500
 
 
@@ -2081,10 +2980,13 @@ if __name__ == "__main__":
             "ERROR: OPENAI_API_KEY environment variable not set. AI features will not work."
         )
 
+    app = create_app()
+
     # Validate that we have the required data structure
-    if not data_loader.validate_subject_subtopic("python", "functions"):
-        print(
-            "ERROR: Python functions data not found. Check data/subjects/python/functions/ directory."
-        )
+    with app.app_context():
+        if not data_loader.validate_subject_subtopic("python", "functions"):
+            print(
+                "ERROR: Python functions data not found. Check data/subjects/python/functions/ directory."
+            )
 
     app.run(debug=True)
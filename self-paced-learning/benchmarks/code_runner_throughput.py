@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark coding-question submissions graded per second by the code runner.
+
+Runs a batch of correct and incorrect submissions through CodeRunner.run_many
+for several pool sizes and prints throughput and per-submission latency.
+
+Usage:
+    python benchmarks/code_runner_throughput.py [--submissions 64] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.code_runner import CodeRunner
+
+TEST_CASES = [
+    {"call": "multiply(3, 4)", "expected": 12},
+    {"call": "multiply(-2, 5)", "expected": -10},
+    {"call": "multiply(0, 7)", "expected": 0},
+]
+SUBMISSIONS = [
+    "def multiply(a, b):\n    return a * b",
+    "def multiply(a, b):\n    return a + b",
+    "def multiply(a, b):\n    total = 0\n    for _ in range(b):\n        total += a\n"
+    "    return total",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    batch = [
+        (SUBMISSIONS[i % len(SUBMISSIONS)], TEST_CASES)
+        for i in range(args.submissions)
+    ]
+    print(f"{args.submissions} submissions, {len(TEST_CASES)} test cases each")
+    print(f"{'workers':>8} {'seconds':>8} {'subs/s':>8} {'ms/sub':>8}")
+
+    for workers in args.workers:
+        runner = CodeRunner(max_workers=workers)
+        runner.run_many(batch[:workers])  # Warm up the pool threads and disk cache
+
+        started = time.perf_counter()
+        reports = runner.run_many(batch)
+        elapsed = time.perf_counter() - started
+
+        assert all(report is not None for report in reports)
+        print(
+            f"{workers:>8} {elapsed:>8.2f} {len(batch) / elapsed:>8.1f} "
+            f"{elapsed / len(batch) * workers * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark password verifications (logins) per second for hash settings.
+
+Verifies a batch of logins through PasswordHasher for each hash method and
+pool size and prints throughput, throughput per core in use and latency.
+Use it to pick PASSWORD_HASH_METHOD and PASSWORD_HASH_WORKERS: a class of
+200 students logging in within a minute needs about 3.3 logins per second.
+
+Usage:
+    python benchmarks/login_throughput.py [--logins 32] [--workers 1 2]
+        [--methods scrypt:32768:8:1 pbkdf2:sha256:600000 ...]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.passwords import PasswordHasher
+
+METHODS = [
+    "scrypt:32768:8:1",
+    "scrypt:16384:8:1",
+    "pbkdf2:sha256:1000000",
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:260000",
+]
+PASSWORD = "correct horse battery staple"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--methods", nargs="+", default=METHODS)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print(f"{args.logins} logins per run, {cores} CPU cores")
+    print(
+        f"{'method':<24} {'workers':>7} {'logins/s':>9} "
+        f"{'per core':>9} {'ms/login':>9}"
+    )
+
+    for method in args.methods:
+        for workers in args.workers:
+            hasher = PasswordHasher(
+                method=method, max_workers=workers, max_pending=args.logins
+            )
+            pwhash = hasher.hash(PASSWORD)
+
+            # As many concurrent requests as logins, limited by the pool
+            with ThreadPoolExecutor(max_workers=args.logins) as requests:
+                started = time.perf_counter()
+                results = list(
+                    requests.map(
+                        lambda _: hasher.verify(pwhash, PASSWORD), range(args.logins)
+                    )
+                )
+                elapsed = time.perf_counter() - started
+
+            assert all(results)
+            rate = args.logins / elapsed
+            print(
+                f"{hasher.method_prefix:<24} {workers:>7} {rate:>9.1f} "
+                f"{rate / min(workers, cores):>9.1f} "
+                f"{elapsed / args.logins * workers * 1000:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cold start of a worker: importing app.py and calling create_app().
+
+Starts fresh interpreters with `python -X importtime`, so every run pays the
+full import cost like a new gunicorn worker or `flask db` command does, and
+prints the median import and create_app() times, the slowest modules imported
+by app.py and whether the lazily loaded OpenAI SDK and numpy stayed unloaded.
+Run it before and after a release to track cold-start time; --json writes the
+results for comparison.
+
+Usage:
+    python benchmarks/startup_time.py [--runs 5] [--top 10] [--json startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in each fresh interpreter; prints its timings as JSON on stdout
+WORKER_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app({
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",
+    "SECRET_KEY": "benchmark",
+    "QUIZ_SESSION_DB": "memory",
+    "ANALYSIS_CACHE_DB": "memory",
+    "ANALYSIS_JOB_DB": "memory",
+})
+created = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "lazy_modules_loaded": [name for name in ("openai", "numpy") if name in sys.modules],
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Get the cumulative microseconds of app and of each module it imports."""
+    cumulative = {}
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        _, micros, name = line.split("|")
+        if not micros.strip().isdigit():
+            continue  # Column headings
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        # A module is listed after the modules it imports, one level deeper
+        if depth == 1:
+            children[name] = int(micros)
+        elif depth == 0:
+            if name == "app":
+                cumulative = {"app": int(micros), **children}
+            children = {}
+    return cumulative
+
+
+def run_once():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", WORKER_SCRIPT],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(
+        result.stderr
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    timings = []
+    modules = {}
+    for _ in range(args.runs):
+        timing, cumulative = run_once()
+        timings.append(timing)
+        for name, micros in cumulative.items():
+            modules.setdefault(name, []).append(micros)
+
+    import_ms = statistics.median(t["import_ms"] for t in timings)
+    create_app_ms = statistics.median(t["create_app_ms"] for t in timings)
+    lazy_loaded = sorted({name for t in timings for name in t["lazy_modules_loaded"]})
+    module_ms = {
+        name: statistics.median(values) / 1000 for name, values in modules.items()
+    }
+
+    print(f"{args.runs} cold starts, Python {sys.version.split()[0]}")
+    print(f"{'import app':<28} {import_ms:>9.1f} ms")
+    print(f"{'create_app()':<28} {create_app_ms:>9.1f} ms")
+    print(f"{'total':<28} {import_ms + create_app_ms:>9.1f} ms")
+    print(f"lazy modules loaded at startup: {', '.join(lazy_loaded) or 'none'}")
+    print()
+    print(f"{'slowest imports of app.py':<28} {'ms':>9}")
+    slowest = sorted(
+        (item for item in module_ms.items() if item[0] != "app"),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    for name, ms in slowest[: args.top]:
+        print(f"{name:<28} {ms:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "runs": args.runs,
+                    "python": sys.version.split()[0],
+                    "import_ms": import_ms,
+                    "create_app_ms": create_app_ms,
+                    "lazy_modules_loaded": lazy_loaded,
+                    "modules_ms": module_ms,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -34,7 +34,7 @@ class Class(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     code = db.Column(db.String(10), nullable=False, unique=True)
-    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     registrations = db.relationship('ClassRegistration', backref='class_', lazy=True)
@@ -53,8 +53,118 @@ class ClassRegistration(db.Model):
     class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False)
     registered_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # Ensure a student cannot register for the same class twice
-    __table_args__ = (db.UniqueConstraint('student_id', 'class_id', name='_student_class_uc'),)
+    # Ensure a student cannot register for the same class twice; the constraint
+    # also indexes lookups by student, the second index lookups by class
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'class_id', name='_student_class_uc'),
+        db.Index('ix_class_registration_class_id_student_id', 'class_id', 'student_id'),
+    )
 
     def __repr__(self):
         return f"<Registration Student:{self.student_id} Class:{self.class_id}>"
+
+# ---------------------
+# QuizAttempt Model
+# ---------------------
+class QuizAttempt(db.Model):
+    __tablename__ = 'quiz_attempt'
+
+    # Generated by the app, so attempts and their responses can be inserted
+    # together in one batch without reading back autoincrement ids
+    id = db.Column(db.String(32), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    subject = db.Column(db.String(100), nullable=False)
+    subtopic = db.Column(db.String(100), nullable=False)
+    quiz_type = db.Column(db.String(20), nullable=False, default='initial')
+    correct = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Integer, nullable=False)
+    weak_topics = db.Column(db.JSON, nullable=True)
+    submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    responses = db.relationship('QuestionResponse', backref='attempt', lazy=True)
+
+    def __repr__(self):
+        return f"<QuizAttempt {self.id} Student:{self.student_id} {self.subject}/{self.subtopic}>"
+
+# ---------------------
+# QuestionResponse Model
+# ---------------------
+class QuestionResponse(db.Model):
+    __tablename__ = 'question_response'
+
+    id = db.Column(db.Integer, primary_key=True)
+    attempt_id = db.Column(db.String(32), db.ForeignKey('quiz_attempt.id'), nullable=False, index=True)
+    question_index = db.Column(db.Integer, nullable=False)
+    question_id = db.Column(db.String(64), nullable=True)
+    question_type = db.Column(db.String(30), nullable=False)
+    answer = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(30), nullable=False)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<QuestionResponse Attempt:{self.attempt_id} Q{self.question_index}>"
+
+# ---------------------
+# TopicProgress Model
+# ---------------------
+class TopicProgress(db.Model):
+    __tablename__ = 'topic_progress'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    topic = db.Column(db.String(100), nullable=False)
+    progress = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # One row per student and topic; also serves the per-user lookup and the upsert
+    __table_args__ = (db.UniqueConstraint('user_id', 'topic', name='_user_topic_uc'),)
+
+    def __repr__(self):
+        return f"<TopicProgress User:{self.user_id} {self.topic}={self.progress}>"
+
+# ---------------------
+# SubtopicProgress Model
+# ---------------------
+class SubtopicProgress(db.Model):
+    __tablename__ = 'subtopic_progress'
+
+    # Maintained incrementally as quiz attempts are written, so progress views
+    # never have to scan the attempt history
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject = db.Column(db.String(100), nullable=False)
+    subtopic = db.Column(db.String(100), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    best_score = db.Column(db.Float, nullable=False, default=0.0)  # Percent correct
+    last_score = db.Column(db.Float, nullable=False, default=0.0)
+    last_activity = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('student_id', 'subject', 'subtopic', name='_student_subtopic_uc'),)
+
+    def __repr__(self):
+        return f"<SubtopicProgress Student:{self.student_id} {self.subject}/{self.subtopic} best={self.best_score}>"
+
+# ---------------------
+# TagMastery Model
+# ---------------------
+class TagMastery(db.Model):
+    __tablename__ = 'tag_mastery'
+
+    # Weighted question counts per concept tag, as in utils.grading.score_tags()
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject = db.Column(db.String(100), nullable=False)
+    tag = db.Column(db.String(100), nullable=False)
+    answered = db.Column(db.Float, nullable=False, default=0.0)
+    missed = db.Column(db.Float, nullable=False, default=0.0)
+    last_activity = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('student_id', 'subject', 'tag', name='_student_tag_uc'),)
+
+    @property
+    def mastery(self):
+        """Share of answered questions (0-1) that were not missed."""
+        return 1.0 - self.missed / self.answered if self.answered else 0.0
+
+    def __repr__(self):
+        return f"<TagMastery Student:{self.student_id} {self.subject}/{self.tag}>"
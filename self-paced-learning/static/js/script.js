@@ -374,26 +374,65 @@ document.addEventListener("DOMContentLoaded", function () {
     }
   }
 
-  // Save progress to server
+  // Progress updates waiting to be sent, latest value per topic
+  const PROGRESS_FLUSH_INTERVAL = 10000;
+  let pendingProgress = {};
+  let progressFlushTimer = null;
+
+  // Queue progress for the server; updates are sent together in batches
   function saveProgress(topic, progress) {
-    fetch("/api/progress/update", {
+    // Update main page progress bar
+    updateProgressBar(topic, progress);
+
+    pendingProgress[topic] = progress;
+    if (progress >= 100) {
+      // Completion is sent right away, the page may navigate to the quiz
+      flushProgress();
+    } else if (!progressFlushTimer) {
+      progressFlushTimer = setTimeout(flushProgress, PROGRESS_FLUSH_INTERVAL);
+    }
+  }
+
+  // Send all queued progress updates in one request
+  function flushProgress(useBeacon = false) {
+    if (progressFlushTimer) {
+      clearTimeout(progressFlushTimer);
+      progressFlushTimer = null;
+    }
+    if (Object.keys(pendingProgress).length === 0) {
+      return;
+    }
+
+    const body = JSON.stringify({ updates: pendingProgress });
+    pendingProgress = {};
+
+    if (useBeacon && navigator.sendBeacon) {
+      navigator.sendBeacon(
+        "/api/progress/batch",
+        new Blob([body], { type: "application/json" })
+      );
+      return;
+    }
+    fetch("/api/progress/batch", {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify({
-        topic: topic,
-        progress: progress,
-      }),
-    })
-      .then((response) => response.json())
-      .then((data) => {
-        // Update main page progress bar
-        updateProgressBar(topic, progress);
-      })
-      .catch((error) => console.error("Error saving progress:", error));
+      body: body,
+      keepalive: true,
+    }).catch((error) => console.error("Error saving progress:", error));
   }
 
+  // Send what is queued when the page is hidden or left
+  document.addEventListener("visibilitychange", function () {
+    if (document.visibilityState === "hidden") {
+      flushProgress(true);
+    }
+  });
+  window.addEventListener("pagehide", function () {
+    flushProgress(true);
+  });
+
   // Update topic progress bar and completion badge
   function updateProgressBar(topic, progress) {
     const progressBar = document.getElementById(`${topic}-progress`);
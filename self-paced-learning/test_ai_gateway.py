@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for the AI gateway: retries, deadlines, concurrency and circuit breaker.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.ai_gateway import (
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    AIGateway,
+    CircuitOpenError,
+    DeadlineExceededError,
+    GatewayBusyError,
+)
+
+
+def _flaky(failures, error=ConnectionError):
+    """Return an attempt function failing `failures` times before succeeding."""
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) <= failures:
+            raise error("upstream unavailable")
+        return "ok"
+
+    return attempt, calls
+
+
+def test_transient_errors_are_retried_within_the_deadline():
+    gateway = AIGateway(max_retries=2, backoff_base=0.001, call_timeout=5)
+
+    attempt, calls = _flaky(2)
+    assert gateway.call(attempt) == "ok"
+    assert len(calls) == 3 and all(0 < timeout <= 5 for timeout in calls)
+
+    attempt, calls = _flaky(1, error=ValueError)
+    with pytest.raises(ValueError):
+        gateway.call(attempt)
+    assert len(calls) == 1
+
+    stats = gateway.stats()
+    assert (stats["successes"], stats["retries"], stats["failures"]) == (1, 2, 0)
+    assert stats["breaker_state"] == BREAKER_CLOSED
+
+
+def test_deadline_covers_retries():
+    gateway = AIGateway(max_retries=5, backoff_base=1.0, backoff_max=1.0)
+
+    def slow_failure(timeout):
+        time.sleep(0.05)
+        raise TimeoutError("read timed out")
+
+    started = time.monotonic()
+    with pytest.raises((DeadlineExceededError, TimeoutError)):
+        gateway.call(slow_failure, timeout=0.2)
+    assert time.monotonic() - started < 1.0
+    assert gateway.stats()["consecutive_failures"] == 1
+
+
+def test_client_timeouts_are_counted_as_timeouts():
+    class ClientTimeout(ConnectionError):
+        """Like openai.APITimeoutError, a subclass of a connection error."""
+
+    gateway = AIGateway(max_retries=1, backoff_base=0, timeout_errors=(ClientTimeout,))
+    with pytest.raises(ClientTimeout):
+        gateway.call(_flaky(2, error=ClientTimeout)[0])
+    with pytest.raises(ConnectionError):
+        gateway.call(_flaky(2)[0])
+
+    stats = gateway.stats()
+    assert (stats["timeouts"], stats["failures"]) == (1, 1)
+    assert stats["consecutive_failures"] == 2
+
+
+def test_started_streams_only_time_out_when_idle():
+    gateway = AIGateway(failure_threshold=1, stream_idle_timeout=0.1)
+
+    # Longer than the call timeout in total, but never idle for long
+    with gateway.reserve(timeout=0.1) as gateway_call:
+        for _ in range(5):
+            time.sleep(0.04)
+            gateway_call.check_deadline()
+            gateway_call.touch()
+    assert gateway.stats()["successes"] == 1
+
+    # A stream that stalls is abandoned without opening the breaker
+    with pytest.raises(DeadlineExceededError):
+        with gateway.reserve(timeout=0.1) as gateway_call:
+            gateway_call.touch()
+            time.sleep(0.15)
+            gateway_call.check_deadline()
+    stats = gateway.stats()
+    assert (stats["timeouts"], stats["consecutive_failures"]) == (1, 0)
+    assert stats["breaker_state"] == BREAKER_CLOSED
+
+    # Missing the first chunk still counts as a failure
+    with pytest.raises(DeadlineExceededError):
+        with gateway.reserve(timeout=0.05) as gateway_call:
+            time.sleep(0.08)
+            gateway_call.check_deadline()
+    assert gateway.breaker.state == BREAKER_OPEN
+
+
+def test_breaker_opens_then_allows_one_trial_call():
+    gateway = AIGateway(
+        max_retries=0, failure_threshold=2, reset_timeout=0.1, backoff_base=0
+    )
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            gateway.call(_flaky(1)[0])
+
+    assert gateway.breaker.state == BREAKER_OPEN
+    assert not gateway.is_available()
+    with pytest.raises(CircuitOpenError):
+        gateway.call(lambda timeout: "ok")
+
+    time.sleep(0.12)
+    assert gateway.breaker.state == BREAKER_HALF_OPEN
+    assert gateway.call(lambda timeout: "ok") == "ok"
+
+    stats = gateway.stats()
+    assert stats["breaker_state"] == BREAKER_CLOSED
+    assert (stats["times_opened"], stats["rejected_open"]) == (1, 1)
+
+
+def test_concurrency_limit_rejects_when_saturated():
+    gateway = AIGateway(max_concurrency=1)
+    entered, release = threading.Event(), threading.Event()
+
+    def hold(timeout):
+        entered.set()
+        release.wait(5)
+        return "done"
+
+    worker = threading.Thread(target=gateway.call, args=(hold,))
+    worker.start()
+    assert entered.wait(5)
+
+    assert gateway.stats()["saturation"] == 1.0
+    with pytest.raises(GatewayBusyError):
+        gateway.call(lambda timeout: "ok", timeout=0.05)
+
+    release.set()
+    worker.join()
+    stats = gateway.stats()
+    assert (stats["in_flight"], stats["rejected_busy"]) == (0, 1)
+    assert stats["breaker_state"] == BREAKER_CLOSED
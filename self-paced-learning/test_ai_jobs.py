@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the background AI analysis job queue.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.ai_jobs import (
+    FINISHED_STATUSES,
+    JOB_DONE,
+    JOB_FAILED,
+    AnalysisJobQueue,
+    QueueFullError,
+)
+
+
+def _wait_finished(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in FINISHED_STATUSES:
+            return job
+        queue.wait(timeout=0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_result_and_failure_are_recorded(tmp_path):
+    queue = AnalysisJobQueue(str(tmp_path / "jobs.sqlite3"), max_workers=2)
+
+    job_id = queue.submit(lambda: {"weak_topics": ["loops"]}, {"score": 1}, "sid")
+    job = _wait_finished(queue, job_id)
+    assert job["status"] == JOB_DONE
+    assert job["owner"] == "sid"
+    assert job["payload"] == {"score": 1}
+    assert job["result"] == {"weak_topics": ["loops"]}
+
+    def fail():
+        raise RuntimeError("Could not get analysis from AI.")
+
+    job = _wait_finished(queue, queue.submit(fail, {}, "sid"))
+    assert job["status"] == JOB_FAILED
+    assert job["error"] == "Could not get analysis from AI."
+
+    stats = queue.stats()
+    assert (stats["submitted"], stats[JOB_DONE], stats[JOB_FAILED]) == (2, 1, 1)
+    assert queue.get("unknown") is None
+
+
+def test_queue_rejects_jobs_beyond_capacity():
+    queue = AnalysisJobQueue("memory", max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    job_id = queue.submit(lambda: release.wait(5) and {}, {}, "sid")
+    with pytest.raises(QueueFullError):
+        queue.submit(lambda: {}, {}, "sid")
+    assert queue.stats()["rejected"] == 1
+
+    release.set()
+    assert _wait_finished(queue, job_id)["status"] == JOB_DONE
+    assert queue.stats()["active"] == 0
+
+
+def test_unfinished_job_past_timeout_is_reported_failed():
+    queue = AnalysisJobQueue("memory", max_workers=1, job_timeout=0.2)
+    release = threading.Event()
+
+    job_id = queue.submit(lambda: release.wait(5) and {}, {}, "sid")
+    time.sleep(0.3)
+    job = queue.get(job_id)
+    assert job["status"] == JOB_FAILED
+    assert job["error"] == "Analysis timed out."
+    release.set()
+
+
+def test_running_job_reports_progress():
+    from app import build_job_response
+
+    queue = AnalysisJobQueue("memory", max_workers=1)
+    reported = threading.Event()
+    release = threading.Event()
+
+    def task():
+        queue.report_progress(job_id, {"feedback": "Partial"})
+        reported.set()
+        release.wait(5)
+        return {"feedback": "Partial feedback"}
+
+    job_id = queue.new_job_id()
+    queue.submit(task, {}, "sid", job_id=job_id)
+    assert reported.wait(5)
+    assert queue.get(job_id)["progress"] == {"feedback": "Partial"}
+    # Polling clients see the feedback generated so far
+    assert build_job_response(queue.get(job_id))["partial_feedback"] == "Partial"
+
+    release.set()
+    job = _wait_finished(queue, job_id)
+    assert job["result"] == {"feedback": "Partial feedback"}
+    assert "partial_feedback" not in build_job_response(job)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests for the parallel per-question AI review.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.ai_review import ParallelReviewer
+from utils.analysis_cache import AnalysisCache
+from utils.grading import grade_submission
+
+TAGS = ["loops", "functions", "return values"]
+
+
+QUESTIONS = [
+    {
+        "type": "multiple_choice",
+        "question": "Which keyword defines a function?",
+        "options": ["func", "def"],
+        "answer_index": 1,
+        "tags": ["functions"],
+    },
+    {
+        "type": "coding",
+        "question": "Write a loop printing 1 to 3.",
+        "sample_solution": "for i in range(1, 4): print(i)",
+        "tags": ["loops"],
+    },
+    {
+        "type": "coding",
+        "question": "Return the square of x.",
+        "sample_solution": "def square(x): return x * x",
+        "tags": ["return values"],
+    },
+]
+
+
+def _graded(square_answer="def square(x): print(x * x)", keyword="func"):
+    return grade_submission(
+        QUESTIONS,
+        {"q0": keyword, "q1": "for i in range(3): print(i)", "q2": square_answer},
+    )
+
+
+class FakeCompletion:
+    """Answers each prompt after a delay, recording the prompts it received."""
+
+    def __init__(self, delay=0.2, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, system_message, max_tokens):
+        with self._lock:
+            self.prompts.append(prompt)
+        time.sleep(self.delay)
+        if self.fail_on and self.fail_on in prompt:
+            return None
+        if "range(3)" in prompt:
+            return json.dumps(
+                {"detailed_feedback": "Off by one.", "weak_concept_tags": ["loops"]}
+            )
+        if "print(x * x)" in prompt:
+            return json.dumps(
+                {
+                    "detailed_feedback": "Return the value instead of printing it.",
+                    "weak_concept_tags": ["return values", "not a tag"],
+                }
+            )
+        return json.dumps(
+            {"detailed_feedback": "Review functions.", "weak_concept_tags": ["functions"]}
+        )
+
+
+def _review(reviewer, graded=None, **kwargs):
+    return reviewer.review(
+        "python", "functions", 1, "gpt-4", graded or _graded(), TAGS, **kwargs
+    )
+
+
+def test_requests_run_concurrently_and_merge_in_question_order():
+    complete = FakeCompletion(delay=0.3)
+    reviewer = ParallelReviewer(complete, AnalysisCache("memory"), max_workers=4)
+    progress = []
+
+    started = time.monotonic()
+    review = _review(reviewer, on_progress=progress.append)
+    elapsed = time.monotonic() - started
+
+    assert len(complete.prompts) == 3
+    assert elapsed < 0.6  # One request's latency, not three
+    assert review["feedback"] == (
+        "Review functions.\n\n"
+        "Question 2: Off by one.\n\n"
+        "Question 3: Return the value instead of printing it."
+    )
+    assert review["weak_topics"] == ["functions", "loops", "return values"]
+    assert review["tokens"] > 0
+    assert len(progress) == 3
+
+
+def test_each_coding_review_is_cached_on_its_own():
+    cache = AnalysisCache("memory")
+    complete = FakeCompletion(delay=0)
+    reviewer = ParallelReviewer(complete, cache)
+    _review(reviewer)
+
+    # Changing one coding answer only sends that answer again
+    graded = _graded(square_answer="def square(x): return x ** 2")
+    complete.prompts.clear()
+    review = _review(reviewer, graded)
+
+    assert len(complete.prompts) == 1
+    assert "x ** 2" in complete.prompts[0]
+    assert review["feedback"].startswith("Review functions.\n\nQuestion 2: Off by one.")
+
+
+def test_classification_is_skipped_when_no_answer_was_missed():
+    complete = FakeCompletion(delay=0)
+    reviewer = ParallelReviewer(complete, AnalysisCache("memory"))
+    review = _review(reviewer, _graded(keyword="def"))
+
+    assert len(complete.prompts) == 2
+    assert review["feedback"].startswith("Question 2: Off by one.")
+    assert review["weak_topics"] == ["loops", "return values"]
+
+
+def test_failed_review_leaves_a_placeholder():
+    complete = FakeCompletion(delay=0, fail_on="print(x * x)")
+    reviewer = ParallelReviewer(complete, AnalysisCache("memory"))
+    review = _review(reviewer)
+
+    assert "Question 3: This answer could not be reviewed" in review["feedback"]
+    assert review["weak_topics"] == ["functions", "loops"]
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed AI completions against the local fake OpenAI server.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from openai import OpenAI
+
+from utils.ai_streaming import JsonStringFieldStream, iter_completion_text
+from utils.ai_stub import stub_completion_text
+from utils.fake_openai_server import create_server
+
+ANALYSIS_MESSAGES = [
+    {"role": "system", "content": "You are an expert instructor."},
+    {
+        "role": "user",
+        "content": 'predefined list ONLY: ["loops", "functions"]\n'
+        "Status: Incorrect\n\nStatus: For AI Review\n\n",
+    },
+]
+
+
+def test_field_stream_decodes_escapes_split_across_chunks():
+    feedback = 'Line one\nSaid "hi" \\ café 😀 done'
+    text = json.dumps({"weak_concept_tags": [], "detailed_feedback": feedback})
+
+    stream = JsonStringFieldStream("detailed_feedback")
+    decoded = "".join(stream.feed(char) for char in text)
+    assert decoded == feedback
+    assert stream.done
+    assert stream.feed("more") == ""
+
+
+def test_fake_server_streams_through_openai_client():
+    server = create_server(token_delay=0.005)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = OpenAI(
+            api_key="test", base_url=f"http://127.0.0.1:{server.server_port}/v1"
+        )
+        expected = stub_completion_text(ANALYSIS_MESSAGES)
+
+        # The first request also pays for the client's lazy imports
+        response = client.chat.completions.create(
+            model="gpt-4", messages=ANALYSIS_MESSAGES
+        )
+        assert response.choices[0].message.content == expected
+
+        started = time.monotonic()
+        stream = client.chat.completions.create(
+            model="gpt-4", messages=ANALYSIS_MESSAGES, stream=True
+        )
+
+        deltas = []
+        first_delta_at = None
+        for delta in iter_completion_text(stream):
+            first_delta_at = first_delta_at or time.monotonic() - started
+            deltas.append(delta)
+        total = time.monotonic() - started
+
+        assert "".join(deltas) == expected
+        assert json.loads(expected)["weak_concept_tags"] == ["loops"]
+        assert len(deltas) > 10 and first_delta_at < total / 2
+    finally:
+        server.shutdown()
+        server.server_close()
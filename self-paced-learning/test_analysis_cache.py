@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed AI analysis cache.
+"""
+
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.analysis_cache import AnalysisCache
+from utils.grading import grade_submission
+
+QUESTIONS = [
+    {"type": "fill_in_the_blank", "question": "Keyword?", "correct_answer": "def"},
+    {"type": "coding", "question": "Write f", "sample_solution": "def f(): pass"},
+]
+
+
+def _key(answers, content_version=1, model="gpt-4"):
+    graded = grade_submission(QUESTIONS, answers)
+    return AnalysisCache.make_key("python", "functions", content_version, graded, model)
+
+
+def test_key_normalizes_answers_but_not_content():
+    key = _key({"q0": "lambda", "q1": "def f():\n    pass"})
+    assert key == _key({"q0": "  LAMBDA ", "q1": "def f():   \r\n    pass\n"})
+    assert key != _key({"q0": "lambda", "q1": "def f():\n    return"})
+    assert key != _key({"q0": "lambda", "q1": "def f():\n    pass"}, content_version=2)
+    assert key != _key({"q0": "lambda", "q1": "def f():\n    pass"}, model="gpt-4o")
+
+
+def test_hits_report_saved_tokens_and_eviction(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "analysis.sqlite3"), max_entries=2)
+    assert cache.get("a") is None
+    cache.set("a", '{"weak_concept_tags": []}', tokens=100)
+    assert cache.get("a") == '{"weak_concept_tags": []}'
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["saved_tokens"] == 100
+
+    cache.set("b", "{}", tokens=10)
+    cache.set("c", "{}", tokens=10)
+    assert cache.evict() == 1
+    assert cache.stats()["entries"] == 2
+
+    expired = AnalysisCache(str(tmp_path / "expired.sqlite3"), ttl_seconds=-1)
+    expired.set("a", "{}", tokens=1)
+    assert expired.get("a") is None
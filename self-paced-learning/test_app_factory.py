@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the application factory and its lazily created services.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+
+# Add the app directory to Python path
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(APP_DIR)
+
+from utils.ai_stub import StubOpenAIClient
+from utils.data_loader import DataLoader
+from utils.lazy import Lazy
+
+TEST_CONFIG = {
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",
+    "SECRET_KEY": "test",
+    "QUIZ_SESSION_DB": "memory",
+    "ANALYSIS_CACHE_DB": "memory",
+    "ANALYSIS_JOB_DB": "memory",
+    "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+}
+
+
+def test_startup_does_not_import_openai_numpy_or_start_services(tmp_path):
+    # A fresh interpreter, like a new worker, with the real OpenAI backend
+    db_paths = {
+        name: str(tmp_path / f"{name.lower()}.sqlite3")
+        for name in ("QUIZ_SESSION_DB", "ANALYSIS_CACHE_DB", "ANALYSIS_JOB_DB")
+    }
+    script = (
+        "import json, sys, threading\n"
+        "import app\n"
+        "from utils.lazy import Lazy\n"
+        f"application = app.create_app({ {**TEST_CONFIG, **db_paths}!r})\n"
+        "print(json.dumps({\n"
+        "    'loaded': [m for m in ('openai', 'numpy') if m in sys.modules],\n"
+        "    'created': [name for name, service in application.extensions.items()\n"
+        "                if isinstance(service, Lazy) and service.created],\n"
+        "    'threads': threading.active_count(),\n"
+        "}))\n"
+    )
+    env = dict(os.environ, AI_BACKEND="openai", OPENAI_API_KEY="test")
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == {
+        "loaded": [],
+        "created": [],
+        "threads": 1,
+    }
+    assert not any(os.path.exists(path) for path in db_paths.values())
+
+
+def test_services_are_per_app_and_created_on_first_use():
+    import app as app_module
+
+    application = app_module.create_app(
+        {**TEST_CONFIG, "AI_BACKEND": "stub", "AI_ANALYSIS_MODE": "parallel"}
+    )
+    other = app_module.create_app({**TEST_CONFIG, "AI_BACKEND": "stub"})
+
+    assert application.config["AI_ANALYSIS_MODE"] == "parallel"
+    assert application.url_map.bind("").match("/login")[0] == "main.login"
+    assert not application.extensions["ai_client"].created
+
+    with application.app_context():
+        assert isinstance(app_module.client._get_current_object(), StubOpenAIClient)
+        assert isinstance(app_module.data_loader._get_current_object(), DataLoader)
+        stats = app_module.password_hasher.stats()
+    assert stats["method"] == "pbkdf2:sha256:1000"
+    assert application.extensions["ai_client"].created
+    assert application.extensions["data_loader"].created
+    assert not other.extensions["ai_client"].created
+
+
+def test_lazy_creates_value_once():
+    calls = []
+    started = threading.Event()
+
+    def factory():
+        calls.append(1)
+        started.wait(1)
+        return object()
+
+    lazy = Lazy(factory)
+    assert not lazy.created
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(lazy.get())) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert lazy.created
+    assert all(result is results[0] for result in results)
+
+    # A failed creation is retried on the next get()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("not yet")
+        return "ready"
+
+    flaky_lazy = Lazy(flaky)
+    try:
+        flaky_lazy.get()
+    except RuntimeError:
+        pass
+    assert not flaky_lazy.created
+    assert flaky_lazy.get() == "ready"
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-request user loader, identity cache and route guards.
+"""
+
+import os
+import sys
+import time
+
+import pytest
+from flask import Flask, g, jsonify, session
+from werkzeug.exceptions import Forbidden
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.auth import (
+    Auth,
+    Identity,
+    IdentityCache,
+    current_user,
+    login_required,
+    role_required,
+)
+
+USERS = {
+    1: Identity(1, "teacher", "t@example.com", "teacher", "ABC123"),
+    2: Identity(2, "student", "s@example.com", "student", None),
+}
+
+
+@login_required
+def me():
+    # Repeated lookups within a request reuse g.user
+    assert current_user() is current_user()
+    return g.user.username
+
+
+@role_required("teacher")
+def teacher_view():
+    return jsonify({"code": g.user.code})
+
+
+def _app(cache):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    loads = []
+
+    def load_identity(user_id):
+        loads.append(user_id)
+        return USERS.get(user_id)
+
+    Auth(app, load_identity, cache=cache)
+    return app, loads
+
+
+def _call(app, view, user_id=None, path="/page"):
+    with app.test_request_context(path):
+        if user_id is not None:
+            session["user_id"] = user_id
+        return view()
+
+
+def test_guards_redirect_pages_and_reject_api_calls():
+    app, _ = _app(IdentityCache())
+
+    response = _call(app, me)
+    assert response.status_code == 302 and response.location == "/login"
+    response, status = _call(app, teacher_view, path="/api/teacher")
+    assert status == 401
+
+    assert _call(app, me, user_id=2) == "student"
+    with pytest.raises(Forbidden):
+        _call(app, teacher_view, user_id=2)
+    response, status = _call(app, teacher_view, user_id=2, path="/api/teacher")
+    assert (status, response.json) == (403, {"error": "Access denied."})
+
+    assert _call(app, teacher_view, user_id=1).json == {"code": "ABC123"}
+
+    # A session pointing at a deleted user counts as logged out
+    assert _call(app, me, user_id=99).status_code == 302
+
+
+def test_identities_are_cached_between_requests_until_invalidated():
+    cache = IdentityCache(ttl=60)
+    app, loads = _app(cache)
+
+    for _ in range(5):
+        assert _call(app, teacher_view, user_id=1).json == {"code": "ABC123"}
+    assert loads == [1]
+
+    cache.invalidate(1)
+    _call(app, teacher_view, user_id=1)
+    assert loads == [1, 1]
+    assert cache.stats()["hits"] == 4
+
+    # Without a cache every guarded request loads the user once
+    app, loads = _app(None)
+    _call(app, me, user_id=2)
+    _call(app, me, user_id=2)
+    assert loads == [2, 2]
+
+
+def test_cache_expires_and_evicts_least_recently_used():
+    cache = IdentityCache(ttl=0.05, max_entries=2)
+    cache.put(USERS[1])
+    cache.put(USERS[2])
+    assert cache.get(1) == USERS[1]
+    cache.put(Identity(3, "other", "o@example.com", "student", None))
+    assert cache.get(2) is None  # Evicted, 1 was used more recently
+    assert cache.get(1) == USERS[1]
+
+    time.sleep(0.1)
+    assert cache.get(1) is None
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for the batched quiz attempt writer.
+"""
+
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, event, func, select
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+from models import QuestionResponse, QuizAttempt, User
+from utils.batch_writer import BatchWriter
+
+ATTEMPTS = QuizAttempt.__table__
+RESPONSES = QuestionResponse.__table__
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'attempts.sqlite3'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            {
+                "id": 1,
+                "username": "student",
+                "email": "student@example.com",
+                "password_hash": "-",
+                "role": "student",
+            },
+        )
+    return engine
+
+
+def _attempt(attempt_id, questions=3):
+    return (
+        (
+            ATTEMPTS,
+            [
+                {
+                    "id": attempt_id,
+                    "student_id": 1,
+                    "subject": "python",
+                    "subtopic": "functions",
+                    "quiz_type": "initial",
+                    "correct": 1,
+                    "total": questions,
+                    "weak_topics": ["loops"],
+                }
+            ],
+        ),
+        (
+            RESPONSES,
+            [
+                {
+                    "attempt_id": attempt_id,
+                    "question_index": i,
+                    "question_id": f"q{i}",
+                    "question_type": "multiple_choice",
+                    "answer": "a",
+                    "status": "Correct" if i == 0 else "Incorrect",
+                    "is_correct": i == 0,
+                }
+                for i in range(questions)
+            ],
+        ),
+    )
+
+
+def _count(engine, table):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+def test_rows_are_written_with_one_executemany_per_table(tmp_path):
+    engine = _engine(tmp_path)
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, params, context, many: statements.append(
+            many
+        ),
+    )
+    writer = BatchWriter(lambda: engine, flush_size=10_000, flush_interval=60)
+
+    for i in range(50):
+        writer.add(*_attempt(f"attempt{i}"))
+    assert _count(engine, ATTEMPTS) == 0  # Nothing written on the request path
+
+    statements.clear()
+    assert writer.flush() == 200
+    assert statements == [True, True]
+    assert (_count(engine, ATTEMPTS), _count(engine, RESPONSES)) == (50, 150)
+    writer.close()
+
+
+def test_flushes_on_size_interval_and_close(tmp_path):
+    engine = _engine(tmp_path)
+
+    writer = BatchWriter(lambda: engine, flush_size=8, flush_interval=60)
+    writer.add(*_attempt("by-size", questions=7))
+    deadline = time.monotonic() + 5
+    while writer.stats()["rows_written"] < 8 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _count(engine, RESPONSES) == 7
+    writer.close()
+
+    writer = BatchWriter(lambda: engine, flush_size=10_000, flush_interval=0.1)
+    writer.add(*_attempt("by-interval"))
+    time.sleep(0.5)
+    assert _count(engine, ATTEMPTS) == 2
+    writer.close()
+
+    writer = BatchWriter(lambda: engine, flush_size=10_000, flush_interval=60)
+    writer.add(*_attempt("on-close"))
+    writer.close()
+    assert _count(engine, ATTEMPTS) == 3
+
+
+def test_invalid_rows_are_dropped_without_blocking_others(tmp_path):
+    engine = _engine(tmp_path)
+    writer = BatchWriter(lambda: engine, flush_size=10_000, flush_interval=60)
+
+    writer.add(*_attempt("good"))
+    writer.add(*_attempt("good"))  # Duplicate primary key
+    writer.add(*_attempt("also-good"))
+    writer.flush()
+
+    assert _count(engine, ATTEMPTS) == 2
+    stats = writer.stats()
+    assert stats["dropped"] == 4
+    assert stats["buffered"] == 0
+    writer.close()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Tests for the sandboxed coding-question test runner.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.code_runner import HARNESS_PATH, CodeRunner
+from utils.grading import grade_submission, infer_weak_tags, needs_ai_review
+
+MULTIPLY_CASES = [
+    {"call": "multiply(3, 4)", "expected": 12},
+    {"call": "multiply(-2, 5)", "expected": -10},
+]
+
+
+def test_return_values_and_printed_output_are_checked():
+    runner = CodeRunner(timeout=10)
+
+    report = runner.run("def multiply(a, b):\n    return a * b", MULTIPLY_CASES)
+    assert (report["passed"], report["total"]) == (2, 2)
+
+    report = runner.run("def multiply(a, b):\n    return a + b", MULTIPLY_CASES)
+    assert report["passed"] == 0
+    assert report["cases"][0]["error"] == "multiply(3, 4) returned 7, expected 12"
+
+    countdown = "def countdown(n):\n    for i in range(n, 0, -1):\n        print(i)"
+    report = runner.run(countdown, [{"call": "countdown(3)", "output": "3\n2\n1"}])
+    assert report["passed"] == 1
+
+    echo = "print(input().upper())"
+    report = runner.run(echo, [{"stdin": "hi\n", "output": "HI"}])
+    assert report["passed"] == 1
+
+
+def test_sandbox_enforces_limits_and_blocks_side_effects():
+    runner = CodeRunner(timeout=10, cpu_seconds=1, memory_mb=256)
+    cases = [{"call": "f()"}]
+
+    report = runner.run("def f():\n    while True:\n        pass", cases)
+    assert report["passed"] == 0
+    assert "limit exceeded" in report["cases"][0]["error"]
+
+    report = runner.run("def f():\n    return bytearray(2 * 1024**3)", cases)
+    assert report["cases"][0]["error"].startswith("MemoryError")
+
+    for code in (
+        "import socket\ndef f():\n    socket.socket()",
+        "import os\ndef f():\n    os.system('true')",
+        "def f():\n    open('out.txt', 'w')",
+        "import os\ndef f():\n    os.open('out.txt', os.O_CREAT | os.O_RDONLY)",
+        "def f():\n    return open('/etc/passwd').read()",
+        "import os\ndef f():\n    return os.listdir('/')",
+        "def f():\n    import _posixsubprocess",
+        "import os\ndef f():\n    os._exit(0)",
+    ):
+        report = runner.run(code, cases)
+        assert report["cases"][0]["error"].startswith("PermissionError"), code
+
+
+def test_changing_the_harness_globals_does_not_lift_the_sandbox():
+    runner = CodeRunner(timeout=10)
+    tamper = (
+        "import sys\n"
+        "assert not hasattr(sys.modules['__main__'], 'BLOCKED_EVENT_PREFIXES')\n"
+        "harness = sys._getframe(1).f_globals\n"
+        "harness['BLOCKED_EVENT_PREFIXES'] = ('zzz',)\n"
+        "harness['BLOCKED_MODULES'] = frozenset()\n"
+        "harness['WRITE_FLAGS'] = 0\n"
+    )
+    quiz_data = os.path.join(
+        os.path.dirname(HARNESS_PATH), "..", "data", "subjects", "python"
+    )
+    for code in (
+        "import socket\ndef f():\n    socket.create_connection(('1.1.1.1', 80), 1)",
+        "import subprocess\ndef f():\n    subprocess.run(['id'])",
+        f"import os\ndef f():\n    return os.listdir({quiz_data!r})",
+    ):
+        report = runner.run(tamper + code, [{"call": "f()"}])
+        assert report["cases"][0]["error"].startswith("PermissionError"), code
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+def test_operating_system_isolates_the_sandbox_without_the_audit_hook():
+    # What the kernel refuses even if the audit hook were lifted
+    script = (
+        "import json, os, socket, sys\n"
+        f"sys.path.insert(0, {os.path.dirname(HARNESS_PATH)!r})\n"
+        "import sandbox_harness\n"
+        "work_dir = os.getcwd()\n"
+        "roots = [work_dir, *map(os.path.realpath, sys.path)]\n"
+        "sandbox_harness._isolate(work_dir, roots)\n"
+        "outcomes = {}\n"
+        "for name, attempt in {\n"
+        "    'socket': socket.socket,\n"
+        "    'fork': os.fork,\n"
+        f"    'read': lambda: open({os.path.abspath(__file__)!r}).read(),\n"
+        "    'write': lambda: open('out.txt', 'w'),\n"
+        "}.items():\n"
+        "    try:\n"
+        "        attempt()\n"
+        "        outcomes[name] = 'allowed'\n"
+        "    except OSError:\n"
+        "        outcomes[name] = 'refused'\n"
+        "print(json.dumps(outcomes))\n"
+    )
+    with tempfile.TemporaryDirectory() as work_dir:
+        result = subprocess.run(
+            [sys.executable, "-I", "-c", script],
+            cwd=work_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    outcomes = json.loads(result.stdout)
+    assert outcomes == dict.fromkeys(outcomes, "refused") and len(outcomes) == 4
+
+
+def test_program_output_cannot_forge_the_report():
+    runner = CodeRunner(timeout=10)
+    forged = '{"cases": [{"passed": true, "output": "", "value": 12}]}'
+
+    for code in (
+        f"import sys\nsys.__stdout__.write('\\n' + {forged!r} + '\\n')",
+        f"import os\nos.write(1, b'\\n' + {forged!r}.encode() + b'\\n')",
+    ):
+        code += "\ndef multiply(a, b):\n    return 0"
+        report = runner.run(code, MULTIPLY_CASES)
+        assert report["passed"] == 0, code
+
+    # Expected values are compared outside the sandbox, as JSON
+    always_equal = "class Any:\n    def __eq__(self, other):\n        return True\n"
+    code = always_equal + "def multiply(a, b):\n    return Any()"
+    report = runner.run(code, MULTIPLY_CASES)
+    assert report["passed"] == 0
+
+
+def test_tested_coding_answers_are_graded_locally():
+    questions = [
+        {
+            "type": "coding",
+            "question": "Write multiply(a, b).",
+            "test_cases": MULTIPLY_CASES,
+            "tags": ["return values"],
+        },
+        {
+            "type": "coding",
+            "question": "Write add(a, b).",
+            "test_cases": [{"call": "add(1, 2)", "expected": 3}],
+            "tags": ["function definition"],
+        },
+        {"type": "coding", "question": "Explain your code.", "tags": []},
+    ]
+    answers = {
+        "q0": "def multiply(a, b):\n    return a + b",
+        "q1": "def add(a, b):\n    return a + b",
+        "q2": "# no tests",
+    }
+
+    graded = grade_submission(questions, answers, code_runner=CodeRunner(timeout=10))
+    assert [r["status"] for r in graded] == ["Incorrect", "Correct", "For AI Review"]
+    assert graded[0]["test_results"]["passed"] == 0
+    assert infer_weak_tags(graded, ["return values", "function definition"]) == [
+        "return values"
+    ]
+    assert needs_ai_review(graded)
+
+    # Without a runner, coding answers are still left for AI review
+    graded = grade_submission(questions, answers)
+    assert needs_ai_review(graded[:2])
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded, stat-validated content cache used by DataLoader.
+"""
+
+import json
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.content_cache import ContentCache
+from utils.data_loader import DataLoader
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def test_lru_eviction_by_bytes():
+    """Least recently used entries are evicted once the byte budget is exceeded."""
+    a, b, c = ("demo", "a", "quiz"), ("demo", "b", "quiz"), ("demo", "c", "quiz")
+    cache = ContentCache(max_bytes=100, max_entries=10)
+    cache.put(a, {"v": "a"}, 40, (1, 40, 1))
+    cache.put(b, {"v": "b"}, 40, (1, 40, 2))
+
+    # Touch "a" so that "b" becomes the eviction candidate
+    assert cache.get(a, (1, 40, 1)) == {"v": "a"}
+    cache.put(c, {"v": "c"}, 40, (1, 40, 3))
+
+    assert cache.get(b, (1, 40, 2)) is None
+    assert cache.get(a, (1, 40, 1)) == {"v": "a"}
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 80
+
+
+def test_signature_mismatch_is_a_miss():
+    """A changed stat signature drops the stale entry."""
+    key = ("demo", None, "config")
+    cache = ContentCache()
+    cache.put(key, {"v": 1}, 10, (1, 10, 1))
+    assert cache.get(key, (2, 10, 1)) is None
+    assert cache.stats()["stale"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_subtopic_invalidation_is_scoped():
+    """Ids that would collide when joined with underscores stay separate."""
+    cache = ContentCache()
+    cache.put(("data_science", "arrays", "quiz"), {"v": 1}, 10, (1, 10, 1))
+    cache.put(("data", "science_arrays", "quiz"), {"v": 2}, 10, (1, 10, 2))
+    cache.put_missing(("data_science", "arrays", "videos"))
+
+    assert cache.invalidate_subtopic("data_science", "arrays") == 2
+    assert cache.get(("data", "science_arrays", "quiz"), (1, 10, 2)) == {"v": 2}
+    assert cache.stats()["negative_entries"] == 0
+
+
+def test_data_loader_picks_up_edits_on_disk(tmp_path):
+    """Edits to a quiz file are visible without clearing the cache."""
+    quiz_path = tmp_path / "subjects" / "demo" / "basics" / "quiz_data.json"
+    _write_json(str(quiz_path), {"questions": [{"question": "one"}]})
+
+    loader = DataLoader(str(tmp_path))
+    assert len(loader.get_quiz_questions("demo", "basics")) == 1
+    assert len(loader.get_quiz_questions("demo", "basics")) == 1
+    assert loader.get_cache_stats()["hits"] == 1
+
+    _write_json(str(quiz_path), {"questions": [{"question": "one"}, {"question": "two"}]})
+    # Force a distinct mtime even on filesystems with coarse timestamps
+    os.utime(str(quiz_path), ns=(1, 1))
+    assert len(loader.get_quiz_questions("demo", "basics")) == 2
+
+
+def test_missing_files_are_negatively_cached(tmp_path):
+    """A missing file is stat'ed once per TTL and picked up after invalidation."""
+    loader = DataLoader(str(tmp_path), negative_cache_ttl=60)
+    assert loader.load_videos("demo", "basics") is None
+    assert loader.load_videos("demo", "basics") is None
+    assert loader.get_cache_stats()["negative_hits"] == 1
+
+    videos_path = tmp_path / "subjects" / "demo" / "basics" / "videos.json"
+    _write_json(str(videos_path), {"videos": {"intro": {"title": "Intro"}}})
+
+    # Still inside the TTL, so the new file is not seen yet
+    assert loader.load_videos("demo", "basics") is None
+
+    loader.clear_cache_for_subject_subtopic("demo", "basics")
+    assert loader.load_videos("demo", "basics") == {
+        "videos": {"intro": {"title": "Intro"}}
+    }
+    assert loader.get_cache_stats()["negative_entries"] == 0
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for set-based enrollment and roster imports.
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+from models import Class, ClassRegistration, User
+from utils.enrollment import enroll, parse_roster, resolve_students, unenroll
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'enrollment.sqlite3'}")
+    db.metadata.create_all(engine)
+    users = [
+        {
+            "id": i,
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "password_hash": "-",
+            "role": "teacher" if i <= 2 else "student",
+        }
+        for i in range(1, 1203)
+    ]
+    classes = [
+        {"id": 1, "name": "A", "code": "A", "teacher_id": 1},
+        {"id": 2, "name": "B", "code": "B", "teacher_id": 1},
+        {"id": 3, "name": "C", "code": "C", "teacher_id": 2},
+    ]
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), users)
+        connection.execute(Class.__table__.insert(), classes)
+    return engine
+
+
+def _count_statements(engine):
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, params, context, many: statements.append(
+            statement.split()[0]
+        ),
+    )
+    return statements
+
+
+def _pairs(session):
+    return set(
+        session.execute(
+            select(ClassRegistration.student_id, ClassRegistration.class_id)
+        ).all()
+    )
+
+
+def test_enroll_inserts_only_missing_pairs_in_bulk(engine):
+    with Session(engine) as session:
+        assert enroll(session, [3, 4], [1]) == 2
+        session.commit()
+
+        statements = _count_statements(engine)
+        assert enroll(session, range(3, 403), [1, 2, 3]) == 1198
+        session.commit()
+        assert statements == ["SELECT", "INSERT"]
+
+        assert enroll(session, [3, 4], [1, 2]) == 0
+        assert len(_pairs(session)) == 1200
+
+
+def test_unenroll_removes_only_the_teachers_classes(engine):
+    with Session(engine) as session:
+        enroll(session, range(3, 1203), [1, 2, 3])
+        session.commit()
+
+        statements = _count_statements(engine)
+        assert unenroll(session, [3], teacher_id=1) == 2
+        assert statements == ["DELETE"]
+        assert unenroll(session, range(3, 1203), teacher_id=1) == 1199 * 2
+        session.commit()
+
+        assert _pairs(session) == {(i, 3) for i in range(3, 1203)}
+
+
+def test_parse_and_resolve_rosters(engine):
+    csv_text = (
+        "Name,Email\nA,user3@example.com\nB,\nC,user3@example.com\nD,nobody@x.org\n"
+    )
+    assert parse_roster(csv_text, 10) == ["user3@example.com", "nobody@x.org"]
+    assert parse_roster(
+        {"students": ["user4", {"email": "user5@example.com"}, {"username": ""}]}, 10
+    ) == ["user4", "user5@example.com"]
+
+    with pytest.raises(ValueError):
+        parse_roster("name\nA\n", 10)
+    with pytest.raises(ValueError):
+        parse_roster({"students": ["user3"] * 11}, 10)
+    with pytest.raises(ValueError):
+        parse_roster(["user3"], 10)
+
+    with Session(engine) as session:
+        ids, not_found = resolve_students(
+            session, ["user3@example.com", "user4", "user1", "nobody@x.org"]
+        )
+    # Teachers are not enrolled as students
+    assert (ids, not_found) == ([3, 4], ["user1", "nobody@x.org"])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for local grading and deterministic weak-tag inference.
+"""
+
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.grading import grade_submission, infer_weak_tags, needs_ai_review
+
+QUESTIONS = [
+    {
+        "type": "multiple_choice",
+        "question": "Which keyword defines a function?",
+        "options": ["func", "def"],
+        "answer_index": 1,
+        "tags": ["function definition"],
+    },
+    {
+        "type": "fill_in_the_blank",
+        "question": "A function hands back a value with ____.",
+        "correct_answer": "return, return statement",
+        "tags": ["Return Values", "function definition"],
+    },
+    {
+        "type": "multiple_choice",
+        "question": "What does a function without return give back?",
+        "options": ["0", "None"],
+        "answer_index": 1,
+        "tags": ["return values"],
+    },
+]
+ALLOWED_TAGS = ["function definition", "return values", "scope"]
+
+
+def test_grading_matches_answer_rules():
+    graded = grade_submission(QUESTIONS, {"q0": "def", "q1": " Return "})
+    assert [r["status"] for r in graded] == ["Correct", "Correct", "Incorrect"]
+    assert graded[2]["answer"] == "[No answer provided]"
+    assert graded[2]["correct_answer"] == "None"
+    assert not needs_ai_review(graded)
+
+
+def test_weak_tags_use_weighted_miss_ratios():
+    # Missing q1 costs each of its two tags half a question: 1/3 miss ratio
+    graded = grade_submission(QUESTIONS, {"q0": "def", "q1": "yield", "q2": "None"})
+    assert infer_weak_tags(graded, ALLOWED_TAGS, mastery_threshold=0.8) == [
+        "function definition",
+        "return values",
+    ]
+    assert infer_weak_tags(graded, ALLOWED_TAGS, mastery_threshold=0.5) == []
+
+    # A fully missed tag ranks ahead of partially missed ones
+    graded = grade_submission(QUESTIONS, {"q0": "def", "q1": "yield", "q2": "0"})
+    assert infer_weak_tags(graded, ALLOWED_TAGS)[0] == "return values"
+
+
+def test_coding_questions_require_ai_review():
+    graded = grade_submission([{"type": "coding", "question": "Write f"}], {})
+    assert needs_ai_review(graded)
+    assert infer_weak_tags(graded, ALLOWED_TAGS) == []
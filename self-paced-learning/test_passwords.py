@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for configurable password hashing.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.passwords import PasswordHasher, PasswordHasherBusyError
+
+# Cheap parameters keep the tests fast
+FAST = "pbkdf2:sha256:1000"
+
+
+def test_hash_verify_and_rehash_detection():
+    hasher = PasswordHasher(method=FAST)
+    pwhash = hasher.hash("correct horse")
+
+    assert pwhash.startswith(FAST + "$")
+    assert hasher.verify(pwhash, "correct horse")
+    assert not hasher.verify(pwhash, "wrong")
+    assert not hasher.needs_rehash(pwhash)
+
+    # Hashes made with other parameters still verify, but should be upgraded
+    old = generate_password_hash("correct horse", method="pbkdf2:sha256:2000")
+    assert hasher.verify(old, "correct horse")
+    assert hasher.needs_rehash(old)
+
+    assert not hasher.verify("-", "anything")
+    assert not hasher.verify("md5$salt$hash", "anything")
+    assert hasher.stats()["verified"] == 5
+
+
+def test_default_parameters_are_normalized():
+    hasher = PasswordHasher(method="pbkdf2")
+    assert hasher.method_prefix.startswith("pbkdf2:sha256:")
+    assert not hasher.needs_rehash(generate_password_hash("x", method="pbkdf2"))
+
+    with pytest.raises(ValueError):
+        PasswordHasher(method="rot13")
+
+
+def test_pool_rejects_work_beyond_its_queue():
+    hasher = PasswordHasher(method=FAST, max_workers=1, max_pending=1)
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    results = []
+
+    def blocked():
+        started.release()
+        release.wait(5)
+        return "done"
+
+    # One call runs and one waits for the worker, so a third is turned away
+    threads = [
+        threading.Thread(target=lambda: results.append(hasher._run(blocked)))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    assert started.acquire(timeout=5)
+    while hasher.stats()["in_flight"] < 2:
+        time.sleep(0.01)
+
+    with pytest.raises(PasswordHasherBusyError):
+        hasher.verify("x", "x")
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["done", "done"]
+    assert hasher.stats()["rejected"] == 1
+
+    # Timed-out callers are answered as busy too
+    hasher = PasswordHasher(method=FAST, timeout=0.05)
+    release.clear()
+    with pytest.raises(PasswordHasherBusyError):
+        hasher._run(release.wait, 1)
+    assert hasher.stats()["timed_out"] == 1
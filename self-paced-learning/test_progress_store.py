@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for the coalescing video progress store.
+"""
+
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, event, select
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+from models import TopicProgress, User
+from utils.progress_store import ProgressStore
+
+PROGRESS = TopicProgress.__table__
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'progress.sqlite3'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "id": user_id,
+                    "username": f"student{user_id}",
+                    "email": f"student{user_id}@example.com",
+                    "password_hash": "-",
+                    "role": "student",
+                }
+                for user_id in (1, 2)
+            ],
+        )
+    return engine
+
+
+def _rows(engine):
+    with engine.connect() as connection:
+        return sorted(
+            connection.execute(
+                select(PROGRESS.c.user_id, PROGRESS.c.topic, PROGRESS.c.progress)
+            ).all()
+        )
+
+
+def test_updates_are_coalesced_into_one_upsert_per_topic(tmp_path):
+    engine = _engine(tmp_path)
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, params, context, many: statements.append(
+            many
+        ),
+    )
+    store = ProgressStore(lambda: engine, PROGRESS, flush_interval=60)
+
+    for progress in range(0, 101, 5):
+        store.update(1, "functions", progress)
+        store.update(2, "functions", progress / 2)
+    store.update_many(1, [("loops", 30), ("loops", 40)])
+    assert _rows(engine) == []  # Nothing written on the request path
+
+    statements.clear()
+    assert store.flush() == 3
+    assert statements == [True]
+    assert _rows(engine) == [
+        (1, "functions", 100.0),
+        (1, "loops", 40.0),
+        (2, "functions", 50.0),
+    ]
+
+    # A later flush updates the existing rows in place
+    store.update(1, "loops", 60)
+    assert store.flush() == 1
+    assert _rows(engine)[1] == (1, "loops", 60.0)
+    assert store.flush() == 0
+
+    stats = store.stats()
+    assert stats["updates"] == 45
+    assert stats["rows_written"] == 4
+    assert stats["pending"] == 0
+    store.close()
+
+
+def test_reads_include_pending_updates(tmp_path):
+    engine = _engine(tmp_path)
+    store = ProgressStore(lambda: engine, PROGRESS, flush_interval=60)
+
+    store.update(1, "functions", 100)
+    store.flush()
+    store.update(1, "loops", 20)
+    store.update(2, "loops", 90)
+
+    assert store.get_all(1) == {"functions": 100.0, "loops": 20}
+    assert store.get_all(3) == {}
+    store.close()
+
+
+def test_flushes_on_interval_and_close(tmp_path):
+    engine = _engine(tmp_path)
+
+    store = ProgressStore(lambda: engine, PROGRESS, flush_interval=0.1)
+    store.update(1, "functions", 10)
+    deadline = time.monotonic() + 5
+    while not _rows(engine) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _rows(engine) == [(1, "functions", 10.0)]
+    store.close()
+
+    store = ProgressStore(lambda: engine, PROGRESS, flush_interval=60)
+    store.update(1, "functions", 70)
+    store.close()
+    assert _rows(engine) == [(1, "functions", 70.0)]
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for token-budgeted prompt assembly.
+"""
+
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.ai_review import build_classification_prompt
+from utils.grading import grade_submission
+from utils.prompt_builder import (
+    PromptBuilder,
+    estimate_tokens,
+    format_submission_items,
+    shorten_text,
+)
+
+QUESTIONS = [
+    {
+        "type": "multiple_choice",
+        "question": f"Question number {i}?",
+        "options": ["yes", "no"],
+        "answer_index": 0,
+        "tags": ["loops"],
+    }
+    for i in range(40)
+]
+
+
+def test_estimate_and_shorten():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("def add(a, b):\n    return a + b") == 13
+
+    code = "\n".join(f"line_{i} = {i}" for i in range(200))
+    shortened = shorten_text(code, 60)
+    assert estimate_tokens(shortened) <= 70
+    assert shortened.startswith("line_0 = 0\n")
+    assert shortened.endswith("line_199 = 199")
+    assert "lines omitted" in shortened
+
+    blob = "x" * 10000
+    assert len(shorten_text(blob, 100)) < 1000
+    assert shorten_text("short", 100) == "short"
+
+
+def test_correct_answers_are_summarized_and_long_answers_shortened():
+    questions = QUESTIONS[:3] + [{"type": "coding", "question": "Write code."}]
+    answers = {"q0": "yes", "q1": "no", "q2": "yes", "q3": "print(1)\n" * 500}
+    items, summary = format_submission_items(
+        grade_submission(questions, answers), max_answer_tokens=50
+    )
+
+    assert summary == "Answered correctly (not listed): questions 1, 3\n\n"
+    assert len(items) == 2
+    assert items[0].startswith("Question 2 ")
+    assert estimate_tokens(items[1]) < 120
+
+
+def test_builder_keeps_items_within_budget():
+    builder = PromptBuilder("test", max_tokens=100, system_message="Be brief.")
+    builder.add("Static instructions.\n")
+    omitted = builder.add_fitting(
+        ["one two three four five\n"] * 30, part="items", reserve_tokens=10
+    )
+
+    assert omitted > 0
+    assert builder.used_tokens <= 90
+    budget = builder.budget(max_completion_tokens=500)
+    assert budget["omitted_items"] == omitted
+    assert set(budget["parts"]) == {"system", "static", "items"}
+
+
+def test_prompts_share_a_static_prefix_and_stay_bounded():
+    all_wrong = grade_submission(QUESTIONS, {f"q{i}": "no" for i in range(40)})
+    one_wrong = grade_submission(QUESTIONS, {"q0": "no"})
+
+    budget = {"prompt": 400}
+    large = build_classification_prompt(all_wrong, ["loops"], budget)
+    small = build_classification_prompt(one_wrong, ["loops", "functions"], budget)
+
+    prefix = large.split("You **MUST**")[0]
+    assert len(prefix) > 200
+    assert small.startswith(prefix)
+    assert estimate_tokens(large) <= 400
+    assert large.endswith("--- END OF SUBMISSION ---\n")
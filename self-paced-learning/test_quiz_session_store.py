@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for server-side quiz state and stable question ids.
+"""
+
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.data_loader import DataLoader, question_id
+from utils.quiz_session_store import create_quiz_session_store
+
+
+def test_stores_round_trip_and_expire(tmp_path):
+    for db_path in ("memory", str(tmp_path / "quiz_sessions.sqlite3")):
+        store = create_quiz_session_store(db_path)
+        store.set("sid", "python/functions", {"questions_served_for_analysis": ["a"]})
+        assert store.get("sid", "python/functions") == {
+            "questions_served_for_analysis": ["a"]
+        }
+        assert store.get("sid", "python/loops") is None
+
+        store.delete("sid", "python/functions")
+        assert store.get("sid", "python/functions") is None
+
+        expired = create_quiz_session_store(db_path, ttl_seconds=-1)
+        expired.set("old", "python/functions", {})
+        expired.set("older", "python/functions", {})
+        assert expired.get("old", "python/functions") is None
+        assert expired.purge_expired() >= 1
+        assert expired.get("older", "python/functions") is None
+
+
+def test_question_ids_resolve_in_served_order():
+    data_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    loader = DataLoader(data_root)
+    questions = loader.get_quiz_questions("python", "functions")
+    ids = [question_id(q) for q in reversed(questions)]
+
+    assert len(set(ids)) == len(ids)
+    assert loader.resolve_question_ids("python", "functions", ids) == list(
+        reversed(questions)
+    )
+    assert loader.resolve_question_ids("python", "functions", ["missing"]) == []
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for keyset-paginated teacher rosters.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+from models import Class, ClassRegistration, SubtopicProgress, User
+from utils.roster import decode_cursor, encode_cursor, roster_page
+
+
+def _engine(tmp_path, students=120):
+    engine = create_engine(f"sqlite:///{tmp_path / 'roster.sqlite3'}")
+    db.metadata.create_all(engine)
+    users = [
+        {
+            "id": i,
+            "username": f"user{i:04d}",
+            "email": f"user{i}@example.com",
+            "password_hash": "-",
+            "role": "teacher" if i <= 2 else "student",
+        }
+        for i in range(1, students + 3)
+    ]
+    classes = [
+        {"id": 1, "name": "A", "code": "A", "teacher_id": 1},
+        {"id": 2, "name": "B", "code": "B", "teacher_id": 1},
+        {"id": 3, "name": "C", "code": "C", "teacher_id": 2},
+    ]
+    # Every student is in class A, every third also in B, every fifth in C
+    registrations = [
+        {"student_id": i, "class_id": class_id}
+        for i in range(3, students + 3)
+        for class_id, every in ((1, 1), (2, 3), (3, 5))
+        if i % every == 0
+    ]
+    progress = [
+        {
+            "student_id": 3,
+            "subject": "python",
+            "subtopic": subtopic,
+            "attempts": attempts,
+            "best_score": score,
+            "last_score": score,
+            "last_activity": datetime(2026, 1, attempts),
+        }
+        for subtopic, attempts, score in (("functions", 2, 80.0), ("loops", 3, 40.0))
+    ]
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), users)
+        connection.execute(Class.__table__.insert(), classes)
+        connection.execute(ClassRegistration.__table__.insert(), registrations)
+        connection.execute(SubtopicProgress.__table__.insert(), progress)
+    return engine
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("o'brien:1", 42)) == ("o'brien:1", 42)
+    assert decode_cursor("not a cursor") is None
+    assert decode_cursor(encode_cursor("x", 1)[:-4]) is None
+
+
+def test_pages_cover_the_roster_with_one_query_each(tmp_path):
+    engine = _engine(tmp_path)
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, params, context, many: statements.append(
+            statement
+        ),
+    )
+
+    seen = []
+    pages = 0
+    after = None
+    with Session(engine) as session:
+        while True:
+            statements.clear()
+            students, cursor = roster_page(session, 1, after=after, limit=50)
+            assert len(statements) == 1
+            seen.extend(students)
+            pages += 1
+            if cursor is None:
+                break
+            after = decode_cursor(cursor)
+
+    assert pages == 3
+    assert [s["username"] for s in seen] == [f"user{i:04d}" for i in range(3, 123)]
+    by_id = {s["id"]: s for s in seen}
+    assert by_id[3]["enrollments"] == 2
+    assert by_id[4]["enrollments"] == 1
+    assert (by_id[3]["subtopics"], by_id[3]["attempts"]) == (2, 5)
+    assert by_id[3]["average_best"] == 60.0
+    assert by_id[3]["last_activity"] == datetime(2026, 1, 3)
+    assert (by_id[4]["subtopics"], by_id[4]["attempts"]) == (0, 0)
+
+    with Session(engine) as session:
+        students, cursor = roster_page(session, 2)
+    assert len(students) == 24 and cursor is None
+
+
+def test_roster_query_uses_the_teacher_and_class_indexes(tmp_path):
+    engine = _engine(tmp_path)
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, params, context, many: statements.append(
+            (statement, params)
+        ),
+    )
+    with Session(engine) as session:
+        roster_page(session, 1)
+        statement, params = statements[0]
+        plan = " ".join(
+            row[-1]
+            for row in session.connection().exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + statement, params
+            )
+        )
+
+    assert "ix_class_teacher_id" in plan
+    assert "ix_class_registration_class_id_student_id" in plan
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for single-flight coalescing of identical concurrent work.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.data_loader import DataLoader
+from utils.single_flight import SingleFlight
+
+
+def _run_concurrently(count, fn):
+    barrier = threading.Barrier(count)
+
+    def call():
+        barrier.wait()
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        futures = [pool.submit(call) for _ in range(count)]
+    return futures
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"answer": 42}
+
+    futures = _run_concurrently(8, lambda: flight.do("key", compute))
+    results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    stats = flight.stats()
+    assert (stats["leaders"], stats["coalesced"], stats["in_flight"]) == (1, 7, 0)
+
+    # Finished flights are not remembered
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+def test_leader_error_is_raised_in_every_caller():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    futures = _run_concurrently(4, lambda: flight.do("key", fail))
+    for future in futures:
+        with pytest.raises(RuntimeError, match="upstream down"):
+            future.result()
+    assert flight.do("key", lambda: "recovered") == "recovered"
+
+
+def test_cold_cache_loads_read_each_file_once(tmp_path, monkeypatch):
+    quiz_path = tmp_path / "subjects" / "python" / "functions" / "quiz_data.json"
+    quiz_path.parent.mkdir(parents=True)
+    quiz_path.write_text(json.dumps({"questions": [{"question": "Q1"}]}))
+
+    loader = DataLoader(str(tmp_path))
+    reads = []
+    original = loader._load_json_file
+
+    def slow_load(file_path):
+        reads.append(file_path)
+        time.sleep(0.1)
+        return original(file_path)
+
+    monkeypatch.setattr(loader, "_load_json_file", slow_load)
+    futures = _run_concurrently(
+        6, lambda: loader.load_quiz_data("python", "functions")
+    )
+
+    assert [future.result()["questions"] for future in futures] == [
+        [{"question": "Q1"}]
+    ] * 6
+    assert len(reads) == 1
+    assert loader.get_cache_stats()["single_flight"]["coalesced"] == 5
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for the persisted subject manifest behind DataLoader.discover_subjects.
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.data_loader import DataLoader
+
+
+def _create_subject(data_root, subject_id, name, subtopics=None):
+    subject_dir = os.path.join(data_root, "subjects", subject_id)
+    os.makedirs(subject_dir, exist_ok=True)
+    with open(os.path.join(subject_dir, "subject_info.json"), "w") as f:
+        json.dump({"name": name}, f)
+    with open(os.path.join(subject_dir, "subject_config.json"), "w") as f:
+        json.dump({"subtopics": subtopics or {}}, f)
+
+
+def test_discover_subjects_uses_manifest(tmp_path):
+    """Subjects are discovered once and then served from the manifest."""
+    data_root = str(tmp_path)
+    _create_subject(data_root, "python", "Python", {"functions": {}})
+    os.makedirs(os.path.join(data_root, "subjects", "incomplete"))
+
+    loader = DataLoader(data_root)
+    subjects = loader.discover_subjects()
+    assert list(subjects) == ["python"]
+    assert subjects["python"]["subtopic_count"] == 1
+    assert os.path.exists(os.path.join(data_root, ".subject_manifest.json"))
+
+    # Mutating the returned dict must not leak into the manifest
+    subjects["python"]["subtopics"] = {}
+    assert "subtopics" not in loader.discover_subjects()["python"]
+
+
+def test_admin_writes_update_manifest_and_other_workers(tmp_path):
+    """An incremental refresh bumps the version and is visible to other loaders."""
+    data_root = str(tmp_path)
+    _create_subject(data_root, "python", "Python")
+
+    worker_a = DataLoader(data_root)
+    worker_b = DataLoader(data_root)
+    version = worker_a.get_content_version("python")
+    assert worker_b.discover_subjects().keys() == {"python"}
+
+    _create_subject(data_root, "calculus", "Calculus")
+    worker_a.notify_content_changed("calculus")
+    worker_a.notify_content_changed("python", "functions")
+
+    assert worker_a.get_content_version("python") > version
+    assert set(worker_a.discover_subjects()) == {"calculus", "python"}
+
+    # Worker B re-checks the persisted manifest once its interval elapses
+    worker_b._manifest._next_check = 0
+    assert set(worker_b.discover_subjects()) == {"calculus", "python"}
+    assert worker_b.get_content_version("python") == worker_a.get_content_version(
+        "python"
+    )
+
+
+def test_subtopic_stats_follow_admin_writes(tmp_path):
+    """Content counts are precomputed and refreshed for the written subtopic only."""
+    data_root = str(tmp_path)
+    _create_subject(data_root, "python", "Python", {"functions": {}, "loops": {}})
+    quiz_path = os.path.join(data_root, "subjects", "python", "functions", "quiz_data.json")
+    os.makedirs(os.path.dirname(quiz_path))
+    with open(quiz_path, "w") as f:
+        json.dump({"questions": [{"question": "q1"}]}, f)
+
+    loader = DataLoader(data_root)
+    assert loader.get_subtopic_stats("python", "functions")["question_count"] == 1
+    assert loader.get_subtopic_stats("python", "loops")["question_count"] == 0
+
+    with open(quiz_path, "w") as f:
+        json.dump({"questions": [{"question": "q1"}, {"question": "q2"}]}, f)
+    loader.notify_content_changed("python", "functions")
+
+    assert loader.get_subtopic_stats("python", "functions")["question_count"] == 2
+
+
+def test_files_edited_on_disk_bump_the_version(tmp_path):
+    """Edits outside the admin panel are found by the background sweep."""
+    data_root = str(tmp_path)
+    _create_subject(data_root, "python", "Python", {"functions": {}})
+    quiz_path = os.path.join(data_root, "subjects", "python", "functions", "quiz_data.json")
+    os.makedirs(os.path.dirname(quiz_path))
+    with open(quiz_path, "w") as f:
+        json.dump({"questions": [{"question": "q1"}]}, f)
+
+    loader = DataLoader(data_root)
+    version = loader.get_content_version("python")
+
+    with open(quiz_path, "w") as f:
+        json.dump({"questions": [{"question": "q1"}, {"question": "q2"}]}, f)
+    loader._manifest._next_check = 0
+
+    # Requests do not stat content files; the sweep does
+    assert loader.get_content_version("python") == version
+    assert loader._manifest._sweeper[1].is_alive()
+    assert loader._manifest.sweep_files() == {"python": {"functions"}}
+
+    assert loader.get_content_version("python") > version
+    assert loader.get_subtopic_stats("python", "functions")["question_count"] == 2
+
+    # Other workers adopt the persisted update instead of bumping again
+    version = loader.get_content_version("python")
+    other = DataLoader(data_root)
+    assert other.get_content_version("python") == version
+
+
+def _refresh_repeatedly(data_root, subject, times, results):
+    loader = DataLoader(data_root)
+    for _ in range(times):
+        loader.notify_content_changed(subject)
+    results.put((subject, loader._manifest._subjects[subject]["content_version"]))
+
+
+def test_concurrent_workers_keep_each_others_updates(tmp_path):
+    """Writes from several processes are merged under the file lock."""
+    data_root = str(tmp_path)
+    subjects = ["python", "calculus", "biology", "history"]
+    for subject in subjects:
+        _create_subject(data_root, subject, subject.title())
+    DataLoader(data_root).discover_subjects()
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(target=_refresh_repeatedly, args=(data_root, subject, 20, results))
+        for subject in subjects
+    ]
+    for worker in workers:
+        worker.start()
+    last_written = dict(results.get(timeout=30) for _ in workers)
+    for worker in workers:
+        worker.join()
+
+    with open(os.path.join(data_root, ".subject_manifest.json")) as f:
+        persisted = json.load(f)["subjects"]
+    assert {
+        subject: persisted[subject]["content_version"] for subject in subjects
+    } == last_written
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for the inverted tag index used for lesson search and remedial quizzes.
+"""
+
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.tag_index import TagIndex
+
+
+def test_find_lessons_returns_matches_in_file_order():
+    index = TagIndex("python")
+    index.add_lesson("functions", "intro", {"title": "Intro", "tags": ["syntax"]})
+    index.add_lesson("functions", "scope", {"title": "Scope", "tags": ["scope"]})
+    index.add_lesson(
+        "loops", "for", {"title": "For", "tags": ["syntax", "iteration"]}
+    )
+
+    lessons = index.find_lessons(["iteration", "syntax", "unknown"])
+    assert [lesson["lesson_id"] for lesson in lessons] == ["intro", "for"]
+    assert lessons[1]["matching_tags"] == ["iteration", "syntax"]
+    assert lessons[1]["subtopic"] == "loops"
+
+
+def test_find_questions_is_scoped_and_deduplicated():
+    index = TagIndex("python")
+    index.add_questions(
+        "functions",
+        [
+            {"question": "Q1", "tags": ["return values"]},
+            {"question": "Q2", "tags": ["scope", "return values"]},
+            {"question": "Q1", "tags": ["scope"]},
+        ],
+    )
+    index.add_questions("loops", [{"question": "Q3", "tags": ["scope"]}])
+
+    questions = index.find_questions("functions", ["scope", "return values"])
+    assert [q["question"] for q in questions] == ["Q1", "Q2"]
+    assert questions[0]["tags"] == ["return values"]
+
+    # A repeated text with other tags still matches when the first does not
+    questions = index.find_questions("functions", ["scope"])
+    assert [q["question"] for q in questions] == ["Q2", "Q1"]
+    assert questions[1]["tags"] == ["scope"]
+    assert index.find_questions("sets", ["scope"]) == []
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for merged upserts and the progress aggregates written with attempts.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, select
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+from models import QuizAttempt, SubtopicProgress, TagMastery, User
+from utils.batch_writer import BatchWriter
+from utils.upsert import Upsert
+
+SUBTOPICS = Upsert(
+    SubtopicProgress.__table__,
+    keys=["student_id", "subject", "subtopic"],
+    add=["attempts"],
+    greatest=["best_score", "last_activity"],
+    replace=["last_score"],
+)
+TAGS = Upsert(
+    TagMastery.__table__,
+    keys=["student_id", "subject", "tag"],
+    add=["answered", "missed"],
+    greatest=["last_activity"],
+)
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'aggregates.sqlite3'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            {
+                "id": 1,
+                "username": "student",
+                "email": "student@example.com",
+                "password_hash": "-",
+                "role": "student",
+            },
+        )
+    return engine
+
+
+def _attempt(attempt_id, score, minute, missed):
+    submitted_at = datetime(2026, 1, 1, 12, minute)
+    return (
+        (
+            QuizAttempt.__table__,
+            [
+                {
+                    "id": attempt_id,
+                    "student_id": 1,
+                    "subject": "python",
+                    "subtopic": "functions",
+                    "quiz_type": "initial",
+                    "correct": score // 10,
+                    "total": 10,
+                    "submitted_at": submitted_at,
+                }
+            ],
+        ),
+        (
+            SUBTOPICS,
+            [
+                {
+                    "student_id": 1,
+                    "subject": "python",
+                    "subtopic": "functions",
+                    "attempts": 1,
+                    "best_score": float(score),
+                    "last_score": float(score),
+                    "last_activity": submitted_at,
+                }
+            ],
+        ),
+        (
+            TAGS,
+            [
+                {
+                    "student_id": 1,
+                    "subject": "python",
+                    "tag": "loops",
+                    "answered": 2.0,
+                    "missed": missed,
+                    "last_activity": submitted_at,
+                }
+            ],
+        ),
+    )
+
+
+def _summary(engine):
+    table = SubtopicProgress.__table__
+    with engine.connect() as connection:
+        return connection.execute(
+            select(
+                table.c.attempts,
+                table.c.best_score,
+                table.c.last_score,
+                table.c.last_activity,
+            )
+        ).all()
+
+
+def test_merge_combines_rows_sharing_a_key():
+    def row(subtopic, score, day):
+        return {
+            "student_id": 1,
+            "subject": "python",
+            "subtopic": subtopic,
+            "attempts": 1,
+            "best_score": score,
+            "last_score": score,
+            "last_activity": datetime(2026, 1, day),
+        }
+
+    rows = SUBTOPICS.merge(
+        [row("functions", 80.0, 1), row("loops", 10.0, 1), row("functions", 50.0, 2)]
+    )
+
+    assert len(rows) == 2
+    assert rows[0]["attempts"] == 2
+    assert rows[0]["best_score"] == 80.0
+    assert rows[0]["last_score"] == 50.0
+    assert rows[0]["last_activity"] == datetime(2026, 1, 2)
+
+
+def test_aggregates_are_updated_with_each_attempt_batch(tmp_path):
+    engine = _engine(tmp_path)
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, params, context, many: statements.append(
+            statement.split()[0]
+        ),
+    )
+    writer = BatchWriter(lambda: engine, flush_size=10_000, flush_interval=60)
+
+    writer.add(*_attempt("first", 60, minute=0, missed=1.0))
+    writer.add(*_attempt("second", 90, minute=5, missed=0.0))
+    statements.clear()
+    writer.flush()
+    # One insert for the attempts and one upsert per aggregate table
+    assert statements == ["INSERT", "INSERT", "INSERT"]
+
+    writer.add(*_attempt("third", 70, minute=9, missed=1.0))
+    writer.flush()
+    writer.close()
+
+    assert _summary(engine) == [(3, 90.0, 70.0, datetime(2026, 1, 1, 12, 9))]
+    with engine.connect() as connection:
+        tag = connection.execute(select(TagMastery.__table__)).one()
+    assert (tag.answered, tag.missed) == (6.0, 2.0)
+
+
+def test_update_then_insert_without_native_upsert(tmp_path):
+    engine = _engine(tmp_path)
+    engine.dialect.name = "generic"  # Take the portable path
+
+    with engine.begin() as connection:
+        for attempt_id, score, minute in (("a", 40, 1), ("b", 30, 2)):
+            _, (_, rows), _ = _attempt(attempt_id, score, minute, missed=0.0)
+            assert SUBTOPICS.execute(connection, rows) == 1
+
+    assert _summary(engine) == [(2, 40.0, 30.0, datetime(2026, 1, 1, 12, 2))]
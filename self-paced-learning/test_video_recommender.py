@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the local TF-IDF video recommender.
+"""
+
+import json
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.data_loader import DataLoader
+from utils.video_recommender import VideoRecommender, tokenize
+
+VIDEOS = [
+    {
+        "subject": "python",
+        "subtopic": "loops",
+        "key": "loops",
+        "title": "Python Loops: For and While",
+        "description": "Automate repetitive tasks with loops and iterables.",
+        "tags": ["for loops", "while loops"],
+    },
+    {
+        "subject": "python",
+        "subtopic": "functions",
+        "key": "functions",
+        "title": "Python Functions Masterclass",
+        "description": "Parameters, return values, and scope.",
+        "tags": ["return values", "function definition"],
+    },
+    {
+        "subject": "calculus",
+        "subtopic": "integrals",
+        "key": "integrals",
+        "title": "Integrals",
+        "description": "Definite and indefinite integrals and their applications.",
+        "tags": ["integration", "antiderivative"],
+    },
+]
+
+
+def test_tokenize_drops_stop_words_and_plurals():
+    assert tokenize("Learn the Loops, and *args") == ["loop", "arg"]
+    assert tokenize("class process") == ["class", "process"]
+
+
+def test_recommend_ranks_matching_videos():
+    recommender = VideoRecommender(VIDEOS)
+
+    results = recommender.recommend(["while loop", "return values"])
+    assert [video["key"] for video in results] == ["loops", "functions"]
+    assert results[0]["score"] >= results[1]["score"] > 0
+
+    assert recommender.recommend(["antiderivative"])[0]["key"] == "integrals"
+    assert recommender.recommend(["integrals"], subject="python") == []
+    assert recommender.recommend(["quantum chromodynamics"]) == []
+    assert VideoRecommender([]).recommend(["loops"]) == []
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def test_loader_rebuilds_recommender_when_content_changes(tmp_path):
+    subject_dir = tmp_path / "subjects" / "python"
+    _write_json(str(subject_dir / "subject_info.json"), {"name": "Python"})
+    _write_json(
+        str(subject_dir / "subject_config.json"), {"subtopics": {"functions": {}}}
+    )
+    _write_json(
+        str(subject_dir / "functions" / "lesson_plans.json"),
+        {"lessons": {"basics": {"title": "Basics", "tags": ["recursion"]}}},
+    )
+    _write_json(
+        str(subject_dir / "functions" / "videos.json"),
+        {"videos": {"functions": {"title": "Functions", "description": "Scope."}}},
+    )
+
+    loader = DataLoader(str(tmp_path))
+    recommender = loader.get_video_recommender()
+    assert loader.get_video_recommender() is recommender
+    assert recommender.recommend(["recursion"])[0]["subtopic"] == "functions"
+
+    _write_json(
+        str(subject_dir / "functions" / "videos.json"),
+        {"videos": {"lambdas": {"title": "Lambdas", "description": "Closures."}}},
+    )
+    loader.notify_content_changed("python", "functions")
+    assert [video["key"] for video in loader.get_video_recommender().videos] == [
+        "lambdas"
+    ]
@@ -0,0 +1,365 @@
+"""
+Shared gateway for outbound AI API calls.
+
+Every call goes through one process-wide gateway that caps concurrency with a
+semaphore, gives each logical call a deadline that covers all of its retries,
+retries transient errors with jittered exponential backoff, and trips a
+circuit breaker after repeated failures so that callers fail fast (and fall
+back to local results) while the API is unhealthy. A streamed call's deadline
+covers only the wait for its first chunk; after that each chunk must follow
+the previous one within an idle timeout, so long generations are not cut off.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class AIGatewayError(Exception):
+    """Base class for calls rejected or abandoned by the gateway."""
+
+
+class CircuitOpenError(AIGatewayError):
+    """Raised when the circuit breaker is open and calls are not attempted."""
+
+
+class GatewayBusyError(AIGatewayError):
+    """Raised when no concurrency slot frees up before the call's deadline."""
+
+
+class DeadlineExceededError(AIGatewayError):
+    """Raised when a call runs out of time, including time spent retrying."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial call."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize a closed breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, reporting an open breaker past its timeout as half-open."""
+        with self._lock:
+            if (
+                self._state == BREAKER_OPEN
+                and time.monotonic() - self._opened_at >= self.reset_timeout
+            ):
+                return BREAKER_HALF_OPEN
+            return self._state
+
+    @property
+    def consecutive_failures(self) -> int:
+        """Failed calls since the last success."""
+        return self._consecutive_failures
+
+    def allow(self) -> bool:
+        """Return True if a call may be attempted now."""
+        with self._lock:
+            if self._state == BREAKER_CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Half-open: let exactly one trial call through
+            if self._trial_in_flight:
+                return False
+            self._state = BREAKER_HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful call."""
+        with self._lock:
+            self._state = BREAKER_CLOSED
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the breaker at the threshold."""
+        with self._lock:
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if (
+                self._state == BREAKER_HALF_OPEN
+                or self._consecutive_failures >= self.failure_threshold
+            ):
+                if self._state != BREAKER_OPEN:
+                    self.times_opened += 1
+                self._state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot whose call ended without a verdict."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class GatewayCall:
+    """One logical AI call holding a concurrency slot; see AIGateway.reserve()."""
+
+    def __init__(self, gateway: "AIGateway", deadline: float):
+        self._gateway = gateway
+        self.deadline = deadline
+        self.streaming = False
+
+    def remaining(self) -> float:
+        """Seconds left before this call's deadline."""
+        return self.deadline - time.monotonic()
+
+    def check_deadline(self) -> None:
+        """Raise DeadlineExceededError if the deadline has passed."""
+        if self.remaining() <= 0:
+            raise DeadlineExceededError("AI call deadline exceeded")
+
+    def touch(self, idle_timeout: Optional[float] = None) -> None:
+        """
+        Note that a streamed response made progress.
+
+        Moves the deadline to idle_timeout seconds from now, so a stream is
+        abandoned only when it stalls, not when it is long. A deadline missed
+        after this no longer counts as a failure for the breaker.
+
+        Args:
+            idle_timeout: Seconds allowed until the next chunk; defaults to
+                the gateway's stream_idle_timeout
+        """
+        self.streaming = True
+        self.deadline = time.monotonic() + (
+            idle_timeout or self._gateway.stream_idle_timeout
+        )
+
+    def run(self, attempt: Callable[[float], T]) -> T:
+        """
+        Run attempt, retrying transient errors with jittered backoff.
+
+        Args:
+            attempt: Performs one try; receives the seconds left before the
+                deadline, to be used as its request timeout
+
+        Returns:
+            The first successful attempt's result
+
+        Raises:
+            DeadlineExceededError: If the deadline passes before a success
+            Exception: The last error, once retries are exhausted or an error
+                is not retryable
+        """
+        gateway = self._gateway
+        for attempt_number in range(gateway.max_retries + 1):
+            self.check_deadline()
+            try:
+                return attempt(self.remaining())
+            except gateway.retryable_errors:
+                if attempt_number == gateway.max_retries:
+                    raise
+
+            # Full jitter keeps callers that failed together from retrying together
+            backoff = random.uniform(
+                0, min(gateway.backoff_max, gateway.backoff_base * 2**attempt_number)
+            )
+            if backoff >= self.remaining():
+                raise DeadlineExceededError("No time left to retry the AI call")
+            gateway._count("retries")
+            time.sleep(backoff)
+
+        raise DeadlineExceededError("AI call deadline exceeded")
+
+
+class AIGateway:
+    """Process-wide concurrency limit, deadlines, retries and circuit breaker."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        call_timeout: float = 30.0,
+        stream_idle_timeout: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 4.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        retryable_errors: Tuple[Type[BaseException], ...] = (
+            TimeoutError,
+            ConnectionError,
+        ),
+        timeout_errors: Tuple[Type[BaseException], ...] = (TimeoutError,),
+    ):
+        """
+        Initialize the gateway.
+
+        Args:
+            max_concurrency: Maximum AI calls in flight in this process
+            call_timeout: Default seconds per logical call, including waiting
+                for a slot and all retries; for a streamed call, until the
+                stream starts
+            stream_idle_timeout: Default seconds a started stream may go
+                without a chunk; see GatewayCall.touch()
+            max_retries: Retries after the first attempt for transient errors
+            backoff_base: Backoff ceiling in seconds before the first retry;
+                doubles with each further retry
+            backoff_max: Maximum backoff ceiling in seconds
+            failure_threshold: Consecutive failed calls that open the breaker
+            reset_timeout: Seconds the breaker stays open before a trial call
+            retryable_errors: Exception types treated as transient; they are
+                retried and count as failures for the breaker
+            timeout_errors: Retryable exception types that mean a request
+                timed out; they are counted as timeouts rather than failures
+        """
+        self.max_concurrency = max_concurrency
+        self.call_timeout = call_timeout
+        self.stream_idle_timeout = stream_idle_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retryable_errors = tuple(retryable_errors)
+        self.timeout_errors = tuple(timeout_errors)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._counts = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "rejected_open": 0,
+            "rejected_busy": 0,
+        }
+        self._total_latency = 0.0
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += amount
+
+    def is_available(self) -> bool:
+        """Return False while the breaker is open and calls would be rejected."""
+        return self.breaker.state != BREAKER_OPEN
+
+    @contextmanager
+    def reserve(self, timeout: Optional[float] = None) -> Iterator[GatewayCall]:
+        """
+        Hold a concurrency slot for one logical call.
+
+        Use GatewayCall.run() inside the block to make the request. The
+        outcome of the block is reported to the circuit breaker; errors that
+        are neither transient nor timeouts do not count against the API, and
+        neither does a stream that started and then stalled.
+
+        Args:
+            timeout: Seconds for the whole call, or until a streamed call's
+                first GatewayCall.touch(); defaults to call_timeout
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            GatewayBusyError: If no slot frees up in time
+        """
+        deadline = time.monotonic() + (timeout or self.call_timeout)
+        self._count("calls")
+
+        if not self.breaker.allow():
+            self._count("rejected_open")
+            raise CircuitOpenError("AI circuit breaker is open")
+
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            self._waiting -= 1
+            if acquired:
+                self._in_flight += 1
+
+        if not acquired:
+            self._count("rejected_busy")
+            self.breaker.release_trial()
+            raise GatewayBusyError("No AI call slot became available in time")
+
+        started = time.monotonic()
+        gateway_call = GatewayCall(self, deadline)
+        try:
+            yield gateway_call
+        except (DeadlineExceededError,) + self.timeout_errors:
+            self._count("timeouts")
+            if gateway_call.streaming:
+                # The API answered; a stalled stream is no reason to stop calling it
+                self.breaker.release_trial()
+            else:
+                self.breaker.record_failure()
+            raise
+        except self.retryable_errors:
+            self._count("failures")
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+        else:
+            with self._lock:
+                self._counts["successes"] += 1
+                self._total_latency += time.monotonic() - started
+            self.breaker.record_success()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def call(self, attempt: Callable[[float], T], timeout: Optional[float] = None) -> T:
+        """
+        Make one logical call: reserve a slot and run attempt with retries.
+
+        Args:
+            attempt: Performs one try; receives the seconds left as its timeout
+            timeout: Seconds for the whole call; defaults to call_timeout
+
+        Returns:
+            The attempt's result
+        """
+        with self.reserve(timeout) as gateway_call:
+            return gateway_call.run(attempt)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report breaker state, saturation and call outcome counts."""
+        with self._lock:
+            counts = dict(self._counts)
+            in_flight, waiting = self._in_flight, self._waiting
+            total_latency = self._total_latency
+
+        return {
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "times_opened": self.breaker.times_opened,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": in_flight,
+            "waiting": waiting,
+            "saturation": round(in_flight / self.max_concurrency, 4),
+            "avg_latency_ms": (
+                round(total_latency / counts["successes"] * 1000, 1)
+                if counts["successes"]
+                else 0.0
+            ),
+            **counts,
+        }
@@ -0,0 +1,312 @@
+"""
+Background execution of AI quiz analyses.
+
+/analyze grades a submission and returns at once; the AI analysis runs on a
+bounded thread pool so request threads never wait on OpenAI. Job status and
+results are kept in SQLite, so any worker process can answer a poll or an
+event stream for a job started by another one. Running jobs may also report
+progress, such as the feedback text streamed so far.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_DONE, JOB_FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class AnalysisJobQueue:
+    """Bounded worker pool for AI analyses with a SQLite-backed job table."""
+
+    # Purge old jobs roughly once every this many submissions
+    PURGE_EVERY = 200
+
+    def __init__(
+        self,
+        db_path: str,
+        max_workers: int = 4,
+        max_pending: int = 64,
+        job_timeout: float = 300.0,
+        result_ttl: float = 60 * 60,
+        app=None,
+    ):
+        """
+        Initialize the queue and create its table if needed.
+
+        Args:
+            db_path: Path of the SQLite database file, or "memory" for a
+                process-local database
+            max_workers: Number of analyses run concurrently
+            max_pending: Maximum number of queued plus running jobs in this
+                process; further submissions raise QueueFullError
+            job_timeout: Seconds after which an unfinished job is reported as
+                failed, e.g. because the process running it died
+            result_ttl: Seconds a job is kept after its last update
+            app: Flask app whose context the tasks run in, if any
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.job_timeout = job_timeout
+        self.result_ttl = result_ttl
+        self._app = app
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ai-job"
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._updated = threading.Condition()
+        self._active = 0
+        self._counts = {"submitted": 0, "rejected": 0, JOB_DONE: 0, JOB_FAILED: 0}
+
+        if db_path == "memory":
+            # Shared-cache URI so every thread sees the same in-memory database
+            name = f"analysis_jobs_{secrets.token_hex(8)}"
+            self._db_uri = f"file:{name}?mode=memory&cache=shared"
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db_uri = f"file:{db_path}"
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_job ("
+                " job_id TEXT PRIMARY KEY,"
+                " owner TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " result TEXT,"
+                " error TEXT,"
+                " progress TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_analysis_job_updated_at"
+                " ON analysis_job (updated_at)"
+            )
+
+    @staticmethod
+    def new_job_id() -> str:
+        """Return a fresh, unguessable job id."""
+        return secrets.token_urlsafe(16)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_uri, uri=True, timeout=5.0)
+            if "mode=memory" not in self._db_uri:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(
+        self,
+        task: Callable[[], Dict[str, Any]],
+        payload: Dict[str, Any],
+        owner: str,
+        job_id: Optional[str] = None,
+    ) -> str:
+        """
+        Record a job and schedule it on the worker pool.
+
+        Args:
+            task: Callable returning the job result as a JSON-serializable dict;
+                an exception marks the job as failed
+            payload: Data available immediately, e.g. the locally graded score
+            owner: Quiz session id allowed to read the job
+            job_id: Id to use, e.g. one from new_job_id() that the caller
+                already stored elsewhere
+
+        Returns:
+            The job id
+
+        Raises:
+            QueueFullError: If max_pending jobs are already queued or running
+        """
+        with self._lock:
+            if self._active >= self.max_pending:
+                self._counts["rejected"] += 1
+                raise QueueFullError(
+                    f"{self._active} analyses already queued or running"
+                )
+            self._active += 1
+            self._counts["submitted"] += 1
+            submitted = self._counts["submitted"]
+
+        job_id = job_id or self.new_job_id()
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT INTO analysis_job"
+                    " (job_id, owner, status, payload, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, owner, JOB_PENDING, json.dumps(payload), now, now),
+                )
+            self._executor.submit(self._run, job_id, task)
+        except Exception:
+            with self._lock:
+                self._active -= 1
+            raise
+
+        if submitted % self.PURGE_EVERY == 0:
+            self.purge_expired()
+        return job_id
+
+    def _run(self, job_id: str, task: Callable[[], Dict[str, Any]]) -> None:
+        """Run one task on a pool thread, inside the app context if configured."""
+        try:
+            if self._app is not None:
+                with self._app.app_context():
+                    self._execute(job_id, task)
+            else:
+                self._execute(job_id, task)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _execute(self, job_id: str, task: Callable[[], Dict[str, Any]]) -> None:
+        """Call task and record its result or error."""
+        self._update(job_id, JOB_RUNNING)
+        try:
+            result = task()
+        except Exception as e:
+            if current_app:
+                current_app.logger.error(f"Analysis job {job_id} failed: {e}")
+            self._finish(job_id, JOB_FAILED, error=str(e) or e.__class__.__name__)
+        else:
+            self._finish(job_id, JOB_DONE, result=result)
+
+    def _finish(
+        self,
+        job_id: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Record a finished job."""
+        with self._lock:
+            self._counts[status] += 1
+        self._update(
+            job_id,
+            status,
+            result=json.dumps(result) if result is not None else None,
+            error=error,
+        )
+
+    def _update(self, job_id: str, status: str, result=None, error=None) -> None:
+        """Write a job's status and wake up anyone waiting for changes."""
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE analysis_job SET status = ?, result = ?, error = ?,"
+                " updated_at = ? WHERE job_id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+        with self._updated:
+            self._updated.notify_all()
+
+    def report_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        """
+        Record partial output of a running job and wake up waiting streams.
+
+        Each report replaces the previous one, so callers should send the
+        cumulative state (e.g. all feedback text so far) rather than deltas.
+        Reporting also keeps a long-running job from being timed out.
+
+        Args:
+            job_id: Id of the running job
+            progress: JSON-serializable partial result
+        """
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE analysis_job SET progress = ?, updated_at = ?"
+                " WHERE job_id = ? AND status = ?",
+                (json.dumps(progress), time.time(), job_id, JOB_RUNNING),
+            )
+        with self._updated:
+            self._updated.notify_all()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a job's current state.
+
+        Args:
+            job_id: Id returned by submit()
+
+        Returns:
+            Dictionary with job_id, owner, status, payload, result, error and
+            progress, or None if the job is unknown or expired
+        """
+        row = (
+            self._connection()
+            .execute(
+                "SELECT owner, status, payload, result, error, progress, updated_at"
+                " FROM analysis_job WHERE job_id = ?",
+                (job_id,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+
+        owner, status, payload, result, error, progress, updated_at = row
+        if (
+            status not in FINISHED_STATUSES
+            and updated_at < time.time() - self.job_timeout
+        ):
+            status, error = JOB_FAILED, "Analysis timed out."
+
+        return {
+            "job_id": job_id,
+            "owner": owner,
+            "status": status,
+            "payload": json.loads(payload),
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "progress": json.loads(progress) if progress else None,
+        }
+
+    def wait(self, timeout: float) -> None:
+        """
+        Block until any job of this process changes, or timeout elapses.
+
+        Jobs run by other processes are not signalled, so callers should
+        re-read the job after each wait rather than rely on a wakeup.
+        """
+        with self._updated:
+            self._updated.wait(timeout)
+
+    def purge_expired(self) -> int:
+        """Drop jobs not updated within result_ttl and return how many were removed."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM analysis_job WHERE updated_at <= ?",
+                (time.time() - self.result_ttl,),
+            )
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Report pool size, current load and job outcome counts for this process."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "active": self._active,
+                **self._counts,
+            }
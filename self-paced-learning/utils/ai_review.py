@@ -0,0 +1,323 @@
+"""
+Parallel AI review of quiz submissions.
+
+Instead of one large prompt covering the whole submission, each coding answer
+is reviewed by its own small request and the auto-graded answers are
+classified against the subject's tags by another, all running concurrently.
+Latency becomes that of the slowest single request, and every partial result
+is cached on its own, so a repeated coding answer is only reviewed once.
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from utils.analysis_cache import AnalysisCache
+from utils.grading import STATUS_AI_REVIEW, STATUS_CORRECT
+from utils.prompt_builder import (
+    PromptBuilder,
+    estimate_tokens,
+    format_submission_items,
+)
+
+# complete(prompt, system_message, max_tokens) -> response text or None
+CompletionFn = Callable[[str, str, int], Optional[str]]
+
+REVIEW_SYSTEM_MESSAGE = (
+    "You are an expert programming instructor. Your task is to review one "
+    "coding answer from a student's quiz and classify any weaknesses against "
+    "a predefined list of topics."
+)
+
+CLASSIFICATION_SYSTEM_MESSAGE = (
+    "You are an expert instructor. Your task is to classify a student's quiz "
+    "errors against a predefined list of topics."
+)
+
+
+REVIEW_PROMPT_PREFIX = (
+    "Review the student's answer to the coding question below. Evaluate whether the code:\n"
+    "1. Correctly solves the problem\n"
+    "2. Uses appropriate syntax and conventions\n"
+    "3. Demonstrates understanding of the underlying concepts\n"
+    "Compare their code with the provided sample solution.\n\n"
+    "Provide your review as a single JSON object with two keys:\n"
+    ' - "detailed_feedback": (string) Two to four sentences of feedback on this answer.\n'
+    ' - "weak_concept_tags": (JSON list of strings) Weak concepts from the ALLOWED TAGS list, or `[]`.\n\n'
+)
+
+CLASSIFICATION_PROMPT_PREFIX = (
+    "You are analyzing the multiple choice and fill-in-the-blank answers of a student's quiz.\n"
+    "Based on the incorrect answers, identify the concepts they are weak in.\n"
+    "Questions the student answered correctly are only listed by number.\n\n"
+    "Provide your analysis as a single JSON object with two keys:\n"
+    ' - "detailed_feedback": (string) A short summary of what they did well and what to review.\n'
+    ' - "weak_concept_tags": (JSON list of strings) Weak concepts from the ALLOWED TAGS list, or `[]`.\n\n'
+)
+
+
+# Token limits of each request: prompt (including the system message), the
+# longest student answer kept whole, and the completion
+DEFAULT_BUDGET = {"prompt": 3000, "answer": 400, "completion": 500}
+
+
+def _tags_line(allowed_tags: List[str]) -> str:
+    return (
+        "You **MUST** choose weak concepts from this predefined list ONLY: "
+        f"{json.dumps(allowed_tags)}\n\n"
+    )
+
+
+def build_review_prompt(
+    result: Dict[str, Any],
+    allowed_tags: List[str],
+    budget: Optional[Dict[str, int]] = None,
+) -> str:
+    """
+    Build the prompt reviewing a single coding answer.
+
+    Args:
+        result: Graded coding result
+        allowed_tags: Tags weak concepts must be chosen from
+        budget: Token limits overriding DEFAULT_BUDGET
+    """
+    budget = {**DEFAULT_BUDGET, **(budget or {})}
+    builder = PromptBuilder("coding review", budget["prompt"], REVIEW_SYSTEM_MESSAGE)
+    builder.add(REVIEW_PROMPT_PREFIX)
+    builder.add(_tags_line(allowed_tags), part="tags")
+    builder.add("--- START OF ANSWER ---\n")
+    items, _ = format_submission_items([result], budget["answer"])
+    builder.add("".join(items), part="submission")
+    builder.add("--- END OF ANSWER ---\n")
+    builder.log_budget(budget["completion"])
+    return builder.build()
+
+
+def build_classification_prompt(
+    results: List[Dict[str, Any]],
+    allowed_tags: List[str],
+    budget: Optional[Dict[str, int]] = None,
+) -> str:
+    """
+    Build the prompt classifying the auto-graded answers of a submission.
+
+    Args:
+        results: Graded results that are not coding answers
+        allowed_tags: Tags weak concepts must be chosen from
+        budget: Token limits overriding DEFAULT_BUDGET
+    """
+    budget = {**DEFAULT_BUDGET, **(budget or {})}
+    builder = PromptBuilder(
+        "tag classification", budget["prompt"], CLASSIFICATION_SYSTEM_MESSAGE
+    )
+    builder.add(CLASSIFICATION_PROMPT_PREFIX)
+    builder.add(_tags_line(allowed_tags), part="tags")
+    builder.add("--- START OF SUBMISSION ---\n")
+    items, correct_summary = format_submission_items(results, budget["answer"])
+    builder.add(correct_summary, part="submission")
+    submission_end = "--- END OF SUBMISSION ---\n"
+    builder.add_fitting(
+        items, part="submission", reserve_tokens=estimate_tokens(submission_end)
+    )
+    builder.add(submission_end)
+    builder.log_budget(budget["completion"])
+    return builder.build()
+
+
+def parse_json_object(text: str) -> Dict[str, Any]:
+    """
+    Extract the JSON object from an AI response.
+
+    Raises:
+        ValueError: If the response contains no valid JSON object
+    """
+    json_match = re.search(r"\{[\s\S]*\}", text)
+    if not json_match:
+        raise ValueError("The response did not contain a JSON object.")
+    parsed = json.loads(json_match.group(0))
+    if not isinstance(parsed, dict):
+        raise ValueError("The response JSON is not an object.")
+    return parsed
+
+
+class ParallelReviewer:
+    """Fans a submission's AI analysis out to concurrent, cacheable requests."""
+
+    def __init__(
+        self,
+        complete: CompletionFn,
+        cache: AnalysisCache,
+        max_workers: int = 4,
+        budget: Optional[Dict[str, int]] = None,
+        app=None,
+    ):
+        """
+        Initialize the reviewer.
+
+        Args:
+            complete: Sends one prompt and returns the response text, or None
+            cache: Cache storing each partial response
+            max_workers: Maximum number of requests run concurrently
+            budget: Token limits overriding DEFAULT_BUDGET
+            app: Flask app whose context the requests run in, if any
+        """
+        self.complete = complete
+        self.cache = cache
+        self.budget = {**DEFAULT_BUDGET, **(budget or {})}
+        self._app = app
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ai-review"
+        )
+
+    def review(
+        self,
+        subject: str,
+        subtopic: str,
+        content_version: int,
+        model: str,
+        graded: List[Dict[str, Any]],
+        allowed_tags: List[str],
+        on_progress: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Review a graded submission with one request per coding answer plus
+        one tag classification request for the remaining answers, made only
+        if one of them was missed.
+
+        Args:
+            subject: Subject name (e.g., "python")
+            subtopic: Subtopic name (e.g., "functions")
+            content_version: Subject content version, part of every cache key
+            model: Model name, part of every cache key
+            graded: Results from utils.grading.grade_submission()
+            allowed_tags: Tags weak concepts must be chosen from
+            on_progress: Called with the feedback assembled so far each time
+                a request finishes, in completion order
+
+        Returns:
+            Dictionary with the merged "feedback", the "weak_topics" found by
+            the AI (restricted to allowed_tags) and estimated "tokens" spent
+
+        Raises:
+            RuntimeError: If no request produced a usable response
+        """
+        coding = [r for r in graded if r["status"] == STATUS_AI_REVIEW]
+        others = [r for r in graded if r["status"] != STATUS_AI_REVIEW]
+
+        # future -> reviewed coding result, or None for the classification
+        tasks = {}
+        if any(r["status"] != STATUS_CORRECT for r in others):
+            prompt = build_classification_prompt(others, allowed_tags, self.budget)
+            key = AnalysisCache.make_key(
+                subject, subtopic, content_version, others, f"{model}/tags"
+            )
+            future = self._executor.submit(
+                self._request, key, prompt, CLASSIFICATION_SYSTEM_MESSAGE
+            )
+            tasks[future] = None
+        for result in coding:
+            prompt = build_review_prompt(result, allowed_tags, self.budget)
+            key = AnalysisCache.make_key(
+                subject, subtopic, content_version, [result], f"{model}/review"
+            )
+            future = self._executor.submit(
+                self._request, key, prompt, REVIEW_SYSTEM_MESSAGE
+            )
+            tasks[future] = result
+
+        responses: Dict[Optional[int], Dict[str, Any]] = {}
+        progress_sections = []
+        tokens = 0
+        for future in as_completed(tasks):
+            result = tasks[future]
+            response, spent = future.result()
+            tokens += spent
+            if response is None:
+                continue
+
+            index = result["index"] if result else None
+            responses[index] = response
+            if on_progress:
+                progress_sections.append(self._section(result, response))
+                on_progress("\n\n".join(progress_sections))
+
+        if not responses:
+            raise RuntimeError("Could not get analysis from AI.")
+
+        sections = []
+        if None in responses:
+            sections.append(self._section(None, responses[None]))
+        for result in coding:
+            response = responses.get(result["index"])
+            sections.append(
+                self._section(result, response)
+                if response
+                else f"Question {result['index'] + 1}: This answer could not be "
+                "reviewed automatically right now."
+            )
+
+        allowed = set(allowed_tags)
+        weak_topics = []
+        for index in [None] + [result["index"] for result in coding]:
+            for tag in (responses.get(index) or {}).get("weak_concept_tags", []):
+                if tag in allowed and tag not in weak_topics:
+                    weak_topics.append(tag)
+
+        return {
+            "feedback": "\n\n".join(sections),
+            "weak_topics": weak_topics,
+            "tokens": tokens,
+        }
+
+    def _request(
+        self, key: str, prompt: str, system_message: str
+    ) -> Tuple[Optional[Dict[str, Any]], int]:
+        """
+        Get one parsed response, from the cache when possible.
+
+        Runs on a pool thread, inside the app context if one was given.
+
+        Returns:
+            Tuple of (parsed response or None, estimated tokens spent)
+        """
+        if self._app is not None:
+            with self._app.app_context():
+                return self._request_in_context(key, prompt, system_message)
+        return self._request_in_context(key, prompt, system_message)
+
+    def _request_in_context(
+        self, key: str, prompt: str, system_message: str
+    ) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Implementation of _request()."""
+        cached = self.cache.get(key)
+        if cached is not None:
+            text = cached
+        else:
+            text = self.complete(prompt, system_message, self.budget["completion"])
+        if not text:
+            return None, 0
+
+        try:
+            response = parse_json_object(text)
+        except ValueError as e:
+            if current_app:
+                current_app.logger.error(f"Unusable AI review response: {e}")
+            return None, 0
+
+        if cached is not None:
+            return response, 0
+
+        tokens = estimate_tokens(system_message + prompt + text)
+        self.cache.set(key, text, tokens)
+        return response, tokens
+
+    @staticmethod
+    def _section(result: Optional[Dict[str, Any]], response: Dict[str, Any]) -> str:
+        """Format one response as a feedback paragraph."""
+        feedback = response.get("detailed_feedback", "No detailed feedback provided.")
+        if result is None:
+            return feedback
+        return f"Question {result['index'] + 1}: {feedback}"
@@ -0,0 +1,114 @@
+"""
+Helpers for consuming streamed chat completions.
+
+The analysis prompt asks for a JSON object. When the completion is streamed,
+the "detailed_feedback" string can be shown to the student while it is being
+generated; JsonStringFieldStream decodes that one field from the partial JSON
+text, and the full object is parsed once the stream ends.
+"""
+
+import json
+import re
+from typing import Iterable, Iterator
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+def iter_completion_text(stream: Iterable) -> Iterator[str]:
+    """
+    Yield the text deltas of a streamed chat completion.
+
+    Args:
+        stream: Chunks returned by client.chat.completions.create(stream=True)
+
+    Returns:
+        Iterator over non-empty content deltas
+    """
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            yield content
+
+
+class JsonStringFieldStream:
+    """Incrementally decodes one string field from JSON text fed in pieces."""
+
+    def __init__(self, field: str):
+        """
+        Initialize the decoder.
+
+        Args:
+            field: Name of the string field to decode (e.g. "detailed_feedback")
+        """
+        self._key_pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add streamed text and return the newly decoded part of the field value.
+
+        Escape sequences split across chunks are held back until complete.
+
+        Args:
+            chunk: Next piece of the streamed JSON text
+
+        Returns:
+            Decoded characters of the field value not returned before
+        """
+        self._buffer += chunk
+        if self.done:
+            return ""
+
+        if self._pos is None:
+            match = self._key_pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        decoded = []
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                pos += 1
+                continue
+
+            if pos + 1 >= len(buffer):
+                break
+            escape = buffer[pos + 1]
+            if escape != "u":
+                decoded.append(_SIMPLE_ESCAPES.get(escape, escape))
+                pos += 2
+                continue
+
+            # \uXXXX, possibly the first half of a surrogate pair
+            if pos + 6 > len(buffer):
+                break
+            length = 6
+            if 0xD800 <= int(buffer[pos + 2 : pos + 6], 16) < 0xDC00:
+                if pos + 12 > len(buffer):
+                    break
+                length = 12
+            decoded.append(json.loads(f'"{buffer[pos:pos + length]}"'))
+            pos += length
+
+        self._pos = pos
+        return "".join(decoded)
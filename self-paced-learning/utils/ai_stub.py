@@ -0,0 +1,108 @@
+"""
+Offline stand-in for the OpenAI client.
+
+Set AI_BACKEND=stub to run the app, load tests or demos without an API key.
+The stub answers chat completion requests with a canned analysis after a
+configurable delay, exposing the same attributes the app reads from the
+real client's responses, streamed or not.
+"""
+
+import json
+import re
+import time
+from types import SimpleNamespace
+from typing import Iterator, List
+
+
+def stub_completion_text(messages: List[dict]) -> str:
+    """
+    Return the canned completion text for a list of chat messages.
+
+    Analysis prompts get a JSON object naming the first allowed tag as weak
+    when the submission contains incorrect answers; any other prompt gets a
+    short plain-text answer.
+    """
+    prompt = messages[-1]["content"] if messages else ""
+    allowed_match = re.search(r"predefined list ONLY: (\[.*?\])", prompt)
+    if not allowed_match:
+        return "This is a stub response."
+
+    allowed_tags = json.loads(allowed_match.group(1))
+    reviewed = prompt.count("Status: For AI Review")
+    incorrect = prompt.count("Status: Incorrect")
+
+    weak_tags = allowed_tags[:1] if incorrect and allowed_tags else []
+    feedback = (
+        f"Stub analysis: {reviewed} coding answer(s) reviewed and "
+        f"{incorrect} incorrect answer(s) found. Keep practising the topics "
+        "listed below and retake the quiz when you are ready."
+    )
+    return json.dumps({"detailed_feedback": feedback, "weak_concept_tags": weak_tags})
+
+
+def split_into_tokens(text: str, size: int = 4) -> List[str]:
+    """Split text into roughly token-sized pieces for simulated streaming."""
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+class _StubCompletions:
+    """Implements chat.completions.create() for StubOpenAIClient."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def create(
+        self,
+        model: str,
+        messages: list,
+        max_tokens: int = 800,
+        stream: bool = False,
+        **kwargs,
+    ):
+        """
+        Return a canned completion, or an iterator of chunks if stream is set.
+
+        A streamed completion spreads the delay evenly across its chunks.
+        """
+        content = stub_completion_text(messages)
+        if stream:
+            return self._stream(model, content)
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        prompt = messages[-1]["content"] if messages else ""
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=len(prompt) // 4,
+                completion_tokens=len(content) // 4,
+                total_tokens=(len(prompt) + len(content)) // 4,
+            ),
+        )
+
+    def _stream(self, model: str, content: str) -> Iterator[SimpleNamespace]:
+        """Yield content in chunks shaped like the real client's stream."""
+        tokens = split_into_tokens(content)
+        pause = self.delay / len(tokens) if tokens else 0
+        for token in tokens:
+            if pause:
+                time.sleep(pause)
+            yield SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=token))],
+            )
+
+
+class StubOpenAIClient:
+    """Minimal object with the client.chat.completions.create() interface."""
+
+    def __init__(self, delay: float = 1.0):
+        """
+        Initialize the stub.
+
+        Args:
+            delay: Seconds each completion takes, to mimic API latency
+        """
+        self.chat = SimpleNamespace(completions=_StubCompletions(delay))
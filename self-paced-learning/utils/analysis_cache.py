@@ -0,0 +1,253 @@
+"""
+Content-addressed cache for AI quiz analyses.
+
+Students often submit identical answer patterns for the same quiz. The AI
+response for a submission is stored in SQLite under a hash of everything
+that shapes the prompt, so repeated submissions skip the OpenAI call.
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from utils.data_loader import question_id
+
+
+def normalize_graded_submission(graded: Iterable[Dict[str, Any]]) -> list:
+    """
+    Reduce graded questions to the parts that affect the AI analysis.
+
+    Answers are case- and whitespace-normalized for auto-graded questions;
+    for code only line endings and trailing whitespace are normalized.
+
+    Args:
+        graded: Results from utils.grading.grade_submission()
+
+    Returns:
+        JSON-serializable list describing the submission
+    """
+    normalized = []
+    for result in graded:
+        answer = str(result["answer"])
+        if result["type"] == "coding":
+            answer = "\n".join(
+                line.rstrip() for line in answer.replace("\r\n", "\n").split("\n")
+            ).strip()
+        else:
+            answer = " ".join(answer.split()).lower()
+
+        normalized.append(
+            [question_id(result["question"]), result["type"], result["status"], answer]
+        )
+    return normalized
+
+
+class AnalysisCache:
+    """SQLite-backed cache of AI analysis responses with TTL and size eviction."""
+
+    # Enforce TTL and size limits roughly once every this many writes
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: float = 7 * 24 * 60 * 60,
+        max_entries: int = 10000,
+    ):
+        """
+        Initialize the cache and create its table if needed.
+
+        Args:
+            db_path: Path of the SQLite database file, or "memory" for a
+                process-local database
+            ttl_seconds: Seconds an analysis stays valid after it was stored
+            max_entries: Maximum number of stored analyses; least recently
+                used ones are evicted first
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+        # Guards the counters below; requests use the cache from several threads
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._hits = 0
+        self._misses = 0
+
+        if db_path == "memory":
+            # Shared-cache URI so every thread sees the same in-memory database
+            name = f"analysis_cache_{secrets.token_hex(8)}"
+            self._db_uri = f"file:{name}?mode=memory&cache=shared"
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db_uri = f"file:{db_path}"
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                " cache_key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " tokens INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " hit_count INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_analysis_cache_last_access"
+                " ON analysis_cache (last_access)"
+            )
+
+    @staticmethod
+    def make_key(
+        subject: str,
+        subtopic: str,
+        content_version: int,
+        graded: Iterable[Dict[str, Any]],
+        model: str,
+    ) -> str:
+        """
+        Build the cache key for a graded submission.
+
+        Args:
+            subject: Subject name (e.g., "python")
+            subtopic: Subtopic name (e.g., "functions")
+            content_version: Subject content version from DataLoader
+            graded: Results from utils.grading.grade_submission()
+            model: OpenAI model the analysis is requested from
+
+        Returns:
+            Hex SHA-256 digest
+        """
+        payload = json.dumps(
+            [
+                subject,
+                subtopic,
+                content_version,
+                model,
+                normalize_graded_submission(graded),
+            ],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_uri, uri=True, timeout=5.0)
+            if "mode=memory" not in self._db_uri:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached AI response for key, if present and not expired.
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            Raw AI response text, or None on a miss
+        """
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT response FROM analysis_cache"
+                " WHERE cache_key = ? AND created_at > ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+
+            if row is None:
+                with self._lock:
+                    self._misses += 1
+                return None
+
+            conn.execute(
+                "UPDATE analysis_cache SET last_access = ?, hit_count = hit_count + 1"
+                " WHERE cache_key = ?",
+                (now, key),
+            )
+
+        with self._lock:
+            self._hits += 1
+        return row[0]
+
+    def set(self, key: str, response: str, tokens: int) -> None:
+        """
+        Store an AI response.
+
+        Args:
+            key: Key from make_key()
+            response: Raw AI response text
+            tokens: Tokens the request cost; reported as saved on every hit
+        """
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache"
+                " (cache_key, response, tokens, created_at, last_access, hit_count)"
+                " VALUES (?, ?, ?, ?, ?, 0)",
+                (key, response, tokens, now, now),
+            )
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Drop expired analyses and trim the cache to max_entries.
+
+        Returns:
+            Number of rows removed
+        """
+        with self._connection() as conn:
+            removed = conn.execute(
+                "DELETE FROM analysis_cache WHERE created_at <= ?",
+                (time.time() - self.ttl_seconds,),
+            ).rowcount
+            removed += conn.execute(
+                "DELETE FROM analysis_cache WHERE cache_key IN ("
+                " SELECT cache_key FROM analysis_cache"
+                " ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report hit rate and saved tokens.
+
+        Hit and miss counts are for this worker; entries, total hits and saved
+        tokens are read from the shared database.
+        """
+        row = (
+            self._connection()
+            .execute(
+                "SELECT COUNT(*), COALESCE(SUM(hit_count), 0),"
+                " COALESCE(SUM(hit_count * tokens), 0) FROM analysis_cache"
+            )
+            .fetchone()
+        )
+        with self._lock:
+            hits, misses = self._hits, self._misses
+        lookups = hits + misses
+        return {
+            "entries": row[0],
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "total_hits": row[1],
+            "saved_tokens": row[2],
+        }
@@ -0,0 +1,178 @@
+"""
+Per-request user loading and route guards.
+
+The logged-in user is loaded at most once per request, into g.user, and only
+by routes that need it. Identities are additionally kept in a short-lived
+in-process cache keyed by user id, so an authorized request usually costs
+no database query at all. The cache is invalidated when a user row changes
+in this process; the TTL bounds how long other processes may see old data.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from flask import abort, current_app, flash, g, jsonify, redirect, request, session
+
+
+class Identity(NamedTuple):
+    """The fields of a user that requests are authorized and rendered with."""
+
+    id: int
+    username: str
+    email: str
+    role: str
+    code: Optional[str]
+
+    @classmethod
+    def from_user(cls, user) -> "Identity":
+        """Copy the identity out of a User model instance."""
+        return cls(user.id, user.username, user.email, user.role, user.code)
+
+
+class IdentityCache:
+    """Thread-safe TTL cache of identities by user id."""
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Seconds an identity is reused before being loaded again
+            max_entries: Identities kept; the least recently used are evicted
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[float, Identity]]" = OrderedDict()
+        self._counts = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: int) -> Optional[Identity]:
+        """Get a cached identity, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._counts["hits"] += 1
+            return entry[1]
+
+    def put(self, identity: Identity) -> None:
+        """Cache an identity for the TTL."""
+        with self._lock:
+            self._entries[identity.id] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Forget a user's identity, e.g. after the user row changed."""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self._counts["invalidations"] += 1
+
+    def clear(self) -> None:
+        """Forget all identities."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report cache size and hit counts."""
+        with self._lock:
+            return {"entries": len(self._entries), "ttl": self.ttl, **self._counts}
+
+
+class Auth:
+    """Loads the current user for a Flask app and backs the route guards."""
+
+    def __init__(
+        self,
+        app,
+        load_identity: Callable[[int], Optional[Identity]],
+        cache: Optional[IdentityCache] = None,
+        login_url: str = "/login",
+    ):
+        """
+        Register the loader with the app.
+
+        Args:
+            app: Flask app; the instance is stored in app.extensions["auth"]
+            load_identity: Returns the identity of a user id, or None if the
+                user does not exist
+            cache: Identity cache, or None to load the user on every request
+            login_url: Where logged-out page requests are redirected
+        """
+        self.load_identity = load_identity
+        self.cache = cache
+        self.login_url = login_url
+        app.extensions["auth"] = self
+
+    def current_user(self) -> Optional[Identity]:
+        """Get the logged-in user's identity, loading it once per request."""
+        if "user" in g:
+            return g.user
+
+        user = None
+        user_id = session.get("user_id")
+        if user_id is not None:
+            user = self.cache.get(user_id) if self.cache else None
+            if user is None:
+                user = self.load_identity(user_id)
+                if user is not None and self.cache:
+                    self.cache.put(user)
+        g.user = user
+        return user
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user's cached identity."""
+        if self.cache:
+            self.cache.invalidate(user_id)
+
+
+def current_user() -> Optional[Identity]:
+    """Get the logged-in user's identity, or None."""
+    return current_app.extensions["auth"].current_user()
+
+
+def _deny(status: int):
+    # API clients get JSON, browsers a login redirect or a 403 page
+    if request.is_json or request.path.startswith("/api/"):
+        message = "Please log in first." if status == 401 else "Access denied."
+        return jsonify({"error": message}), status
+    if status == 401:
+        flash("Please log in first.")
+        return redirect(current_app.extensions["auth"].login_url)
+    abort(403)
+
+
+def login_required(view):
+    """Only let logged-in users through; g.user holds their identity."""
+
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if current_user() is None:
+            return _deny(401)
+        return view(*args, **kwargs)
+
+    return wrapped
+
+
+def role_required(*roles: str):
+    """Only let logged-in users with one of the given roles through."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            user = current_user()
+            if user is None:
+                return _deny(401)
+            if user.role not in roles:
+                return _deny(403)
+            return view(*args, **kwargs)
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,209 @@
+"""
+Buffered, batched database inserts for append-only records.
+
+Request handlers hand rows to a BatchWriter instead of inserting them
+directly. A background thread writes the buffered rows with one executemany
+per table, in a single transaction, whenever enough rows have accumulated or
+the flush interval has passed. Recording a quiz attempt therefore costs an
+in-memory append on the request path, not a database round-trip per row.
+
+Rows can also be merged into aggregate tables by giving an Upsert instead of
+a table, so summaries are updated in the same transaction as the rows they
+summarize.
+"""
+
+import atexit
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from flask import current_app
+from sqlalchemy import Table
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from utils.upsert import Upsert
+
+# Rows for one table (inserted, or merged by an Upsert), and a group of them
+# added (and dropped) together
+Target = Union[Table, Upsert]
+Chunk = Tuple[Target, List[Dict[str, Any]]]
+Group = List[Chunk]
+
+
+class BatchWriter:
+    """Buffers inserts and writes them in batches from a background thread."""
+
+    def __init__(
+        self,
+        engine_factory: Callable[[], Engine],
+        flush_size: int = 200,
+        flush_interval: float = 1.0,
+        max_buffered: int = 10000,
+        app=None,
+    ):
+        """
+        Initialize the writer and start its flush thread.
+
+        Args:
+            engine_factory: Returns the engine to write to; called inside the
+                app context if an app is given
+            flush_size: Buffered rows that trigger a flush
+            flush_interval: Maximum seconds a row waits before being written
+            max_buffered: Rows kept while the database is unavailable; the
+                oldest are dropped beyond this
+            app: Flask app whose context flushes run in, if any
+        """
+        self.engine_factory = engine_factory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._app = app
+
+        self._condition = threading.Condition()
+        self._buffer: List[Group] = []
+        self._buffered_rows = 0
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._counts = {"rows_written": 0, "batches": 0, "failures": 0, "dropped": 0}
+
+        self._thread = threading.Thread(
+            target=self._run, name="batch-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, *chunks: Chunk) -> None:
+        """
+        Queue rows for insertion, given as (table or upsert, rows) chunks.
+
+        The chunks of one call are kept together. Targets are written in the
+        order they were first added, so a parent table's chunk should come
+        before the chunks referencing it.
+        """
+        group = [(target, list(rows)) for target, rows in chunks if rows]
+        if not group:
+            return
+        with self._condition:
+            self._buffer.append(group)
+            self._buffered_rows += self._count_rows(group)
+            if self._buffered_rows >= self.flush_size:
+                self._condition.notify()
+
+    def flush(self) -> int:
+        """
+        Write all buffered rows now.
+
+        Returns:
+            Number of rows written
+        """
+        with self._flush_lock:
+            with self._condition:
+                groups, self._buffer = self._buffer, []
+                self._buffered_rows = 0
+            if not groups:
+                return 0
+
+            if self._app is not None:
+                with self._app.app_context():
+                    return self._write_groups(groups)
+            return self._write_groups(groups)
+
+    def close(self) -> None:
+        """Stop the flush thread and write what is left."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report buffered rows and write outcomes."""
+        with self._condition:
+            return {
+                "buffered": self._buffered_rows,
+                "flush_size": self.flush_size,
+                "flush_interval": self.flush_interval,
+                **self._counts,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while (
+                    not self._closed
+                    and self._buffered_rows < self.flush_size
+                    and time.monotonic() < deadline
+                ):
+                    self._condition.wait(max(0.0, deadline - time.monotonic()))
+                if self._closed:
+                    return
+            self.flush()
+
+    def _write_groups(self, groups: List[Group]) -> int:
+        try:
+            written = self._write(groups)
+        except OperationalError as e:
+            # The database is unreachable or busy: keep the rows for later
+            self._requeue(groups)
+            self._log_error(f"Batch insert failed, will retry: {e}")
+            return 0
+        except SQLAlchemyError as e:
+            # Some row is invalid: write the groups one by one, dropping the
+            # ones that fail so they cannot block every later batch
+            self._log_error(f"Batch insert failed, retrying row groups: {e}")
+            written = 0
+            for group in groups:
+                try:
+                    written += self._write([group])
+                except OperationalError:
+                    self._requeue([group])
+                except SQLAlchemyError as group_error:
+                    with self._condition:
+                        self._counts["dropped"] += self._count_rows(group)
+                    self._log_error(f"Dropped invalid rows: {group_error}")
+
+        with self._condition:
+            self._counts["rows_written"] += written
+            self._counts["batches"] += 1
+        return written
+
+    def _write(self, groups: List[Group]) -> int:
+        # One executemany per target, targets in first-seen order
+        by_target: Dict[Target, List[Dict[str, Any]]] = {}
+        for group in groups:
+            for target, rows in group:
+                by_target.setdefault(target, []).extend(rows)
+
+        written = 0
+        with self.engine_factory().begin() as connection:
+            for target, rows in by_target.items():
+                if isinstance(target, Upsert):
+                    written += target.execute(connection, rows)
+                else:
+                    connection.execute(target.insert(), rows)
+                    written += len(rows)
+        return written
+
+    def _requeue(self, groups: List[Group]) -> None:
+        with self._condition:
+            self._counts["failures"] += 1
+            self._buffer = groups + self._buffer
+            self._buffered_rows = sum(self._count_rows(g) for g in self._buffer)
+            while self._buffered_rows > self.max_buffered and self._buffer:
+                dropped = self._count_rows(self._buffer.pop(0))
+                self._buffered_rows -= dropped
+                self._counts["dropped"] += dropped
+
+    @staticmethod
+    def _count_rows(group: Group) -> int:
+        return sum(len(rows) for _, rows in group)
+
+    def _log_error(self, message: str) -> None:
+        if self._app is not None:
+            self._app.logger.error(message)
+        elif current_app:
+            current_app.logger.error(message)
@@ -0,0 +1,211 @@
+"""
+Local test runner for coding questions.
+
+Coding questions may declare "test_cases" in their JSON. Each submission is
+run by utils/sandbox_harness.py in a fresh, isolated Python interpreter with
+CPU, memory and wall-clock limits. The kernel isolates it: it has no network,
+cannot start processes, and sees a read-only file system holding only its
+working directory, the standard library and shared libraries. Without that
+isolation (e.g. on Windows) code is not run unless require_isolation is off.
+The sandbox only reports what each case returned and printed; expected
+results never enter it and are compared here. A bounded pool of worker
+threads keeps several sandboxes running at once, so the coding answers of a
+quiz are checked in parallel.
+
+Every submission gets its own short-lived interpreter rather than a reused
+pool process, so nothing one student's code does can leak into the next run.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+HARNESS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "sandbox_harness.py"
+)
+
+# The sandbox gets an empty environment, except what Windows needs to start
+SANDBOX_ENV = {key: os.environ[key] for key in ("SYSTEMROOT",) if key in os.environ}
+
+MAX_ERROR_LENGTH = 300
+
+# Only these keys of a test case are sent into the sandbox
+SANDBOX_CASE_KEYS = ("stdin", "call")
+
+# A submission is (student code, test cases from the question JSON)
+Submission = Tuple[str, List[Dict[str, Any]]]
+
+
+class CodeRunner:
+    """Runs coding answers against their test cases in sandboxed subprocesses."""
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        timeout: float = 5.0,
+        cpu_seconds: int = 2,
+        memory_mb: int = 256,
+        require_isolation: bool = True,
+    ):
+        """
+        Initialize the runner.
+
+        Args:
+            max_workers: Maximum sandboxes running at the same time
+            timeout: Wall-clock seconds allowed for one submission
+            cpu_seconds: CPU seconds allowed for one submission
+            memory_mb: Address space limit of a sandbox in megabytes
+            require_isolation: Refuse to run code when the operating system
+                cannot isolate the sandbox (see sandbox_harness._isolate);
+                only disable this for local development
+        """
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.require_isolation = require_isolation
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="code-runner"
+        )
+
+    def run(self, code: str, test_cases: List[Dict[str, Any]]) -> Optional[Dict]:
+        """
+        Run one submission against its test cases.
+
+        Args:
+            code: Student's code
+            test_cases: Test cases declared by the question
+
+        Returns:
+            Dictionary with "passed", "total" and per-case "cases" results, or
+            None if the sandbox itself could not run
+        """
+        job = json.dumps(
+            {
+                "code": code,
+                "test_cases": [
+                    {key: case[key] for key in SANDBOX_CASE_KEYS if key in case}
+                    for case in test_cases
+                ],
+                "cpu_seconds": self.cpu_seconds,
+                "memory_mb": self.memory_mb,
+                "require_isolation": self.require_isolation,
+            }
+        )
+        try:
+            with tempfile.TemporaryDirectory(prefix="quiz-code-") as work_dir:
+                completed = subprocess.run(
+                    [sys.executable, "-I", "-S", "-B", HARNESS_PATH],
+                    input=job,
+                    capture_output=True,
+                    text=True,
+                    timeout=self.timeout,
+                    cwd=work_dir,
+                    env=SANDBOX_ENV,
+                )
+        except subprocess.TimeoutExpired:
+            return self._failed(test_cases, "Time limit exceeded")
+        except OSError as e:
+            if current_app:
+                current_app.logger.error(f"Could not start code sandbox: {e}")
+            return None
+
+        status, results = self._parse_report(completed.stdout)
+        if status is None or (status["isolation_error"] and self.require_isolation):
+            reason = status["isolation_error"] if status else completed.stderr[-500:]
+            if current_app:
+                current_app.logger.error(f"Code sandbox could not run: {reason}")
+            return None
+        if results is None or len(results) != len(test_cases):
+            # Killed by a resource limit before reporting, e.g. SIGXCPU
+            error = (
+                "CPU time limit exceeded"
+                if completed.returncode < 0
+                else "The program exited before its tests finished"
+            )
+            return self._failed(test_cases, error)
+
+        cases = [
+            self._check_case(case, result) for case, result in zip(test_cases, results)
+        ]
+        passed = sum(1 for case in cases if case["passed"])
+        return {"passed": passed, "total": len(cases), "cases": cases}
+
+    def run_many(self, submissions: List[Submission]) -> List[Optional[Dict]]:
+        """
+        Run several submissions in parallel.
+
+        Returns:
+            Results of run(), in the order of the submissions
+        """
+        return list(self._executor.map(lambda s: self.run(*s), submissions))
+
+    @staticmethod
+    def _parse_report(stdout: str) -> Tuple[Optional[Dict], Optional[List[Dict]]]:
+        """
+        Split the harness output into its isolation status and case results.
+
+        The status is the first line, written before the student's code runs,
+        so the code cannot forge it. The results are the last line; the code
+        may have written lines of its own in between.
+
+        Returns:
+            The status and the case results, each None if missing or invalid
+        """
+        lines = stdout.strip("\n").split("\n")
+        status, results = _load_object(lines[0]), _load_object(lines[-1])
+        if status is None or "isolation_error" not in status:
+            status = None
+        if len(lines) == 1 or results is None or not isinstance(
+            results.get("cases"), list
+        ):
+            return status, None
+        return status, results["cases"]
+
+    @staticmethod
+    def _check_case(case: Dict[str, Any], result: Any) -> Dict[str, Any]:
+        """Compare what one case returned and printed with what it expects."""
+        if not isinstance(result, dict):
+            return {"passed": False, "error": "The sandbox sent an invalid report"}
+        if "error" in result:
+            return {"passed": False, "error": str(result["error"])[:MAX_ERROR_LENGTH]}
+
+        if "call" in case and "expected" in case:
+            if "value" not in result or result["value"] != case["expected"]:
+                error = (
+                    f"{case['call']} returned {result.get('repr')}, "
+                    f"expected {case['expected']!r}"
+                )
+                return {"passed": False, "error": error[:MAX_ERROR_LENGTH]}
+        if "output" in case:
+            printed = _normalize_output(str(result.get("output", "")))
+            expected_output = _normalize_output(case["output"])
+            if printed != expected_output:
+                error = f"Printed {printed!r}, expected {expected_output!r}"
+                return {"passed": False, "error": error[:MAX_ERROR_LENGTH]}
+        return {"passed": True}
+
+    @staticmethod
+    def _failed(test_cases: List[Dict[str, Any]], error: str) -> Dict[str, Any]:
+        return {
+            "passed": 0,
+            "total": len(test_cases),
+            "cases": [{"passed": False, "error": error} for _ in test_cases],
+        }
+
+
+def _normalize_output(text: str) -> str:
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def _load_object(line: str) -> Optional[Dict[str, Any]]:
+    try:
+        value = json.loads(line)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
@@ -0,0 +1,280 @@
+"""
+Bounded LRU cache for parsed content files.
+Entries are revalidated against the file's os.stat signature on every read.
+Missing files are remembered in a separate negative tier with its own TTL.
+
+Keys are (subject, subtopic, file_type) tuples, with subtopic None for
+subject-level files. Both tiers are indexed by subject and subtopic so that
+invalidating one subtopic only touches the entries that belong to it.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+# (subject, subtopic or None, file_type)
+CacheKey = Tuple[str, Optional[str], str]
+# (mtime_ns, size, inode) - changes whenever the file is rewritten or replaced
+StatSignature = Tuple[int, int, int]
+
+
+def stat_signature(stat_result: os.stat_result) -> StatSignature:
+    """Build the revalidation signature for a file from its stat result."""
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+
+class _CacheEntry:
+    """A cached value together with its size and the signature it was read at."""
+
+    __slots__ = ("value", "size", "signature")
+
+    def __init__(self, value: Any, size: int, signature: StatSignature):
+        self.value = value
+        self.size = size
+        self.signature = signature
+
+
+class ContentCache:
+    """Thread-safe LRU cache with byte-size accounting and stat revalidation."""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entries: int = 2048,
+        negative_ttl: float = 30.0,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Upper bound on the summed size of all cached entries.
+                Sizes are measured as the on-disk size of the source file.
+            max_entries: Upper bound on the number of cached entries, applied
+                separately to the positive and negative tiers
+            negative_ttl: Seconds a missing file is remembered before it is
+                stat'ed again
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[CacheKey, _CacheEntry]" = OrderedDict()
+        # key -> monotonic expiry time of the "file is missing" verdict
+        self._negative: "OrderedDict[CacheKey, float]" = OrderedDict()
+        # subject -> subtopic -> keys held in either tier
+        self._namespaces: Dict[str, Dict[Optional[str], Set[CacheKey]]] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evictions = 0
+        self._negative_hits = 0
+
+    def get(self, key: CacheKey, signature: StatSignature) -> Optional[Any]:
+        """
+        Return the cached value for key if it is still current.
+
+        Args:
+            key: Cache key
+            signature: Current stat signature of the backing file
+
+        Returns:
+            The cached value, or None on a miss or if the file has changed
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            if entry.signature != signature:
+                # File changed on disk since it was cached
+                self._remove(key)
+                self._stale += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+    def put(
+        self, key: CacheKey, value: Any, size: int, signature: StatSignature
+    ) -> None:
+        """
+        Store a value, evicting least recently used entries to stay within bounds.
+
+        Args:
+            key: Cache key
+            value: Parsed content to cache
+            size: Size of the entry in bytes
+            signature: Stat signature of the backing file when it was read
+        """
+        if size > self.max_bytes:
+            # Never cache something that would flush the whole cache
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._negative.pop(key, None)
+
+            self._entries[key] = _CacheEntry(value, size, signature)
+            self._bytes += size
+            self._index_add(key)
+
+            while self._entries and (
+                self._bytes > self.max_bytes or len(self._entries) > self.max_entries
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._evictions += 1
+
+    def is_known_missing(self, key: CacheKey) -> bool:
+        """
+        Check whether key was recently found to have no backing file.
+
+        Returns:
+            True while an unexpired negative entry exists for key
+        """
+        with self._lock:
+            expires_at = self._negative.get(key)
+            if expires_at is None or expires_at <= time.monotonic():
+                return False
+            self._negative_hits += 1
+            return True
+
+    def put_missing(self, key: CacheKey) -> bool:
+        """
+        Record that the file behind key does not exist.
+
+        Returns:
+            True if key was not already tracked as missing, i.e. this is the
+            first time the file has been seen to be absent
+        """
+        with self._lock:
+            is_new = key not in self._negative
+            self._negative[key] = time.monotonic() + self.negative_ttl
+            self._negative.move_to_end(key)
+            self._index_add(key)
+
+            while len(self._negative) > self.max_entries:
+                oldest_key, _ = self._negative.popitem(last=False)
+                self._index_discard(oldest_key)
+
+            return is_new
+
+    def invalidate(self, key: CacheKey) -> bool:
+        """
+        Drop a single entry from both the positive and negative tiers.
+
+        Returns:
+            True if an entry was removed
+        """
+        with self._lock:
+            return self._invalidate_key(key)
+
+    def invalidate_subtopic(self, subject: str, subtopic: Optional[str]) -> int:
+        """
+        Drop every entry belonging to one subject/subtopic.
+
+        Runs in time proportional to the number of entries in that subtopic.
+
+        Args:
+            subject: Subject name (e.g., "python")
+            subtopic: Subtopic name, or None for subject-level files
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            subtopics = self._namespaces.get(subject)
+            if not subtopics or subtopic not in subtopics:
+                return 0
+            keys = list(subtopics[subtopic])
+            return sum(1 for key in keys if self._invalidate_key(key))
+
+    def invalidate_subject(self, subject: str) -> int:
+        """
+        Drop every entry belonging to a subject, including all of its subtopics.
+
+        Args:
+            subject: Subject name (e.g., "python")
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            subtopics = self._namespaces.get(subject)
+            if not subtopics:
+                return 0
+            keys = [key for subtopic_keys in subtopics.values() for key in subtopic_keys]
+            return sum(1 for key in keys if self._invalidate_key(key))
+
+    def clear(self) -> None:
+        """Drop every entry. Counters are kept so hit rates survive a flush."""
+        with self._lock:
+            self._entries.clear()
+            self._negative.clear()
+            self._namespaces.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the cache counters for monitoring."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+                "evictions": self._evictions,
+                "negative_entries": len(self._negative),
+                "negative_ttl": self.negative_ttl,
+                "negative_hits": self._negative_hits,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _remove(self, key: CacheKey) -> None:
+        """Remove an entry and update byte accounting. Caller must hold the lock."""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        self._index_discard(key)
+
+    def _invalidate_key(self, key: CacheKey) -> bool:
+        """Drop key from both tiers. Caller must hold the lock."""
+        removed = self._negative.pop(key, None) is not None
+        if key in self._entries:
+            self._remove(key)
+            removed = True
+        elif removed:
+            self._index_discard(key)
+        return removed
+
+    def _index_add(self, key: CacheKey) -> None:
+        """Register key under its subject/subtopic. Caller must hold the lock."""
+        subject, subtopic, _ = key
+        self._namespaces.setdefault(subject, {}).setdefault(subtopic, set()).add(key)
+
+    def _index_discard(self, key: CacheKey) -> None:
+        """
+        Unregister key once it is held by neither tier. Caller must hold the lock.
+        """
+        if key in self._entries or key in self._negative:
+            return
+
+        subject, subtopic, _ = key
+        subtopics = self._namespaces.get(subject)
+        if subtopics is None or subtopic not in subtopics:
+            return
+
+        subtopics[subtopic].discard(key)
+        if not subtopics[subtopic]:
+            del subtopics[subtopic]
+            if not subtopics:
+                del self._namespaces[subject]
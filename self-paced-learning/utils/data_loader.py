@@ -3,24 +3,81 @@ DataLoader utility for dynamically loading subject and subtopic data from JSON f
 Handles error cases and provides caching for performance.
 """
 
+import hashlib
 import json
 import os
-from typing import Dict, List, Optional, Any
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Any
 from flask import current_app
 
+from utils.content_cache import CacheKey, ContentCache, stat_signature
+from utils.single_flight import SingleFlight
+from utils.subject_manifest import SubjectManifest, empty_subtopic_stats
+from utils.tag_index import TagIndex
+
+if TYPE_CHECKING:
+    from utils.video_recommender import VideoRecommender
+
+
+def question_id(question: Dict[str, Any]) -> str:
+    """
+    Get a stable, compact id for a question.
+
+    Uses the question's own "id" field when present, otherwise a hash of its
+    content, so the id stays the same across reloads and worker processes.
+
+    Args:
+        question: Question dictionary from quiz_data.json or question_pool.json
+
+    Returns:
+        Question id string
+    """
+    explicit_id = question.get("id")
+    if explicit_id:
+        return str(explicit_id)
+    canonical = json.dumps(question, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
 
 class DataLoader:
     """Handles loading of subject and subtopic data from JSON files."""
 
-    def __init__(self, data_root_path: str):
+    def __init__(
+        self,
+        data_root_path: str,
+        cache_max_bytes: int = 64 * 1024 * 1024,
+        cache_max_entries: int = 2048,
+        negative_cache_ttl: float = 30.0,
+    ):
         """
         Initialize the DataLoader with the root data path.
 
         Args:
             data_root_path: Path to the data directory (e.g., "/path/to/data")
+            cache_max_bytes: Byte budget for cached content files
+            cache_max_entries: Maximum number of cached content files
+            negative_cache_ttl: Seconds to remember that a content file is missing
         """
         self.data_root = data_root_path
-        self._cache = {}
+        self._cache = ContentCache(
+            max_bytes=cache_max_bytes,
+            max_entries=cache_max_entries,
+            negative_ttl=negative_cache_ttl,
+        )
+        # Concurrent misses on the same file share one read and parse
+        self._load_flights = SingleFlight()
+        self._manifest = SubjectManifest(
+            os.path.join(data_root_path, "subjects"),
+            os.path.join(data_root_path, ".subject_manifest.json"),
+        )
+        # Serializes building of the derived indexes below
+        self._index_lock = threading.Lock()
+        # subject -> (content version, TagIndex)
+        self._tag_indexes: Dict[str, tuple] = {}
+        # (versions of all subjects, VideoRecommender)
+        self._video_recommender: Optional[tuple] = None
+        # (subject, subtopic) -> (quiz data, pool data, {question id: question})
+        self._question_lookups: Dict[tuple, tuple] = {}
 
     def _load_json_file(self, file_path: str) -> Optional[Dict[str, Any]]:
         """
@@ -48,16 +105,60 @@ class DataLoader:
                 current_app.logger.error(f"Error loading JSON file {file_path}: {e}")
             return None
 
+    def _load_cached(self, cache_key: CacheKey, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a JSON file through the content cache.
+
+        The file is stat'ed on every call; a cached copy is only returned while its
+        mtime, size and inode still match, so edits on disk are picked up without
+        flushing the cache. Concurrent misses for the same file are coalesced
+        into a single read. Missing files are negatively cached, so an absent
+        optional file costs one stat per TTL interval rather than a failed open.
+
+        Args:
+            cache_key: Key to store the parsed data under
+            file_path: Absolute path to the JSON file
+
+        Returns:
+            Dictionary containing JSON data, or None if file doesn't exist or is corrupted
+        """
+        if self._cache.is_known_missing(cache_key):
+            return None
+
+        try:
+            file_stat = os.stat(file_path)
+        except (FileNotFoundError, NotADirectoryError):
+            if self._cache.put_missing(cache_key) and current_app:
+                current_app.logger.info(f"Content file not present: {file_path}")
+            return None
+        except OSError:
+            # Let _load_json_file report any other access problem
+            return self._load_json_file(file_path)
+
+        signature = stat_signature(file_stat)
+        cached = self._cache.get(cache_key, signature)
+        if cached is not None:
+            return cached
+
+        def load_and_cache():
+            data = self._load_json_file(file_path)
+            if data:
+                self._cache.put(cache_key, data, file_stat.st_size, signature)
+            return data
+
+        # Keyed by signature too, so a read of an outdated version is not shared
+        return self._load_flights.do((cache_key, signature), load_and_cache)
+
     def _get_cache_key(
         self, subject: str, subtopic: str = None, file_type: str = None
-    ) -> str:
-        """Generate a cache key for storing loaded data."""
-        if subtopic and file_type:
-            return f"{subject}_{subtopic}_{file_type}"
-        elif file_type:
-            return f"{subject}_{file_type}"
-        else:
-            return subject
+    ) -> CacheKey:
+        """
+        Generate a cache key for storing loaded data.
+
+        Keys are tuples rather than joined strings, so ids containing
+        underscores (e.g. "data_science") can never collide with each other.
+        """
+        return (subject, subtopic or None, file_type or "")
 
     def load_subject_config(self, subject: str) -> Optional[Dict[str, Any]]:
         """
@@ -70,19 +171,10 @@ class DataLoader:
             Dictionary containing subject config, or None if not found
         """
         cache_key = self._get_cache_key(subject, file_type="config")
-
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-
         config_path = os.path.join(
             self.data_root, "subjects", subject, "subject_config.json"
         )
-        config_data = self._load_json_file(config_path)
-
-        if config_data:
-            self._cache[cache_key] = config_data
-
-        return config_data
+        return self._load_cached(cache_key, config_path)
 
     def load_subject_info(self, subject: str) -> Optional[Dict[str, Any]]:
         """
@@ -95,19 +187,10 @@ class DataLoader:
             Dictionary containing subject info, or None if not found
         """
         cache_key = self._get_cache_key(subject, file_type="info")
-
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-
         info_path = os.path.join(
             self.data_root, "subjects", subject, "subject_info.json"
         )
-        info_data = self._load_json_file(info_path)
-
-        if info_data:
-            self._cache[cache_key] = info_data
-
-        return info_data
+        return self._load_cached(cache_key, info_path)
 
     def load_quiz_data(self, subject: str, subtopic: str) -> Optional[Dict[str, Any]]:
         """
@@ -121,19 +204,10 @@ class DataLoader:
             Dictionary containing quiz data, or None if not found
         """
         cache_key = self._get_cache_key(subject, subtopic, "quiz")
-
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-
         quiz_path = os.path.join(
             self.data_root, "subjects", subject, subtopic, "quiz_data.json"
         )
-        quiz_data = self._load_json_file(quiz_path)
-
-        if quiz_data:
-            self._cache[cache_key] = quiz_data
-
-        return quiz_data
+        return self._load_cached(cache_key, quiz_path)
 
     def load_question_pool(
         self, subject: str, subtopic: str
@@ -149,19 +223,10 @@ class DataLoader:
             Dictionary containing question pool, or None if not found
         """
         cache_key = self._get_cache_key(subject, subtopic, "questions")
-
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-
         pool_path = os.path.join(
             self.data_root, "subjects", subject, subtopic, "question_pool.json"
         )
-        pool_data = self._load_json_file(pool_path)
-
-        if pool_data:
-            self._cache[cache_key] = pool_data
-
-        return pool_data
+        return self._load_cached(cache_key, pool_path)
 
     def load_lesson_plans(
         self, subject: str, subtopic: str
@@ -177,19 +242,10 @@ class DataLoader:
             Dictionary containing lesson plans, or None if not found
         """
         cache_key = self._get_cache_key(subject, subtopic, "lessons")
-
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-
         lessons_path = os.path.join(
             self.data_root, "subjects", subject, subtopic, "lesson_plans.json"
         )
-        lessons_data = self._load_json_file(lessons_path)
-
-        if lessons_data:
-            self._cache[cache_key] = lessons_data
-
-        return lessons_data
+        return self._load_cached(cache_key, lessons_path)
 
     def load_videos(self, subject: str, subtopic: str) -> Optional[Dict[str, Any]]:
         """
@@ -203,19 +259,10 @@ class DataLoader:
             Dictionary containing video data, or None if not found
         """
         cache_key = self._get_cache_key(subject, subtopic, "videos")
-
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-
         videos_path = os.path.join(
             self.data_root, "subjects", subject, subtopic, "videos.json"
         )
-        videos_data = self._load_json_file(videos_path)
-
-        if videos_data:
-            self._cache[cache_key] = videos_data
-
-        return videos_data
+        return self._load_cached(cache_key, videos_path)
 
     def get_subject_keywords(self, subject: str) -> List[str]:
         """
@@ -271,6 +318,48 @@ class DataLoader:
             return pool_data.get("questions", [])
         return []
 
+    def resolve_question_ids(
+        self, subject: str, subtopic: str, question_ids: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Map question ids back to questions from the quiz and question pool.
+
+        Args:
+            subject: Subject name (e.g., "python")
+            subtopic: Subtopic name (e.g., "functions")
+            question_ids: Ids produced by question_id()
+
+        Returns:
+            Questions in the order of question_ids; ids that no longer exist
+            (e.g. the question was edited) are skipped
+        """
+        quiz_data = self.load_quiz_data(subject, subtopic)
+        pool_data = self.load_question_pool(subject, subtopic)
+
+        # The content cache hands out the same objects until a file changes,
+        # so identity tells us whether the lookup is still current
+        cached = self._question_lookups.get((subject, subtopic))
+        if cached and cached[0] is quiz_data and cached[1] is pool_data:
+            lookup = cached[2]
+        else:
+            lookup = {}
+            for data in (pool_data, quiz_data):
+                for question in (data or {}).get("questions", []):
+                    lookup[question_id(question)] = question
+            self._question_lookups[(subject, subtopic)] = (
+                quiz_data,
+                pool_data,
+                lookup,
+            )
+
+        questions = [lookup[qid] for qid in question_ids if qid in lookup]
+        if len(questions) != len(question_ids) and current_app:
+            current_app.logger.warning(
+                f"{len(question_ids) - len(questions)} served questions no longer "
+                f"exist in {subject}/{subtopic}"
+            )
+        return questions
+
     def get_quiz_title(self, subject: str, subtopic: str) -> str:
         """
         Get the title for a quiz.
@@ -290,8 +379,28 @@ class DataLoader:
         return f"{subject.title()} {subtopic.title()} Quiz"
 
     def clear_cache(self):
-        """Clear the internal cache."""
+        """Clear the internal cache and rescan subjects from disk."""
         self._cache.clear()
+        self._manifest.rebuild()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss/eviction counters for the content cache.
+
+        Returns:
+            Dictionary of cache statistics for this worker process, including
+            how many concurrent file loads were coalesced
+        """
+        return {**self._cache.stats(), "single_flight": self._load_flights.stats()}
+
+    def clear_cache_for_subject(self, subject: str):
+        """
+        Clear all cache entries for a subject, including its subtopics.
+
+        Args:
+            subject: Subject name (e.g., "python")
+        """
+        self._cache.invalidate_subject(subject)
 
     def clear_cache_for_subject_subtopic(self, subject: str, subtopic: str):
         """
@@ -301,14 +410,8 @@ class DataLoader:
             subject: Subject name (e.g., "python")
             subtopic: Subtopic name (e.g., "functions")
         """
-        # Clear all cache entries for this subject/subtopic
-        cache_keys_to_remove = []
-        for key in self._cache.keys():
-            if key.startswith(f"{subject}_{subtopic}_"):
-                cache_keys_to_remove.append(key)
-
-        for key in cache_keys_to_remove:
-            del self._cache[key]
+        # Only entries namespaced under this subject/subtopic are touched
+        self._cache.invalidate_subtopic(subject, subtopic)
 
     def validate_subject_subtopic(self, subject: str, subtopic: str) -> bool:
         """
@@ -330,130 +433,211 @@ class DataLoader:
         quiz_path = os.path.join(subtopic_path, "quiz_data.json")
         return os.path.exists(quiz_path)
 
-    def find_lessons_by_tags(
-        self, subject: str, target_tags: List[str]
-    ) -> List[Dict[str, Any]]:
+    def get_tag_index(self, subject: str) -> TagIndex:
         """
-        Find lessons that match any of the target tags.
+        Get the tag index for a subject, building it once per content version.
 
         Args:
             subject: Subject name (e.g., "python")
-            target_tags: List of tags to search for
 
         Returns:
-            List of matching lessons with metadata
+            TagIndex over the subject's lessons and question pools
+        """
+        version = self.get_content_version(subject)
+        cached = self._tag_indexes.get(subject)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        with self._index_lock:
+            cached = self._tag_indexes.get(subject)
+            if cached and cached[0] == version:
+                return cached[1]
+
+            tag_index = TagIndex(subject)
+            subject_config = self.load_subject_config(subject) or {}
+            for subtopic_id in subject_config.get("subtopics", {}):
+                lesson_plans = self.load_lesson_plans(subject, subtopic_id) or {}
+                for lesson_id, lesson_data in lesson_plans.get("lessons", {}).items():
+                    tag_index.add_lesson(subtopic_id, lesson_id, lesson_data)
+
+                tag_index.add_questions(
+                    subtopic_id, self.get_question_pool_questions(subject, subtopic_id)
+                )
+
+            self._tag_indexes[subject] = (version, tag_index)
+            return tag_index
+
+    def get_video_recommender(self) -> "VideoRecommender":
         """
-        matching_lessons = []
+        Get the video recommender over all subjects' videos.
 
-        try:
-            # Get all subtopics for the subject
-            subject_config = self.load_subject_config(subject)
-            if not subject_config or "subtopics" not in subject_config:
-                return matching_lessons
-
-            # Search through all subtopics
-            for subtopic_id in subject_config["subtopics"].keys():
-                lesson_plans = self.load_lesson_plans(subject, subtopic_id)
-                if not lesson_plans or "lessons" not in lesson_plans:
-                    continue
-
-                # Check each lesson in the subtopic
-                for lesson_id, lesson_data in lesson_plans["lessons"].items():
-                    lesson_tags = set(lesson_data.get("tags", []))
-                    target_tags_set = set(target_tags)
-
-                    # If any lesson tags match target tags
-                    if not lesson_tags.isdisjoint(target_tags_set):
-                        matching_lessons.append(
+        The index is rebuilt when any subject's content version changes, so
+        recommendations stay consistent with data/subjects.
+
+        Returns:
+            VideoRecommender indexing every video with its subtopic's lesson tags
+        """
+        subjects = self.discover_subjects()
+        versions = tuple(
+            (subject, self.get_content_version(subject)) for subject in sorted(subjects)
+        )
+        cached = self._video_recommender
+        if cached and cached[0] == versions:
+            return cached[1]
+
+        with self._index_lock:
+            cached = self._video_recommender
+            if cached and cached[0] == versions:
+                return cached[1]
+
+            # numpy is only imported by processes that recommend videos
+            from utils.video_recommender import VideoRecommender
+
+            videos = []
+            for subject, _ in versions:
+                for subtopic_id, counts in self.get_subtopic_stats(subject).items():
+                    if not counts.get("video_count"):
+                        continue
+
+                    lesson_plans = self.load_lesson_plans(subject, subtopic_id) or {}
+                    tags = []
+                    for lesson in lesson_plans.get("lessons", {}).values():
+                        tags.extend(lesson.get("tags", []))
+
+                    video_data = self.load_videos(subject, subtopic_id) or {}
+                    for key, video in video_data.get("videos", {}).items():
+                        videos.append(
                             {
+                                **video,
                                 "subject": subject,
                                 "subtopic": subtopic_id,
-                                "lesson_id": lesson_id,
-                                "title": lesson_data.get("title", ""),
-                                "tags": lesson_data.get("tags", []),
-                                "matching_tags": list(
-                                    lesson_tags.intersection(target_tags_set)
-                                ),
+                                "key": key,
+                                "tags": tags,
                             }
                         )
 
+            recommender = VideoRecommender(videos)
+            self._video_recommender = (versions, recommender)
+            if current_app:
+                current_app.logger.info(
+                    f"Built video recommender: {len(videos)} videos, "
+                    f"{len(recommender.vocabulary)} terms"
+                )
+            return recommender
+
+    def find_lessons_by_tags(
+        self, subject: str, target_tags: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Find lessons that match any of the target tags.
+
+        Args:
+            subject: Subject name (e.g., "python")
+            target_tags: List of tags to search for
+
+        Returns:
+            List of matching lessons with metadata
+        """
+        try:
+            return self.get_tag_index(subject).find_lessons(target_tags)
         except Exception as e:
-            current_app.logger.error(f"Error finding lessons by tags: {e}")
+            if current_app:
+                current_app.logger.error(f"Error finding lessons by tags: {e}")
+            return []
+
+    def find_questions_by_tags(
+        self, subject: str, subtopic: str, target_tags: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Find question pool entries that match any of the target tags.
+
+        Args:
+            subject: Subject name (e.g., "python")
+            subtopic: Subtopic whose question pool to search
+            target_tags: List of tags to search for
 
-        return matching_lessons
+        Returns:
+            Matching questions in pool order, deduplicated by question text
+        """
+        try:
+            return self.get_tag_index(subject).find_questions(subtopic, target_tags)
+        except Exception as e:
+            if current_app:
+                current_app.logger.error(f"Error finding questions by tags: {e}")
+            return []
 
     def discover_subjects(self) -> Dict[str, Dict[str, Any]]:
         """
-        Auto-discover subjects by scanning the subjects directory for folders
-        containing subject_info.json files.
+        Get all subjects that have both subject_info.json and subject_config.json.
+
+        Served from the subject manifest, so no directory scan or JSON parse
+        happens on the request path.
 
         Returns:
             Dictionary of subjects in the same format as subjects.json
         """
-        subjects = {}
-        subjects_dir = os.path.join(self.data_root, "subjects")
-
-        if not os.path.exists(subjects_dir):
-            if current_app:
-                current_app.logger.warning(
-                    f"Subjects directory not found: {subjects_dir}"
-                )
-            return subjects
-
         try:
-            # Scan all directories in the subjects folder
-            for item in os.listdir(subjects_dir):
-                subject_path = os.path.join(subjects_dir, item)
-
-                # Skip if not a directory
-                if not os.path.isdir(subject_path):
-                    continue
-
-                # Look for subject_info.json
-                subject_info_path = os.path.join(subject_path, "subject_info.json")
-                subject_config_path = os.path.join(subject_path, "subject_config.json")
-
-                # Subject must have both files to be valid
-                if os.path.exists(subject_info_path) and os.path.exists(
-                    subject_config_path
-                ):
-                    subject_info = self._load_json_file(subject_info_path)
-                    subject_config = self._load_json_file(subject_config_path)
-
-                    if subject_info and subject_config:
-                        # Calculate subtopic count
-                        subtopic_count = len(subject_config.get("subtopics", {}))
-
-                        # Merge info and add calculated fields
-                        subjects[item] = {
-                            **subject_info,
-                            "subtopic_count": subtopic_count,
-                            "status": subject_info.get("status", "active"),
-                            "created_date": subject_info.get(
-                                "created_date", "2025-01-01"
-                            ),
-                        }
-
-                        if current_app:
-                            current_app.logger.info(
-                                f"Discovered subject: {item} - {subject_info.get('name', 'Unknown')}"
-                            )
-                    else:
-                        if current_app:
-                            current_app.logger.warning(
-                                f"Invalid subject files in directory: {item}"
-                            )
-                else:
-                    if current_app:
-                        current_app.logger.debug(
-                            f"Skipping directory (missing required files): {item}"
-                        )
-
+            return self._manifest.get_subjects()
         except Exception as e:
             if current_app:
                 current_app.logger.error(f"Error discovering subjects: {e}")
+            return {}
+
+    def get_content_version(self, subject: str) -> int:
+        """
+        Get the current content version of a subject.
+
+        Args:
+            subject: Subject name (e.g., "python")
+
+        Returns:
+            Version number that changes whenever the subject's content changes
+        """
+        return self._manifest.get_content_version(subject)
+
+    def get_subtopic_stats(self, subject: str, subtopic: str = None) -> Dict[str, Any]:
+        """
+        Get precomputed content counts without opening any content file.
+
+        Args:
+            subject: Subject name (e.g., "python")
+            subtopic: Subtopic name; if omitted, counts for every subtopic are returned
 
-        return subjects
+        Returns:
+            Counts (question_count, pool_count, lesson_count, video_count) for one
+            subtopic, or a dictionary of such counts keyed by subtopic id
+        """
+        all_stats = self._manifest.get_subtopic_stats(subject)
+        if subtopic is None:
+            return all_stats
+        return all_stats.get(subtopic, empty_subtopic_stats())
+
+    def notify_content_changed(self, subject: str, subtopic: str = None):
+        """
+        Record that files of a subject (or one of its subtopics) were written.
+
+        Drops the affected cache entries and refreshes the subject's manifest
+        entry. Every admin write path must call this after saving.
+
+        Args:
+            subject: Subject name (e.g., "python")
+            subtopic: Subtopic name, or None if subject-level files changed
+        """
+        if subtopic:
+            self.clear_cache_for_subject_subtopic(subject, subtopic)
+        else:
+            self.clear_cache_for_subject(subject)
+        self._manifest.refresh_subject(subject, subtopic)
+
+    def notify_subject_removed(self, subject: str):
+        """
+        Record that a subject directory was deleted.
+
+        Args:
+            subject: Subject name (e.g., "python")
+        """
+        self.clear_cache_for_subject(subject)
+        self._manifest.remove_subject(subject)
 
     def migrate_tags_for_subject(self, subject: str) -> bool:
         """
@@ -561,6 +745,8 @@ class DataLoader:
             with open(subject_config_path, "w", encoding="utf-8") as f:
                 json.dump(config, f, indent=2, ensure_ascii=False)
 
+            self.notify_content_changed(subject)
+
             if current_app:
                 current_app.logger.info(
                     f"Migrated {len(all_tags)} tags for subject '{subject}': {sorted(list(all_tags))}"
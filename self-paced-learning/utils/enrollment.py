@@ -0,0 +1,185 @@
+"""
+Set-based class enrollment.
+
+Enrolling reads the existing (student, class) pairs with one SELECT and
+inserts the missing ones with one executemany; removing is a single DELETE.
+The cost stays a fixed number of statements whether one student joins a
+teacher or a whole school's roster is imported.
+"""
+
+import csv
+import io
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Class, ClassRegistration, User
+
+# Bound parameters per IN list, well below every database's limit
+CHUNK_SIZE = 500
+
+_INSERT_IGNORE_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _chunks(values: Iterable[Any], size: int = CHUNK_SIZE) -> Iterator[List[Any]]:
+    iterator = iter(values)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def enroll(
+    session: Session, student_ids: Iterable[int], class_ids: Iterable[int]
+) -> int:
+    """
+    Enroll every student in every class, skipping existing registrations.
+
+    The caller commits.
+
+    Returns:
+        Number of registrations created
+    """
+    student_ids = sorted(set(student_ids))
+    class_ids = sorted(set(class_ids))
+    if not student_ids or not class_ids:
+        return 0
+
+    existing: Set[Tuple[int, int]] = set()
+    for chunk in _chunks(student_ids):
+        existing.update(
+            session.execute(
+                select(ClassRegistration.student_id, ClassRegistration.class_id).where(
+                    ClassRegistration.student_id.in_(chunk),
+                    ClassRegistration.class_id.in_(class_ids),
+                )
+            ).all()
+        )
+
+    rows = [
+        {"student_id": student_id, "class_id": class_id}
+        for student_id in student_ids
+        for class_id in class_ids
+        if (student_id, class_id) not in existing
+    ]
+    if not rows:
+        return 0
+
+    # A concurrent enrollment of the same pair is skipped rather than failing
+    dialect_insert = _INSERT_IGNORE_DIALECTS.get(session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        statement = dialect_insert(ClassRegistration).on_conflict_do_nothing(
+            index_elements=["student_id", "class_id"]
+        )
+    else:
+        statement = insert(ClassRegistration)
+    session.execute(statement, rows)
+    return len(rows)
+
+
+def unenroll(session: Session, student_ids: Iterable[int], teacher_id: int) -> int:
+    """
+    Remove students from all classes of a teacher with one DELETE.
+
+    The caller commits.
+
+    Returns:
+        Number of registrations removed
+    """
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return 0
+
+    teacher_classes = select(Class.id).where(Class.teacher_id == teacher_id)
+    removed = 0
+    for chunk in _chunks(student_ids):
+        result = session.execute(
+            delete(ClassRegistration)
+            .where(
+                ClassRegistration.student_id.in_(chunk),
+                ClassRegistration.class_id.in_(teacher_classes),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        removed += result.rowcount
+    return removed
+
+
+def parse_roster(data: Any, max_rows: int) -> List[str]:
+    """
+    Read student emails or usernames from an uploaded roster.
+
+    Accepts CSV text with an "email" or "username" column, or JSON of the
+    form {"students": [...]} whose items are strings or objects with an
+    "email" or "username" key.
+
+    Args:
+        data: CSV text or parsed JSON
+        max_rows: Largest roster accepted
+
+    Returns:
+        Identifiers in roster order, without blanks and duplicates
+
+    Raises:
+        ValueError: If the roster is malformed or too large
+    """
+    if isinstance(data, str):
+        reader = csv.DictReader(io.StringIO(data))
+        columns = {
+            (name or "").strip().lower(): name for name in reader.fieldnames or []
+        }
+        column = columns.get("email") or columns.get("username")
+        if column is None:
+            raise ValueError("The CSV needs an 'email' or 'username' column.")
+        entries = [row.get(column) for row in islice(reader, max_rows + 1)]
+    elif isinstance(data, dict) and isinstance(data.get("students"), list):
+        entries = [
+            entry.get("email") or entry.get("username")
+            if isinstance(entry, dict)
+            else entry
+            for entry in data["students"]
+        ]
+    else:
+        raise ValueError('Expected CSV or JSON of the form {"students": [...]}.')
+
+    if len(entries) > max_rows:
+        raise ValueError(f"Rosters are limited to {max_rows} students.")
+
+    identifiers: Dict[str, None] = {}
+    for entry in entries:
+        if isinstance(entry, str) and entry.strip():
+            identifiers[entry.strip()] = None
+    return list(identifiers)
+
+
+def resolve_students(
+    session: Session, identifiers: Iterable[str]
+) -> Tuple[List[int], List[str]]:
+    """
+    Look up student accounts by email (identifiers with an @) or username.
+
+    Returns:
+        Tuple of (ids of the students found, identifiers not matching any
+        student, in input order)
+    """
+    identifiers = list(identifiers)
+    emails = [value for value in identifiers if "@" in value]
+    usernames = [value for value in identifiers if "@" not in value]
+
+    found: Dict[str, int] = {}
+    for column, values in ((User.email, emails), (User.username, usernames)):
+        for chunk in _chunks(values):
+            rows = session.execute(
+                select(User.id, column).where(
+                    column.in_(chunk), User.role == "student"
+                )
+            )
+            for student_id, value in rows:
+                found[value] = student_id
+
+    not_found = [value for value in identifiers if value not in found]
+    return sorted(set(found.values())), not_found
@@ -0,0 +1,145 @@
+"""
+Local fake of the OpenAI chat completions endpoint.
+
+Serves the stub analysis over HTTP, streamed as Server-Sent Events when the
+request sets "stream": true, so the real OpenAI client and the streaming
+results page can be exercised end to end without network access:
+
+    python -m utils.fake_openai_server --port 8099
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=test python app.py
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.ai_stub import split_into_tokens, stub_completion_text
+
+COMPLETION_PATHS = ("/v1/chat/completions", "/chat/completions")
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/chat/completions like the OpenAI API."""
+
+    # Seconds between streamed chunks; set per server by create_server()
+    token_delay = 0.02
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in COMPLETION_PATHS:
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        model = body.get("model", "gpt-4")
+        content = stub_completion_text(body.get("messages", []))
+
+        if body.get("stream"):
+            self._send_stream(model, content)
+        else:
+            self._send_completion(model, content)
+
+    def _send_completion(self, model: str, content: str) -> None:
+        """Send a complete chat.completion object."""
+        payload = json.dumps(
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 0,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": len(content) // 4,
+                },
+            }
+        ).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, model: str, content: str) -> None:
+        """Send chat.completion.chunk events followed by [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        deltas = [{"role": "assistant", "content": ""}]
+        deltas += [{"content": token} for token in split_into_tokens(content)]
+        for index, delta in enumerate(deltas + [{}]):
+            if index and self.token_delay:
+                time.sleep(self.token_delay)
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": delta,
+                        "finish_reason": None if delta else "stop",
+                    }
+                ],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        """Keep test and benchmark output quiet."""
+
+
+def create_server(
+    host: str = "127.0.0.1", port: int = 0, token_delay: float = 0.02
+) -> ThreadingHTTPServer:
+    """
+    Create a fake OpenAI server; port 0 picks a free port.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        token_delay: Seconds between streamed chunks
+
+    Returns:
+        Server not yet serving; call serve_forever(), e.g. in a thread
+    """
+    handler = type(
+        "ConfiguredFakeOpenAIHandler",
+        (FakeOpenAIHandler,),
+        {"token_delay": token_delay},
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.token_delay)
+    print(f"Fake OpenAI API on http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
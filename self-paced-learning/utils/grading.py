@@ -0,0 +1,278 @@
+"""
+Local grading of quiz submissions and deterministic weak-tag inference.
+
+Multiple choice and fill-in-the-blank questions are graded here, as are
+coding questions that declare test cases when a code runner is given. Weak
+topics are attributed from the tags of missed questions, so the AI is only
+needed for untested coding questions or when narrative feedback is turned on
+with AI_NARRATIVE_FEEDBACK.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.code_runner import CodeRunner
+
+STATUS_CORRECT = "Correct"
+STATUS_INCORRECT = "Incorrect"
+STATUS_AI_REVIEW = "For AI Review"
+STATUS_INVALID = "Invalid Question Data"
+
+
+def grade_submission(
+    questions: List[Dict[str, Any]],
+    answers: Dict[str, Any],
+    code_runner: Optional[CodeRunner] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Grade every auto-gradable question of a submission.
+
+    Args:
+        questions: Questions in the order they were served
+        answers: Submitted answers keyed "q0", "q1", ...
+        code_runner: If given, coding answers to questions with "test_cases"
+            are run against them instead of being left for AI review
+
+    Returns:
+        One result per question with its type, the student's answer, the
+        grading status and, for missed questions, the correct answer text.
+        Coding results graded by their tests also carry "test_results".
+    """
+    results = []
+
+    for i, q_data in enumerate(questions):
+        user_answer = answers.get(f"q{i}", "[No answer provided]")
+        # Default to multiple_choice for backward compatibility
+        question_type = q_data.get("type", "multiple_choice")
+        result = {
+            "index": i,
+            "question": q_data,
+            "type": question_type,
+            "answer": user_answer,
+            "status": STATUS_INCORRECT,
+            "correct_answer": None,
+        }
+
+        if question_type == "multiple_choice":
+            correct_answer_index = q_data.get("answer_index")
+            options = q_data.get("options", [])
+            if isinstance(correct_answer_index, int) and (
+                0 <= correct_answer_index < len(options)
+            ):
+                correct_answer_text = options[correct_answer_index]
+                if user_answer == correct_answer_text:
+                    result["status"] = STATUS_CORRECT
+                else:
+                    result["correct_answer"] = correct_answer_text
+            else:
+                result["status"] = STATUS_INVALID
+
+        elif question_type == "fill_in_the_blank":
+            correct_answer_text = q_data.get("correct_answer", "")
+            # Case-insensitive; several accepted answers may be comma separated
+            correct_answers_list = [
+                ans.strip().lower() for ans in correct_answer_text.split(",")
+            ]
+            if str(user_answer).strip().lower() in correct_answers_list:
+                result["status"] = STATUS_CORRECT
+            else:
+                result["correct_answer"] = correct_answer_text
+
+        elif question_type == "coding":
+            # Coding questions are not graded locally; the AI reviews the code
+            result["status"] = STATUS_AI_REVIEW
+
+        results.append(result)
+
+    if code_runner is not None:
+        run_code_tests(results, code_runner)
+
+    return results
+
+
+def run_code_tests(results: List[Dict[str, Any]], code_runner: CodeRunner) -> None:
+    """
+    Grade coding results whose questions declare test cases, in parallel.
+
+    A result is correct when every test case passes. Results whose sandbox
+    could not run are left for AI review.
+
+    Args:
+        results: Results from grade_submission(), updated in place
+        code_runner: Runner executing the student code
+    """
+    tested = [
+        result
+        for result in results
+        if result["status"] == STATUS_AI_REVIEW
+        and result["question"].get("test_cases")
+    ]
+    if not tested:
+        return
+
+    reports = code_runner.run_many(
+        [(str(result["answer"]), result["question"]["test_cases"]) for result in tested]
+    )
+    for result, report in zip(tested, reports):
+        if report is None:
+            continue
+        result["test_results"] = report
+        result["status"] = (
+            STATUS_CORRECT if report["passed"] == report["total"] else STATUS_INCORRECT
+        )
+
+
+def count_correct(graded: Iterable[Dict[str, Any]]) -> int:
+    """Return the number of correctly answered questions."""
+    return sum(1 for result in graded if result["status"] == STATUS_CORRECT)
+
+
+def needs_ai_review(graded: Iterable[Dict[str, Any]]) -> bool:
+    """Return True if any question can only be graded by the AI."""
+    return any(result["status"] == STATUS_AI_REVIEW for result in graded)
+
+
+def format_graded_question(result: Dict[str, Any]) -> str:
+    """
+    Describe one graded question for an AI analysis prompt.
+
+    Args:
+        result: A single entry returned by grade_submission()
+
+    Returns:
+        Multi-line text block describing the question, answer and status
+    """
+    q_data = result["question"]
+    detail = (
+        f"Question {result['index'] + 1} (Type: {result['type']}): "
+        f"{q_data.get('question', 'N/A')}\n"
+    )
+    detail += f"Student's Answer:\n---\n{result['answer']}\n---\n"
+
+    if result["correct_answer"] is not None:
+        label = (
+            "Correct Answer(s)"
+            if result["type"] == "fill_in_the_blank"
+            else "Correct Answer"
+        )
+        detail += f"{label}: {result['correct_answer']}\n"
+
+    test_results = result.get("test_results")
+    if test_results:
+        detail += (
+            f"Test Cases Passed: {test_results['passed']} of {test_results['total']}\n"
+        )
+        failures = [case for case in test_results["cases"] if not case["passed"]]
+        if failures:
+            detail += f"First Failure: {failures[0].get('error')}\n"
+
+    if result["status"] == STATUS_AI_REVIEW:
+        # Provide the sample solution for the AI's reference
+        sample_solution = q_data.get("sample_solution", "")
+        if sample_solution:
+            detail += f"Sample Solution:\n---\n{sample_solution}\n---\n"
+
+    detail += f"Status: {result['status']}\n\n"
+    return detail
+
+
+def score_tags(
+    graded: Iterable[Dict[str, Any]], allowed_tags: Iterable[str]
+) -> Dict[str, Dict[str, float]]:
+    """
+    Compute weighted miss ratios per tag from graded questions.
+
+    A question with n tags contributes 1/n of a question to each of them, so
+    questions tagged with many concepts do not dominate the attribution.
+    Questions still awaiting AI review and invalid questions are ignored.
+
+    Args:
+        graded: Results from grade_submission()
+        allowed_tags: Tags that may be reported (compared case-insensitively)
+
+    Returns:
+        Dictionary mapping tag to {"missed", "total", "miss_ratio"}
+    """
+    allowed = {tag.lower() for tag in allowed_tags}
+    tag_scores: Dict[str, Dict[str, float]] = {}
+
+    for result in graded:
+        if result["status"] not in (STATUS_CORRECT, STATUS_INCORRECT):
+            continue
+
+        tags = {
+            tag.lower()
+            for tag in result["question"].get("tags", [])
+            if tag.lower() in allowed
+        }
+        if not tags:
+            continue
+
+        weight = 1.0 / len(tags)
+        missed = result["status"] == STATUS_INCORRECT
+        for tag in tags:
+            score = tag_scores.setdefault(tag, {"missed": 0.0, "total": 0.0})
+            score["total"] += weight
+            if missed:
+                score["missed"] += weight
+
+    for score in tag_scores.values():
+        score["miss_ratio"] = score["missed"] / score["total"]
+
+    return tag_scores
+
+
+def infer_weak_tags(
+    graded: Iterable[Dict[str, Any]],
+    allowed_tags: Iterable[str],
+    mastery_threshold: float = 0.80,
+) -> List[str]:
+    """
+    Identify weak topics from the tags of missed questions.
+
+    A tag is weak when the student missed at least one question carrying it
+    and their weighted accuracy on it is below the mastery threshold.
+
+    Args:
+        graded: Results from grade_submission()
+        allowed_tags: Tags that may be reported
+        mastery_threshold: Accuracy needed to consider a tag mastered
+
+    Returns:
+        Weak tags, weakest first
+    """
+    tag_scores = score_tags(graded, allowed_tags)
+    weak = [
+        (tag, score)
+        for tag, score in tag_scores.items()
+        if score["missed"] > 0 and 1.0 - score["miss_ratio"] < mastery_threshold
+    ]
+    weak.sort(key=lambda item: (-item[1]["miss_ratio"], -item[1]["missed"], item[0]))
+    return [tag for tag, _ in weak]
+
+
+def build_local_feedback(
+    graded: List[Dict[str, Any]], weak_tags: List[str]
+) -> str:
+    """
+    Build short textual feedback for a submission graded entirely locally.
+
+    Args:
+        graded: Results from grade_submission()
+        weak_tags: Tags returned by infer_weak_tags()
+
+    Returns:
+        Feedback text for the results page
+    """
+    correct = count_correct(graded)
+    feedback = f"You answered {correct} out of {len(graded)} questions correctly."
+
+    if weak_tags:
+        feedback += (
+            " Based on the questions you missed, review these topics: "
+            + ", ".join(weak_tags)
+            + "."
+        )
+    else:
+        feedback += " Great work - no weak topics were identified."
+
+    return feedback
@@ -0,0 +1,45 @@
+"""
+Values created on first use.
+
+Services that are expensive to set up and not needed by every process, such
+as the AI client, the content layer and the services running thread pools or
+SQLite databases, are wrapped in Lazy. Creating the
+app, and so booting a worker or running a `flask db` command, then does not
+pay for them.
+"""
+
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """Holds a value that a factory creates once, on the first get()."""
+
+    def __init__(self, factory: Callable[[], T]):
+        """
+        Initialize the holder. The factory is not called yet.
+
+        Args:
+            factory: Creates the value; if it raises, the next get() retries
+        """
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._created = False
+        self._value: Optional[T] = None
+
+    @property
+    def created(self) -> bool:
+        """Whether the value has been created."""
+        return self._created
+
+    def get(self) -> T:
+        """Get the value, creating it if this is the first call."""
+        if not self._created:
+            # Threads arriving during creation wait for the same value
+            with self._lock:
+                if not self._created:
+                    self._value = self._factory()
+                    self._created = True
+        return self._value
@@ -0,0 +1,154 @@
+"""
+Password hashing with a configurable work factor.
+
+Hashes are created with werkzeug using the configured method, e.g.
+"scrypt:32768:8:1" or "pbkdf2:sha256:600000". Stored hashes created with
+other parameters still verify, and needs_rehash() tells the login route to
+upgrade them while it knows the plain password.
+
+Hashing is deliberately slow, so it runs in a small thread pool (hashlib
+releases the GIL while hashing). At most max_workers hashes use the CPU at
+once, leaving the remaining cores to other requests; beyond max_pending
+waiting logins, new ones are turned away instead of queueing without bound.
+"""
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict
+
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when too many hashes are queued or one waited too long."""
+
+
+def method_prefix(method: str) -> str:
+    """
+    Spell a hash method the way werkzeug stores it, with default parameters
+    filled in ("scrypt" is stored as "scrypt:32768:8:1").
+
+    Raises:
+        ValueError: If werkzeug does not support the method
+    """
+    name, *args = method.split(":")
+    if name == "scrypt":
+        if not args:
+            args = ["32768", "8", "1"]
+        if len(args) != 3 or not all(arg.isdigit() for arg in args):
+            raise ValueError("'scrypt' takes 3 arguments.")
+        return ":".join([name, *args])
+    if name == "pbkdf2":
+        if len(args) > 2:
+            raise ValueError("'pbkdf2' takes 2 arguments.")
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        hashlib.new(hash_name)  # Raises ValueError for unknown digests
+        return f"{name}:{hash_name}:{iterations}"
+    raise ValueError(f"Invalid hash method '{method}'.")
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords in a bounded thread pool."""
+
+    def __init__(
+        self,
+        method: str = "scrypt",
+        max_workers: int = 2,
+        max_pending: int = 64,
+        timeout: float = 10.0,
+        salt_length: int = 16,
+    ):
+        """
+        Initialize the hasher.
+
+        Args:
+            method: werkzeug hash method and work factor for new hashes
+            max_workers: Hashes computed at the same time
+            max_pending: Hashes waiting for a worker before new ones are
+                rejected with PasswordHasherBusyError
+            timeout: Seconds a caller waits for its hash before giving up
+            salt_length: Characters of random salt per hash
+
+        Raises:
+            ValueError: If werkzeug does not support the method
+        """
+        self.method = method
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.salt_length = salt_length
+
+        # Stored hashes are compared against werkzeug's spelling of the method
+        self.method_prefix = method_prefix(method)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hash"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counts = {"hashed": 0, "verified": 0, "rejected": 0, "timed_out": 0}
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured method."""
+        result = self._run(
+            generate_password_hash, password, self.method, self.salt_length
+        )
+        self._count("hashed")
+        return result
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        """Check a password against a stored hash of any supported method."""
+        try:
+            result = self._run(check_password_hash, pwhash, password)
+        except ValueError:
+            # Unknown or malformed hash method
+            result = False
+        self._count("verified")
+        return result
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Whether a stored hash was made with other than the configured method."""
+        return pwhash.split("$", 1)[0] != self.method_prefix
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the configured method, hashes in progress and outcomes."""
+        with self._lock:
+            return {
+                "method": self.method_prefix,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                **self._counts,
+            }
+
+    def _run(self, fn: Callable, *args):
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise PasswordHasherBusyError("Too many password hashes queued")
+
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._count("timed_out")
+            raise PasswordHasherBusyError("Password hashing timed out") from None
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
@@ -0,0 +1,187 @@
+"""
+Database-backed video progress with write coalescing.
+
+The video player reports progress every few seconds. Updates are kept in
+memory, where a newer value for the same (user, topic) replaces the older
+one, and a background thread upserts what is pending at a fixed interval.
+However often a student's player reports, each topic costs at most one row
+write per interval.
+"""
+
+import atexit
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+from flask import current_app
+from sqlalchemy import Table, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from utils.upsert import Upsert
+
+
+class ProgressStore:
+    """Coalesces progress updates in memory and upserts them periodically."""
+
+    def __init__(
+        self,
+        engine_factory: Callable[[], Engine],
+        table: Table,
+        flush_interval: float = 5.0,
+        app=None,
+    ):
+        """
+        Initialize the store and start its flush thread.
+
+        Args:
+            engine_factory: Returns the engine to write to; called inside the
+                app context if an app is given
+            table: Progress table with user_id, topic, progress and
+                updated_at columns and a unique (user_id, topic) constraint
+            flush_interval: Seconds between writes of pending updates
+            app: Flask app whose context flushes run in, if any
+        """
+        self.engine_factory = engine_factory
+        self.table = table
+        self._upsert = Upsert(
+            table, keys=["user_id", "topic"], replace=["progress", "updated_at"]
+        )
+        self.flush_interval = flush_interval
+        self._app = app
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[Tuple[Hashable, str], Tuple[float, datetime]] = {}
+        self._counts = {"updates": 0, "rows_written": 0, "flushes": 0, "failures": 0}
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="progress-store", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def update(self, user_id: Hashable, topic: str, progress: float) -> None:
+        """Record a progress value, replacing any pending one for the topic."""
+        self.update_many(user_id, [(topic, progress)])
+
+    def update_many(
+        self, user_id: Hashable, updates: Iterable[Tuple[str, float]]
+    ) -> int:
+        """
+        Record several topics' progress for one user.
+
+        Returns:
+            Number of updates recorded
+        """
+        now = datetime.utcnow()
+        count = 0
+        with self._lock:
+            for topic, progress in updates:
+                self._pending[(user_id, topic)] = (progress, now)
+                count += 1
+            self._counts["updates"] += count
+        return count
+
+    def get_all(self, user_id: Hashable) -> Dict[str, float]:
+        """
+        Get a user's progress for every topic, including pending updates.
+
+        Returns:
+            Dictionary mapping topic to progress percentage
+        """
+        table = self.table
+        with self.engine_factory().connect() as connection:
+            rows = connection.execute(
+                select(table.c.topic, table.c.progress).where(
+                    table.c.user_id == user_id
+                )
+            )
+            progress = {topic: value for topic, value in rows}
+
+        with self._lock:
+            for (pending_user, topic), (value, _) in self._pending.items():
+                if pending_user == user_id:
+                    progress[topic] = value
+        return progress
+
+    def flush(self) -> int:
+        """
+        Upsert all pending updates now.
+
+        Returns:
+            Number of rows written
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            rows = [
+                {
+                    "user_id": user_id,
+                    "topic": topic,
+                    "progress": progress,
+                    "updated_at": updated_at,
+                }
+                for (user_id, topic), (progress, updated_at) in pending.items()
+            ]
+            try:
+                if self._app is not None:
+                    with self._app.app_context():
+                        self._write(rows)
+                else:
+                    self._write(rows)
+            except SQLAlchemyError as e:
+                with self._lock:
+                    # Keep the values for the next flush unless newer ones arrived
+                    for key, value in pending.items():
+                        self._pending.setdefault(key, value)
+                    self._counts["failures"] += 1
+                self._log_error(f"Progress flush failed, will retry: {e}")
+                return 0
+
+            with self._lock:
+                self._counts["rows_written"] += len(rows)
+                self._counts["flushes"] += 1
+            return len(rows)
+
+    def close(self) -> None:
+        """Stop the flush thread and write what is pending."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report pending topics and how many updates became row writes."""
+        with self._lock:
+            counts = dict(self._counts)
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "flush_interval": self.flush_interval,
+            **counts,
+            "updates_per_write": (
+                round(counts["updates"] / counts["rows_written"], 2)
+                if counts["rows_written"]
+                else 0.0
+            ),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        with self.engine_factory().begin() as connection:
+            self._upsert.execute(connection, rows)
+
+    def _log_error(self, message: str) -> None:
+        if self._app is not None:
+            self._app.logger.error(message)
+        elif current_app:
+            current_app.logger.error(message)
@@ -0,0 +1,191 @@
+"""
+Token-budgeted prompt assembly.
+
+Prompts are built from a static prefix that is identical for every request
+(so the provider's prompt caching can reuse it), followed by the variable
+parts. Token counts are estimated locally; oversized student answers are
+shortened, correctly answered questions are summarized instead of listed,
+and questions that do not fit the budget are left out, so the size of every
+AI request - and with it its latency and cost - stays bounded.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+from flask import current_app
+
+from utils.grading import STATUS_CORRECT, format_graded_question
+
+# Words, line breaks and single punctuation marks each start a new token
+_TOKEN_PIECES = re.compile(r"\w+|\n+|[^\w\s]")
+
+# Tokens reserved for the "... [N lines omitted] ..." marker of shortened text
+_MARKER_TOKENS = 12
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in text without a tokenizer.
+
+    Every word, line break and punctuation mark counts as one token, and
+    long words as one more per seven characters. This slightly overestimates
+    GPT tokenizers on English prose and code, which is the safe side for a
+    budget.
+    """
+    return sum(1 + len(piece) // 7 for piece in _TOKEN_PIECES.findall(text))
+
+
+def shorten_text(text: str, max_tokens: int) -> str:
+    """
+    Shorten text to about max_tokens, keeping its beginning and end.
+
+    Code is cut at line boundaries where possible, since the first and last
+    lines of an answer usually say the most about it.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+
+    max_tokens = max(max_tokens - _MARKER_TOKENS, 1)
+    lines = text.splitlines()
+    if len(lines) >= 3:
+        head_budget = max_tokens * 2 // 3
+        head: List[str] = []
+        used = 0
+        for line in lines:
+            used += estimate_tokens(line) + 1
+            if used > head_budget:
+                break
+            head.append(line)
+        tail: List[str] = []
+        used = 0
+        for line in reversed(lines[len(head) :]):
+            used += estimate_tokens(line) + 1
+            if used > max_tokens - head_budget:
+                break
+            tail.insert(0, line)
+        omitted = len(lines) - len(head) - len(tail)
+        return "\n".join(head + [f"... [{omitted} lines omitted] ..."] + tail)
+
+    # Few long lines: cut characters in proportion to the token overshoot
+    keep = len(text) * max_tokens // tokens
+    head_chars = keep * 2 // 3
+    return (
+        text[:head_chars]
+        + f" ... [{len(text) - keep} characters omitted] ... "
+        + text[len(text) - (keep - head_chars) :]
+    )
+
+
+def format_submission_items(
+    graded: Iterable[Dict[str, Any]], max_answer_tokens: int
+) -> Tuple[List[str], str]:
+    """
+    Format graded questions for a prompt, leaving out correct answers.
+
+    Args:
+        graded: Results from utils.grading.grade_submission()
+        max_answer_tokens: Longest student answer kept before shortening
+
+    Returns:
+        Tuple of (one text block per question that was missed or needs
+        review, a one-line summary of the correctly answered questions)
+    """
+    items = []
+    correct = []
+    for result in graded:
+        if result["status"] == STATUS_CORRECT:
+            correct.append(str(result["index"] + 1))
+            continue
+        answer = str(result["answer"])
+        shortened = shorten_text(answer, max_answer_tokens)
+        if shortened != answer:
+            result = {**result, "answer": shortened}
+        items.append(format_graded_question(result))
+
+    summary = (
+        f"Answered correctly (not listed): questions {', '.join(correct)}\n\n"
+        if correct
+        else ""
+    )
+    return items, summary
+
+
+class PromptBuilder:
+    """Assembles one prompt from named parts and reports its token budget."""
+
+    def __init__(self, name: str, max_tokens: int, system_message: str = ""):
+        """
+        Initialize an empty prompt.
+
+        Args:
+            name: Kind of request, used when logging the budget
+            max_tokens: Token budget of the system message plus the prompt
+            system_message: System message sent along, counted in the budget
+        """
+        self.name = name
+        self.max_tokens = max_tokens
+        self._chunks: List[str] = []
+        self.part_tokens: Dict[str, int] = {"system": estimate_tokens(system_message)}
+        self.omitted = 0
+
+    @property
+    def used_tokens(self) -> int:
+        """Estimated tokens of the system message and the prompt so far."""
+        return sum(self.part_tokens.values())
+
+    def add(self, text: str, part: str = "static") -> None:
+        """Append text that is always included, counting it toward part."""
+        self._chunks.append(text)
+        self.part_tokens[part] = self.part_tokens.get(part, 0) + estimate_tokens(text)
+
+    def add_fitting(
+        self, items: Iterable[str], part: str, reserve_tokens: int = 0
+    ) -> int:
+        """
+        Append the items that fit in the remaining budget, in order.
+
+        Args:
+            items: Text blocks, e.g. from format_submission_items()
+            part: Name the items are counted under
+            reserve_tokens: Tokens to keep free for parts added afterwards
+
+        Returns:
+            Number of items left out
+        """
+        omitted = 0
+        for item in items:
+            tokens = estimate_tokens(item)
+            if self.used_tokens + tokens + reserve_tokens > self.max_tokens:
+                omitted += 1
+                continue
+            self._chunks.append(item)
+            self.part_tokens[part] = self.part_tokens.get(part, 0) + tokens
+        self.omitted += omitted
+        return omitted
+
+    def build(self) -> str:
+        """Return the assembled prompt."""
+        return "".join(self._chunks)
+
+    def budget(self, max_completion_tokens: int = 0) -> Dict[str, Any]:
+        """Describe the estimated size of the request."""
+        return {
+            "name": self.name,
+            "prompt_tokens": self.used_tokens,
+            "max_prompt_tokens": self.max_tokens,
+            "max_completion_tokens": max_completion_tokens,
+            "parts": dict(self.part_tokens),
+            "omitted_items": self.omitted,
+        }
+
+    def log_budget(self, max_completion_tokens: int = 0) -> None:
+        """Log the estimated request size."""
+        if current_app:
+            budget = self.budget(max_completion_tokens)
+            parts = ", ".join(f"{k}={v}" for k, v in budget["parts"].items())
+            current_app.logger.info(
+                f"Prompt budget for {self.name}: {budget['prompt_tokens']}"
+                f"/{self.max_tokens} tokens ({parts}), {self.omitted} items "
+                f"omitted, up to {max_completion_tokens} completion tokens"
+            )
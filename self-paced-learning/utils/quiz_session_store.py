@@ -0,0 +1,169 @@
+"""
+Server-side storage for per-student quiz state.
+
+Flask's default session is a signed cookie, so anything stored in it travels
+with every request. Quiz state (served question ids, quiz type, targeted
+topics) lives here instead; the cookie only carries an opaque session id.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class InMemoryQuizSessionStore:
+    """Process-local stand-in for the SQLite store, for tests and local runs."""
+
+    def __init__(self, ttl_seconds: float = 24 * 60 * 60):
+        """
+        Initialize the store.
+
+        Args:
+            ttl_seconds: Seconds a quiz state is kept after its last write
+        """
+        self.ttl_seconds = ttl_seconds
+        self._records: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid: str, scope: str) -> Optional[Dict[str, Any]]:
+        """Return the state stored for (sid, scope), or None if absent or expired."""
+        with self._lock:
+            record = self._records.get((sid, scope))
+            if record is None:
+                return None
+            expires_at, data = record
+            if expires_at <= time.time():
+                del self._records[(sid, scope)]
+                return None
+            return json.loads(data)
+
+    def set(self, sid: str, scope: str, data: Dict[str, Any]) -> None:
+        """Replace the state stored for (sid, scope)."""
+        with self._lock:
+            self._records[(sid, scope)] = (
+                time.time() + self.ttl_seconds,
+                json.dumps(data),
+            )
+
+    def delete(self, sid: str, scope: str) -> None:
+        """Remove the state stored for (sid, scope), if any."""
+        with self._lock:
+            self._records.pop((sid, scope), None)
+
+    def purge_expired(self) -> int:
+        """Drop expired records and return how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (exp, _) in self._records.items() if exp <= now]
+            for key in expired:
+                del self._records[key]
+            return len(expired)
+
+
+class SQLiteQuizSessionStore:
+    """Quiz state store backed by a SQLite file shared by all worker processes."""
+
+    # Purge expired rows roughly once every this many writes
+    PURGE_EVERY = 500
+
+    def __init__(self, db_path: str, ttl_seconds: float = 24 * 60 * 60):
+        """
+        Initialize the store and create its table if needed.
+
+        Args:
+            db_path: Path of the SQLite database file
+            ttl_seconds: Seconds a quiz state is kept after its last write
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        # Guards the write counter; requests write from several threads
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quiz_session ("
+                " sid TEXT NOT NULL,"
+                " scope TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " PRIMARY KEY (sid, scope))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_quiz_session_expires_at"
+                " ON quiz_session (expires_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid: str, scope: str) -> Optional[Dict[str, Any]]:
+        """Return the state stored for (sid, scope), or None if absent or expired."""
+        row = (
+            self._connection()
+            .execute(
+                "SELECT data FROM quiz_session"
+                " WHERE sid = ? AND scope = ? AND expires_at > ?",
+                (sid, scope, time.time()),
+            )
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def set(self, sid: str, scope: str, data: Dict[str, Any]) -> None:
+        """Replace the state stored for (sid, scope)."""
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO quiz_session (sid, scope, data, expires_at)"
+                " VALUES (?, ?, ?, ?)",
+                (sid, scope, json.dumps(data), time.time() + self.ttl_seconds),
+            )
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, sid: str, scope: str) -> None:
+        """Remove the state stored for (sid, scope), if any."""
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM quiz_session WHERE sid = ? AND scope = ?", (sid, scope)
+            )
+
+    def purge_expired(self) -> int:
+        """Drop expired rows and return how many were removed."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM quiz_session WHERE expires_at <= ?", (time.time(),)
+            )
+            return cursor.rowcount
+
+
+def create_quiz_session_store(db_path: str, ttl_seconds: float = 24 * 60 * 60):
+    """
+    Create the configured quiz session store.
+
+    Args:
+        db_path: SQLite file path, or "memory" for the in-process stand-in
+        ttl_seconds: Seconds a quiz state is kept after its last write
+
+    Returns:
+        A store exposing get/set/delete/purge_expired
+    """
+    if db_path == "memory":
+        return InMemoryQuizSessionStore(ttl_seconds)
+    return SQLiteQuizSessionStore(db_path, ttl_seconds)
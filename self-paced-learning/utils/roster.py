@@ -0,0 +1,111 @@
+"""
+Teacher rosters, one page per query.
+
+A page of a teacher's students, their enrollment counts and their progress
+summaries is read in a single round-trip. Pages are ordered by username and
+continue after the last student of the previous page (keyset pagination),
+so later pages cost the same as the first however large the roster is.
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from models import Class, ClassRegistration, SubtopicProgress, User
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(username: str, student_id: int) -> str:
+    """Encode the position after a student as an opaque cursor."""
+    raw = json.dumps([username, student_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """
+    Decode a cursor from encode_cursor().
+
+    Returns:
+        Tuple of (username, student id), or None if the cursor is invalid
+    """
+    try:
+        username, student_id = json.loads(base64.urlsafe_b64decode(cursor))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    if not isinstance(username, str) or not isinstance(student_id, int):
+        return None
+    return username, student_id
+
+
+def roster_page(
+    session: Session,
+    teacher_id: int,
+    after: Optional[Tuple[str, int]] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Read one page of a teacher's students.
+
+    Args:
+        session: Database session
+        teacher_id: Teacher whose classes the students are enrolled in
+        after: (username, id) of the last student of the previous page
+        limit: Students per page, at most MAX_PAGE_SIZE
+
+    Returns:
+        Tuple of (students with id, username, email, enrollments,
+        subtopics, attempts, average_best and last_activity, cursor of the
+        next page or None on the last page)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    # Enrollments per student in this teacher's classes, via the teacher and
+    # class indexes
+    enrollments = (
+        select(
+            ClassRegistration.student_id,
+            func.count().label("enrollments"),
+        )
+        .join(Class, Class.id == ClassRegistration.class_id)
+        .where(Class.teacher_id == teacher_id)
+        .group_by(ClassRegistration.student_id)
+        .subquery()
+    )
+
+    # One extra row tells whether another page follows
+    page = (
+        select(User.id, User.username, User.email, enrollments.c.enrollments)
+        .join(enrollments, enrollments.c.student_id == User.id)
+        .order_by(User.username, User.id)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        page = page.where(tuple_(User.username, User.id) > tuple_(*after))
+    page = page.subquery()
+
+    # Progress summaries only for the students on this page
+    rows = session.execute(
+        select(
+            page,
+            func.count(SubtopicProgress.id).label("subtopics"),
+            func.coalesce(func.sum(SubtopicProgress.attempts), 0).label("attempts"),
+            func.avg(SubtopicProgress.best_score).label("average_best"),
+            func.max(SubtopicProgress.last_activity).label("last_activity"),
+        )
+        .outerjoin(SubtopicProgress, SubtopicProgress.student_id == page.c.id)
+        .group_by(page.c.id, page.c.username, page.c.email, page.c.enrollments)
+        .order_by(page.c.username, page.c.id)
+    ).all()
+
+    students = [dict(row._mapping) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = students[-1]
+        next_cursor = encode_cursor(last["username"], last["id"])
+    return students, next_cursor
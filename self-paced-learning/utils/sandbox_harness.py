@@ -0,0 +1,409 @@
+"""
+Child-process harness that runs one student's code against its test cases.
+
+Started by utils.code_runner in a fresh, isolated interpreter. It reads a JSON
+job from stdin and has the kernel isolate the process (see _isolate()): new
+namespaces without network, a read-only root holding only the working
+directory and the libraries, no root or capabilities, and a seccomp filter
+refusing process creation and sockets. It then applies resource limits and
+installs an audit hook that refuses the same kinds of access with readable
+errors, runs every test case and writes a JSON report as the last line of
+stdout. The first line says whether isolation succeeded.
+
+The job holds no expected results: the report only says what each case
+returned and printed, and the runner compares that with the question. Before
+the student's code runs, stdout is moved to a new descriptor and descriptor 1
+is pointed at the null device, so the program's own output cannot end up in
+the report.
+
+This module must only import the standard library: it runs with -I -S, so
+neither the app directory nor site-packages are importable.
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import types
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; only the wall timeout applies
+    resource = None
+
+MAX_ERROR_LENGTH = 300
+MAX_OUTPUT_LENGTH = 64 * 1024
+
+# Audit events refused once student code starts running
+BLOCKED_EVENT_PREFIXES = (
+    "socket.",
+    "subprocess.",
+    "os.system",
+    "os.exec",
+    "os.spawn",
+    "os.posix_spawn",
+    "os.fork",
+    "os.forkpty",
+    "os.kill",
+    "os.killpg",
+    "os.remove",
+    "os.rename",
+    "os.rmdir",
+    "os.mkdir",
+    "os.chmod",
+    "os.chown",
+    "os.link",
+    "os.symlink",
+    "os.truncate",
+    "os.putenv",
+    "shutil.",
+    "ctypes.",
+    "urllib.",
+    "ftplib.",
+    "smtplib.",
+    "http.client.",
+    "webbrowser.",
+)
+
+# Native modules that start processes or call C without raising audit events
+BLOCKED_MODULES = frozenset(("_posixsubprocess", "_ctypes", "_winapi"))
+
+# Events that could find the audit hook and change the policy it holds
+BLOCKED_EVENTS = frozenset(("gc.get_objects", "gc.get_referrers", "gc.get_referents"))
+
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+
+# Host directories mounted read-only into the sandbox besides the working
+# directory and sys.path: the shared libraries that extension modules load
+LIBRARY_DIRS = ("/lib", "/lib64", "/usr/lib", "/usr/lib64")
+
+# Syscalls refused once the sandbox is set up: starting processes or threads,
+# sockets, signalling or tracing other processes, and leaving the namespaces
+# or the changed root
+DENIED_SYSCALLS = {
+    "x86_64": (
+        0xC000003E,  # AUDIT_ARCH_X86_64
+        (56, 57, 58, 59, 322, 435, 41, 62, 200, 234, 101, 310, 311)
+        + (165, 166, 161, 155, 272, 308, 321, 298, 250),
+    ),
+    "aarch64": (
+        0xC00000B7,  # AUDIT_ARCH_AARCH64
+        (220, 221, 281, 435, 198, 129, 130, 131, 117, 270, 271)
+        + (40, 39, 51, 41, 97, 268, 280, 241, 219),
+    ),
+}
+X32_SYSCALL_BIT = 0x40000000
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_NOEXEC = 0x8
+MS_REMOUNT = 0x20
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+NOBODY_ID = 65534
+
+
+class IsolationError(Exception):
+    """Raised when the operating system cannot isolate the sandbox."""
+
+
+def _make_audit_hook(readable_roots):
+    """
+    Build the audit hook enforcing the policy inside the process.
+
+    The policy and every function the hook calls are bound when it is built,
+    so code that rebinds this module's globals or the builtins cannot
+    change what the hook allows.
+    """
+    blocked_prefixes = tuple(BLOCKED_EVENT_PREFIXES)
+    blocked_events = frozenset(BLOCKED_EVENTS)
+    blocked_modules = frozenset(BLOCKED_MODULES)
+    write_flags = int(WRITE_FLAGS)
+    roots = tuple(root.rstrip(os.sep) + os.sep for root in readable_roots)
+    realpath, fsdecode, sep = os.path.realpath, os.fsdecode, os.sep
+    str_type, int_type, denied = str, int, PermissionError
+
+    def is_readable(path):
+        if path is None or type(path) is int_type:
+            return True  # The working directory, or an already open descriptor
+        path = realpath(fsdecode(path)) + sep
+        return path.startswith(roots)
+
+    def audit_hook(event, args):
+        if event.startswith(blocked_prefixes) or event in blocked_events:
+            raise denied(f"{event} is not allowed in quiz code")
+        if event == "import" and args[0] in blocked_modules:
+            raise denied(f"Importing {args[0]} is not allowed in quiz code")
+        if event == "open":
+            path, mode, flags = args
+            if type(mode) is str_type and (
+                "w" in mode or "a" in mode or "x" in mode or "+" in mode
+            ):
+                raise denied("Writing files is not allowed in quiz code")
+            if type(flags) is int_type and flags & write_flags:
+                raise denied("Writing files is not allowed in quiz code")
+            if not is_readable(path):
+                raise denied("Reading this file is not allowed in quiz code")
+        if event in ("os.listdir", "os.scandir") and not is_readable(args[0]):
+            raise denied("Listing this directory is not allowed in quiz code")
+
+    return audit_hook
+
+
+def _refuse_exit(*args):
+    raise PermissionError("os._exit is not allowed in quiz code")
+
+
+def _isolate(work_dir, readable_roots):
+    """
+    Confine this process with the kernel before any student code runs.
+
+    Creates new mount, network, IPC and UTS namespaces (and a user namespace
+    unless running as root), so the process has no network interfaces and
+    sees a read-only root holding only the working directory, the standard
+    library and the shared libraries. It then gives up root or all
+    capabilities and installs a seccomp filter refusing the syscalls in
+    DENIED_SYSCALLS, so no process or thread can be started.
+
+    Raises:
+        IsolationError: If any step is not supported here
+    """
+    if not sys.platform.startswith("linux"):
+        raise IsolationError(f"sandbox isolation is not supported on {sys.platform}")
+    machine = os.uname().machine
+    if machine not in DENIED_SYSCALLS:
+        raise IsolationError(f"no seccomp filter for {machine}")
+
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+
+    def check(result, step):
+        if result != 0:
+            errno = ctypes.get_errno()
+            raise IsolationError(f"{step} failed: {os.strerror(errno)}")
+
+    as_root = os.geteuid() == 0
+    uid, gid = os.getuid(), os.getgid()
+    namespaces = CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS
+    if not as_root:
+        namespaces |= CLONE_NEWUSER
+    check(libc.unshare(namespaces), "unshare")
+    if not as_root:
+        for name, content in (
+            ("setgroups", "deny"),
+            ("uid_map", f"0 {uid} 1"),
+            ("gid_map", f"0 {gid} 1"),
+        ):
+            with open(f"/proc/self/{name}", "w") as f:
+                f.write(content)
+
+    def mount(source, target, fstype, flags, data=None):
+        check(
+            libc.mount(
+                source and os.fsencode(source),
+                os.fsencode(target),
+                fstype and fstype.encode(),
+                ctypes.c_ulong(flags),
+                data and data.encode(),
+            ),
+            f"mounting {target}",
+        )
+
+    def bind_read_only(source, target):
+        mount(source, target, None, MS_BIND)
+        # Flags the outer namespace set on the mount must be kept
+        locked = os.statvfs(target).f_flag & (MS_NOSUID | MS_NODEV | MS_NOEXEC)
+        flags = MS_BIND | MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV | locked
+        mount(None, target, None, flags)
+
+    mount(None, "/", None, MS_REC | MS_PRIVATE)
+    new_root = os.path.join(work_dir, ".root")
+    os.mkdir(new_root)
+    mount("tmpfs", new_root, "tmpfs", MS_NOSUID | MS_NODEV, "size=64k,mode=755")
+    sources = [work_dir, *readable_roots, *LIBRARY_DIRS]
+    for source in dict.fromkeys(os.path.realpath(path) for path in sources):
+        if not os.path.exists(source) or source == "/":
+            continue
+        target = new_root + source
+        if os.path.isdir(source):
+            os.makedirs(target, exist_ok=True)
+        elif not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            open(target, "x").close()
+        bind_read_only(source, target)
+    mount(None, new_root, None, MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV)
+    os.chroot(new_root)
+    os.chdir(work_dir)
+
+    if as_root:
+        os.setgroups([])
+        os.setresgid(NOBODY_ID, NOBODY_ID, NOBODY_ID)
+        os.setresuid(NOBODY_ID, NOBODY_ID, NOBODY_ID)
+    else:
+        # struct __user_cap_header_struct (version 3) and two empty data sets
+        header = (ctypes.c_uint32 * 2)(0x20080522, 0)
+        no_capabilities = (ctypes.c_uint32 * 6)()
+        check(libc.capset(header, no_capabilities), "dropping capabilities")
+
+    arch, syscalls = DENIED_SYSCALLS[machine]
+    deny = len(syscalls) + (6 if machine == "x86_64" else 5)
+    program = [
+        (0x20, 0, 0, 4),  # Load the architecture
+        (0x15, 1, 0, arch),
+        (0x06, 0, 0, 0x80000000),  # Any other architecture: kill the process
+        (0x20, 0, 0, 0),  # Load the syscall number
+    ]
+    if machine == "x86_64":
+        program.append((0x35, deny - 5, 0, X32_SYSCALL_BIT))
+    for number in syscalls:
+        program.append((0x15, deny - len(program) - 1, 0, number))
+    program.append((0x06, 0, 0, 0x7FFF0000))  # Allow
+    program.append((0x06, 0, 0, 0x00050000 | 1))  # Fail with EPERM
+
+    class SockFilter(ctypes.Structure):
+        _fields_ = [
+            ("code", ctypes.c_uint16),
+            ("jt", ctypes.c_uint8),
+            ("jf", ctypes.c_uint8),
+            ("k", ctypes.c_uint32),
+        ]
+
+    class SockFprog(ctypes.Structure):
+        _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.POINTER(SockFilter))]
+
+    filters = (SockFilter * len(program))(*program)
+    fprog = SockFprog(len(program), filters)
+    check(libc.prctl(38, 1, 0, 0, 0), "setting no_new_privs")  # PR_SET_NO_NEW_PRIVS
+    check(
+        libc.prctl(22, 2, ctypes.byref(fprog), 0, 0),  # PR_SET_SECCOMP, FILTER
+        "installing the seccomp filter",
+    )
+
+
+def _apply_limits(cpu_seconds, memory_mb):
+    if resource is None:
+        return
+    limits = [
+        (resource.RLIMIT_CPU, cpu_seconds),
+        (resource.RLIMIT_AS, memory_mb * 1024 * 1024),
+        (resource.RLIMIT_FSIZE, 0),
+        (resource.RLIMIT_CORE, 0),
+    ]
+    for limit, value in limits:
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass  # Not supported on this platform
+
+
+def _describe_error(e):
+    return f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH]
+
+
+def _report_value(value):
+    # Values are compared as JSON, so e.g. a tuple matches an expected list
+    result = {}
+    try:
+        result["value"] = json.loads(json.dumps(value))
+    except Exception:
+        pass  # Not JSON, so it cannot equal an expected value
+    try:
+        result["repr"] = repr(value)[:MAX_ERROR_LENGTH]
+    except Exception as e:
+        result["repr"] = _describe_error(e)
+    return result
+
+
+def run_case(code, case):
+    """
+    Run the code once for one test case.
+
+    A case may give "stdin" for the program and a "call" expression evaluated
+    after the code runs.
+
+    Returns:
+        Dictionary with the "output" printed by the program (or by the call,
+        when given), the call's "value" and "repr", or an "error" message if
+        the code raised
+    """
+    # A fresh __main__ module, so the code cannot reach this harness through it
+    module = types.ModuleType("__main__")
+    module.__builtins__ = __builtins__
+    sys.modules["__main__"] = module
+    namespace = module.__dict__
+    stdout = io.StringIO()
+    sys.stdin = io.StringIO(case.get("stdin", ""))
+    try:
+        with contextlib.redirect_stdout(stdout):
+            exec(compile(code, "<student code>", "exec"), namespace)
+            if "call" in case:
+                stdout.seek(0)
+                stdout.truncate()
+                value = eval(case["call"], namespace)
+    except BaseException as e:  # Includes SystemExit and KeyboardInterrupt
+        return {"error": _describe_error(e)}
+
+    output = stdout.getvalue()
+    if len(output) > MAX_OUTPUT_LENGTH:
+        return {"error": "The program printed too much output"}
+    result = {"output": output}
+    if "call" in case:
+        result.update(_report_value(value))
+    return result
+
+
+def _hide_stdout():
+    """Move stdout to a new descriptor and send descriptor 1 to the null device."""
+    sys.stdout.flush()
+    report = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    null_fd = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(null_fd, 1)
+    os.close(null_fd)
+    return report
+
+
+def _write_report(report, content):
+    report.write("\n" + json.dumps(content) + "\n")
+    report.flush()
+
+
+def main():
+    job = json.loads(sys.stdin.read())
+    report = _hide_stdout()
+    work_dir = os.path.realpath(os.getcwd())
+    readable_roots = [work_dir] + [os.path.realpath(path) for path in sys.path]
+    # The first line of the report is the isolation status, written before
+    # any student code runs
+    try:
+        _isolate(work_dir, readable_roots)
+        _write_report(report, {"isolation_error": None})
+    except (IsolationError, OSError) as e:
+        _write_report(report, {"isolation_error": _describe_error(e)})
+        if job["require_isolation"]:
+            return
+    # Student code must not find the ctypes modules imported by _isolate()
+    for name in list(sys.modules):
+        if name in ("ctypes", "_ctypes") or name.startswith("ctypes."):
+            del sys.modules[name]
+    _apply_limits(job["cpu_seconds"], job["memory_mb"])
+    for module in (os, sys.modules.get("posix"), sys.modules.get("nt")):
+        if module is not None:
+            module._exit = _refuse_exit
+    sys.addaudithook(_make_audit_hook(readable_roots))
+
+    cases = [run_case(job["code"], case) for case in job["test_cases"]]
+
+    _write_report(report, {"cases": cases})
+
+
+if __name__ == "__main__":
+    main()
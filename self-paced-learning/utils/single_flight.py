@@ -0,0 +1,90 @@
+"""
+Single-flight request coalescing.
+
+When several threads ask for the same expensive result at the same time (a
+whole class opening a quiz on a cold cache, or submitting identical answers),
+only the first caller - the leader - does the work. Callers arriving while it
+runs wait for and share the leader's result, or its exception.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """One in-progress computation and the outcome its followers wait for."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._leaders = 0
+        self._followers = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        Run fn, unless a call with the same key is already running.
+
+        Results are not remembered once the leader finishes; pair this with a
+        cache so that later callers find the stored result instead.
+
+        Args:
+            key: Identifies identical work, e.g. a cache key or prompt hash
+            fn: Computes the result
+
+        Returns:
+            The result of fn, computed by this caller or by the leader
+
+        Raises:
+            Exception: Whatever fn raised in the leader
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._leaders += 1
+                leader = True
+            else:
+                self._followers += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report how many calls ran and how many were coalesced into them."""
+        with self._lock:
+            calls = self._leaders + self._followers
+            return {
+                "in_flight": len(self._flights),
+                "leaders": self._leaders,
+                "coalesced": self._followers,
+                "coalesced_rate": round(self._followers / calls, 4) if calls else 0.0,
+            }
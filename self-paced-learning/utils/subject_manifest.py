@@ -0,0 +1,595 @@
+"""
+Subject manifest: an in-memory index of every subject under data/subjects.
+
+The manifest replaces per-request directory scanning. It is persisted to a JSON
+file so that workers start without a scan and pick up each other's changes,
+and it is updated incrementally by the admin write paths. Alongside subject
+info it keeps exact per-subtopic content counts (questions, pool questions,
+lessons, videos) so pages never open quiz or lesson files just to count them.
+
+Writes re-read the persisted manifest under a file lock, so concurrent updates
+from several workers merge instead of overwriting each other. Each subject
+also records the stat signatures of its files; a file edited on disk outside
+the admin panel changes its signature and bumps the subject's content version.
+Those signatures are compared by a background sweep, so requests only ever
+stat the manifest file and the subjects directory.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from flask import current_app
+
+from utils.content_cache import stat_signature
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within a process
+    fcntl = None
+
+MANIFEST_FORMAT = 3
+
+# Subject-level files, relative to the subject directory
+SUBJECT_FILES = ("subject_info.json", "subject_config.json")
+
+# stat name -> (file name, top-level key holding the counted items)
+SUBTOPIC_STAT_SOURCES = {
+    "question_count": ("quiz_data.json", "questions"),
+    "pool_count": ("question_pool.json", "questions"),
+    "lesson_count": ("lesson_plans.json", "lessons"),
+    "video_count": ("videos.json", "videos"),
+}
+
+
+def _new_content_version(previous: int = 0) -> int:
+    """
+    Return a content version greater than previous.
+
+    Versions are millisecond timestamps so that they keep increasing even if
+    the manifest file is deleted and rebuilt from scratch.
+    """
+    return max(previous + 1, time.time_ns() // 1_000_000)
+
+
+def empty_subtopic_stats() -> Dict[str, int]:
+    """Return zeroed content counts for a subtopic."""
+    return {stat_name: 0 for stat_name in SUBTOPIC_STAT_SOURCES}
+
+
+class SubjectManifest:
+    """Maintains subject ids, info, content statistics and content versions."""
+
+    def __init__(
+        self,
+        subjects_dir: str,
+        manifest_path: str,
+        check_interval: float = 5.0,
+        sweep_interval: float = 30.0,
+    ):
+        """
+        Initialize the manifest. Nothing is read until the first lookup.
+
+        Args:
+            subjects_dir: Path to the data/subjects directory
+            manifest_path: Path of the persisted manifest file
+            check_interval: Seconds between checks for changes made by other
+                worker processes or to the set of subject directories
+            sweep_interval: Seconds between background sweeps for subject
+                files edited directly on disk; 0 disables the sweep
+        """
+        self.subjects_dir = subjects_dir
+        self.manifest_path = manifest_path
+        self.check_interval = check_interval
+        self.sweep_interval = sweep_interval
+        self._lock = threading.RLock()
+        self._subjects: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._manifest_signature = None
+        self._subjects_dir_mtime_ns = None
+        self._next_check = 0.0
+        self._file_lock_depth = 0
+        self._stop = threading.Event()
+        # (pid, thread) of the sweep thread; threads do not survive a fork
+        self._sweeper: Optional[Tuple[int, threading.Thread]] = None
+        self._app = None
+
+    def get_subjects(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get all valid subjects in the same format as subjects.json.
+
+        Returns:
+            Dictionary mapping subject id to a copy of its info
+        """
+        self._ensure_current()
+        with self._lock:
+            return {
+                subject_id: dict(entry["info"])
+                for subject_id, entry in self._subjects.items()
+            }
+
+    def get_subject(self, subject: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the manifest info for a single subject.
+
+        Returns:
+            Copy of the subject info, or None if the subject is unknown
+        """
+        self._ensure_current()
+        with self._lock:
+            entry = self._subjects.get(subject)
+            return dict(entry["info"]) if entry else None
+
+    def get_subtopic_stats(self, subject: str) -> Dict[str, Dict[str, int]]:
+        """
+        Get content counts for every subtopic listed in a subject's config.
+
+        Returns:
+            Dictionary mapping subtopic id to a copy of its counts
+        """
+        self._ensure_current()
+        with self._lock:
+            entry = self._subjects.get(subject)
+            if not entry:
+                return {}
+            return {
+                subtopic_id: dict(stats)
+                for subtopic_id, stats in entry["subtopic_stats"].items()
+            }
+
+    def get_content_version(self, subject: str) -> int:
+        """
+        Get the content version of a subject.
+
+        The version changes whenever any file of the subject is changed, through
+        the admin write paths or on disk, so it can be used to key derived
+        indexes.
+
+        Returns:
+            Content version, or 0 if the subject is unknown
+        """
+        self._ensure_current()
+        with self._lock:
+            entry = self._subjects.get(subject)
+            return entry["content_version"] if entry else 0
+
+    def refresh_subject(self, subject: str, subtopic: str = None) -> None:
+        """
+        Re-read one subject's files and bump its content version.
+
+        Subject info is always re-read. Content counts are recomputed only for
+        the given subtopic and for subtopics that have no counts yet.
+
+        Args:
+            subject: Subject id whose files were created or changed
+            subtopic: Subtopic whose content files changed, if any
+        """
+        with self._lock, self._file_lock():
+            self._sync_before_write()
+            self._update_subject(subject, [subtopic] if subtopic else [])
+            self._subjects_dir_mtime_ns = self._get_subjects_dir_mtime_ns()
+            self._persist()
+
+    def remove_subject(self, subject: str) -> None:
+        """
+        Drop a deleted subject from the manifest.
+
+        Args:
+            subject: Subject id that was removed from disk
+        """
+        with self._lock, self._file_lock():
+            self._sync_before_write()
+            self._subjects.pop(subject, None)
+            self._subjects_dir_mtime_ns = self._get_subjects_dir_mtime_ns()
+            self._persist()
+
+    def rebuild(self) -> None:
+        """Rescan the subjects directory and assign fresh content versions."""
+        with self._lock, self._file_lock():
+            subjects = {}
+            previous = self._subjects
+
+            if os.path.isdir(self.subjects_dir):
+                for item in sorted(os.listdir(self.subjects_dir)):
+                    if not os.path.isdir(os.path.join(self.subjects_dir, item)):
+                        continue
+
+                    # Drop the old counts so every subtopic is recounted
+                    old_entry = previous.get(item)
+                    if old_entry:
+                        old_entry = {**old_entry, "subtopic_stats": {}}
+
+                    entry = self._build_entry(item, old_entry)
+                    if entry is not None:
+                        subjects[item] = entry
+            elif current_app:
+                current_app.logger.warning(
+                    f"Subjects directory not found: {self.subjects_dir}"
+                )
+
+            self._subjects = subjects
+            self._subjects_dir_mtime_ns = self._get_subjects_dir_mtime_ns()
+            self._loaded = True
+            self._persist()
+
+            if current_app:
+                current_app.logger.info(
+                    f"Rebuilt subject manifest: {len(subjects)} subjects"
+                )
+
+    def sweep_files(self) -> Dict[str, Set[str]]:
+        """
+        Re-read subjects whose files were edited on disk outside the admin panel.
+
+        Stats every content file of every subject, so it runs on the sweep
+        thread rather than on the request path.
+
+        Returns:
+            Dictionary mapping each re-read subject id to its changed subtopics
+        """
+        with self._lock:
+            self._load_persisted()
+            subjects = dict(self._subjects)
+        if not self._changed_on_disk(subjects):
+            return {}
+
+        with self._lock, self._file_lock():
+            # Another worker may have caught up while we waited for the lock
+            self._load_persisted()
+            changed = self._changed_on_disk(self._subjects)
+            for subject, subtopics in changed.items():
+                self._update_subject(subject, subtopics)
+            if changed:
+                self._persist()
+                if current_app:
+                    current_app.logger.info(
+                        f"Subject files changed on disk: {sorted(changed)}"
+                    )
+            return changed
+
+    def close(self) -> None:
+        """Stop the sweep thread."""
+        self._stop.set()
+        if self._sweeper is not None and self._sweeper[0] == os.getpid():
+            self._sweeper[1].join(timeout=5)
+
+    def _start_sweeper(self) -> None:
+        """Start the sweep thread on first use, again in a forked worker."""
+        if not self.sweep_interval or self._stop.is_set():
+            return
+        if self._sweeper is not None and self._sweeper[0] == os.getpid():
+            return
+
+        if current_app:
+            self._app = current_app._get_current_object()
+        thread = threading.Thread(
+            target=self._run, name="subject-manifest-sweep", daemon=True
+        )
+        self._sweeper = (os.getpid(), thread)
+        thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                if self._app is not None:
+                    with self._app.app_context():
+                        self.sweep_files()
+                else:
+                    self.sweep_files()
+            except Exception as e:
+                if self._app is not None:
+                    self._app.logger.error(f"Subject manifest sweep failed: {e}")
+
+    def _update_subject(self, subject: str, changed_subtopics: Iterable[str]) -> None:
+        """Re-read one subject into the in-memory manifest with a new version."""
+        entry = self._build_entry(
+            subject, self._subjects.get(subject), changed_subtopics
+        )
+        if entry is None:
+            self._subjects.pop(subject, None)
+        else:
+            self._subjects[subject] = entry
+
+    def _sync_before_write(self) -> None:
+        """
+        Pick up other workers' changes before applying an incremental update.
+
+        Called with the file lock held, so no other worker writes in between.
+        """
+        self._load_persisted()
+        if not self._loaded:
+            self.rebuild()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """
+        Hold an exclusive lock on the manifest's lock file.
+
+        Reentrant within this instance; callers hold self._lock.
+        """
+        lock_file = None
+        if fcntl is not None and not self._file_lock_depth:
+            try:
+                lock_file = open(f"{self.manifest_path}.lock", "a", encoding="utf-8")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            except OSError as e:
+                # E.g. a read-only data dir, where nothing is persisted either
+                if lock_file is not None:
+                    lock_file.close()
+                    lock_file = None
+                if current_app:
+                    current_app.logger.warning(f"Could not lock subject manifest: {e}")
+
+        self._file_lock_depth += 1
+        try:
+            yield
+        finally:
+            self._file_lock_depth -= 1
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _is_stale(self) -> bool:
+        """Whether the manifest was never loaded or subjects came and went."""
+        return (
+            not self._loaded
+            or self._get_subjects_dir_mtime_ns() != self._subjects_dir_mtime_ns
+        )
+
+    def _changed_on_disk(
+        self, subjects: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Set[str]]:
+        """
+        Find subjects whose files changed since their manifest entry was built.
+
+        Args:
+            subjects: Manifest entries to compare against the files on disk
+
+        Returns:
+            Dictionary mapping subject id to the subtopics whose files changed
+            (empty if only subject-level files changed)
+        """
+        changed = {}
+        for subject, entry in subjects.items():
+            recorded = entry.get("file_signatures") or {}
+            current = self._file_signatures(subject, entry["subtopic_stats"])
+            if current != recorded:
+                changed[subject] = {
+                    path.split("/", 1)[0]
+                    for path in set(current) | set(recorded)
+                    if "/" in path and current.get(path) != recorded.get(path)
+                }
+        return changed
+
+    def _ensure_current(self) -> None:
+        """
+        Make sure the in-memory manifest reflects the latest state.
+
+        Between checks this is a single comparison. A check stats only the
+        manifest file and the subjects directory, and a full rescan only happens
+        when subject directories were added or removed outside the admin panel.
+        Files edited on disk are picked up by the sweep thread, which the first
+        lookup starts.
+        """
+        now = time.monotonic()
+        if self._loaded and now < self._next_check:
+            return
+
+        with self._lock:
+            if self._loaded and now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            self._start_sweeper()
+
+            self._load_persisted()
+            if not self._is_stale():
+                return
+
+            with self._file_lock():
+                # Another worker may have caught up while we waited for the lock
+                self._load_persisted()
+                if self._is_stale():
+                    self.rebuild()
+
+    def _load_persisted(self) -> None:
+        """Reload the manifest file if another process has rewritten it."""
+        try:
+            file_stat = os.stat(self.manifest_path)
+        except OSError:
+            return
+
+        signature = (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+        if signature == self._manifest_signature:
+            return
+
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            if current_app:
+                current_app.logger.warning(f"Ignoring unreadable subject manifest: {e}")
+            return
+
+        if data.get("format") != MANIFEST_FORMAT:
+            return
+
+        self._subjects = data.get("subjects", {})
+        self._subjects_dir_mtime_ns = data.get("subjects_dir_mtime_ns")
+        self._manifest_signature = signature
+        self._loaded = True
+
+    def _persist(self) -> None:
+        """Atomically write the manifest so other workers can pick it up."""
+        data = {
+            "format": MANIFEST_FORMAT,
+            "subjects_dir_mtime_ns": self._subjects_dir_mtime_ns,
+            "subjects": self._subjects,
+        }
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+
+            file_stat = os.stat(self.manifest_path)
+            self._manifest_signature = (
+                file_stat.st_mtime_ns,
+                file_stat.st_size,
+                file_stat.st_ino,
+            )
+        except OSError as e:
+            # The in-memory manifest still works, it just isn't shared
+            if current_app:
+                current_app.logger.warning(f"Could not persist subject manifest: {e}")
+
+    def _get_subjects_dir_mtime_ns(self) -> Optional[int]:
+        """Return the subjects directory mtime; it changes when subjects come and go."""
+        try:
+            return os.stat(self.subjects_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def _build_entry(
+        self,
+        subject: str,
+        previous: Optional[Dict[str, Any]],
+        changed_subtopics: Iterable[str] = (),
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Build the manifest entry for one subject.
+
+        Args:
+            subject: Subject id
+            previous: Existing entry whose counts can be reused, if any
+            changed_subtopics: Subtopics whose counts must be recomputed, in
+                addition to those whose files changed since previous was built
+
+        Returns:
+            New manifest entry, or None if the subject is not valid
+        """
+        subject_files = self._read_subject(subject)
+        if subject_files is None:
+            return None
+
+        info, subtopic_ids = subject_files
+        old_stats = previous["subtopic_stats"] if previous else {}
+        old_signatures = (previous or {}).get("file_signatures") or {}
+        file_signatures = self._file_signatures(subject, subtopic_ids)
+        changed = set(changed_subtopics) | {
+            path.split("/", 1)[0]
+            for path, signature in file_signatures.items()
+            if "/" in path and old_signatures.get(path) != signature
+        }
+
+        subtopic_stats = {}
+        for subtopic_id in subtopic_ids:
+            if subtopic_id in old_stats and subtopic_id not in changed:
+                subtopic_stats[subtopic_id] = old_stats[subtopic_id]
+            else:
+                subtopic_stats[subtopic_id] = self._count_subtopic_content(
+                    subject, subtopic_id
+                )
+
+        return {
+            "info": info,
+            "subtopic_stats": subtopic_stats,
+            "file_signatures": file_signatures,
+            "content_version": _new_content_version(
+                previous["content_version"] if previous else 0
+            ),
+        }
+
+    def _file_signatures(
+        self, subject: str, subtopic_ids: Iterable[str]
+    ) -> Dict[str, Optional[List[int]]]:
+        """
+        Stat the files a subject's content is read from.
+
+        Returns:
+            Dictionary mapping paths relative to the subject directory to
+            [mtime_ns, size, inode], or None for missing files
+        """
+        subject_path = os.path.join(self.subjects_dir, subject)
+        paths = list(SUBJECT_FILES) + [
+            f"{subtopic_id}/{file_name}"
+            for subtopic_id in subtopic_ids
+            for file_name, _ in SUBTOPIC_STAT_SOURCES.values()
+        ]
+
+        signatures = {}
+        for path in paths:
+            try:
+                signatures[path] = list(
+                    stat_signature(os.stat(os.path.join(subject_path, path)))
+                )
+            except OSError:
+                signatures[path] = None
+        return signatures
+
+    def _count_subtopic_content(self, subject: str, subtopic: str) -> Dict[str, int]:
+        """Count questions, pool questions, lessons and videos of one subtopic."""
+        stats = empty_subtopic_stats()
+        subtopic_path = os.path.join(self.subjects_dir, subject, subtopic)
+
+        for stat_name, (file_name, items_key) in SUBTOPIC_STAT_SOURCES.items():
+            try:
+                with open(
+                    os.path.join(subtopic_path, file_name), "r", encoding="utf-8"
+                ) as f:
+                    stats[stat_name] = len(json.load(f).get(items_key) or [])
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError, AttributeError) as e:
+                if current_app:
+                    current_app.logger.warning(
+                        f"Could not count {file_name} for {subject}/{subtopic}: {e}"
+                    )
+
+        return stats
+
+    def _read_subject(self, subject: str) -> Optional[Tuple[Dict[str, Any], List[str]]]:
+        """
+        Read subject_info.json and subject_config.json for one subject.
+
+        Returns:
+            Tuple of (merged subject info with calculated fields, subtopic ids),
+            or None if the subject is missing either file or they cannot be parsed
+        """
+        subject_path = os.path.join(self.subjects_dir, subject)
+        subject_info_path = os.path.join(subject_path, "subject_info.json")
+        subject_config_path = os.path.join(subject_path, "subject_config.json")
+
+        # Subject must have both files to be valid
+        try:
+            with open(subject_info_path, "r", encoding="utf-8") as f:
+                subject_info = json.load(f)
+            with open(subject_config_path, "r", encoding="utf-8") as f:
+                subject_config = json.load(f)
+        except FileNotFoundError:
+            if current_app:
+                current_app.logger.debug(
+                    f"Skipping directory (missing required files): {subject}"
+                )
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            if current_app:
+                current_app.logger.warning(
+                    f"Invalid subject files in directory: {subject} ({e})"
+                )
+            return None
+
+        if not subject_info or not subject_config:
+            return None
+
+        subtopic_ids = list(subject_config.get("subtopics", {}))
+        info = {
+            **subject_info,
+            "subtopic_count": len(subtopic_ids),
+            "status": subject_info.get("status", "active"),
+            "created_date": subject_info.get("created_date", "2025-01-01"),
+        }
+        return info, subtopic_ids
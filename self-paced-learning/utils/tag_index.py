@@ -0,0 +1,147 @@
+"""
+Inverted tag index over a subject's lessons and question pools.
+Tags are interned to integer ids and map to posting lists of item ordinals.
+"""
+
+from typing import Any, Dict, Iterable, List
+
+
+class TagIndex:
+    """Tag -> lesson and tag -> question posting lists for one subject."""
+
+    def __init__(self, subject: str):
+        """
+        Initialize an empty index.
+
+        Args:
+            subject: Subject the indexed content belongs to
+        """
+        self.subject = subject
+        self._tag_ids: Dict[str, int] = {}
+        self._tags: List[str] = []
+
+        # Lessons are numbered in insertion order so results keep file order
+        self._lessons: List[Dict[str, Any]] = []
+        self._lesson_postings: Dict[int, List[int]] = {}
+
+        # Question postings are kept per subtopic, since remedial quizzes
+        # only draw from the current subtopic's pool
+        self._questions: Dict[str, List[Dict[str, Any]]] = {}
+        self._question_postings: Dict[str, Dict[int, List[int]]] = {}
+
+    def intern(self, tag: str) -> int:
+        """Return the integer id for tag, assigning one if it is new."""
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = len(self._tags)
+            self._tag_ids[tag] = tag_id
+            self._tags.append(tag)
+        return tag_id
+
+    def add_lesson(self, subtopic: str, lesson_id: str, lesson_data: Dict[str, Any]):
+        """
+        Index a lesson under each of its tags.
+
+        Args:
+            subtopic: Subtopic the lesson belongs to
+            lesson_id: Lesson key in lesson_plans.json
+            lesson_data: Lesson dictionary
+        """
+        ordinal = len(self._lessons)
+        tags = lesson_data.get("tags", [])
+        self._lessons.append(
+            {
+                "subtopic": subtopic,
+                "lesson_id": lesson_id,
+                "title": lesson_data.get("title", ""),
+                "tags": tags,
+            }
+        )
+        for tag_id in {self.intern(tag) for tag in tags}:
+            self._lesson_postings.setdefault(tag_id, []).append(ordinal)
+
+    def add_questions(self, subtopic: str, questions: Iterable[Dict[str, Any]]):
+        """
+        Index every question of a subtopic's pool under each of its tags.
+
+        Args:
+            subtopic: Subtopic the pool belongs to
+            questions: Question dictionaries from question_pool.json
+        """
+        indexed = self._questions.setdefault(subtopic, [])
+        postings = self._question_postings.setdefault(subtopic, {})
+
+        for question in questions:
+            ordinal = len(indexed)
+            indexed.append(question)
+            for tag_id in {self.intern(tag) for tag in question.get("tags", [])}:
+                postings.setdefault(tag_id, []).append(ordinal)
+
+    def find_lessons(self, target_tags: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Find lessons carrying any of the target tags.
+
+        Runs in time proportional to the size of the matching posting lists.
+
+        Args:
+            target_tags: Tags to search for
+
+        Returns:
+            Matching lessons in file order, with the tags that matched
+        """
+        matches: Dict[int, List[str]] = {}
+        for tag in dict.fromkeys(target_tags):
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is None:
+                continue
+            for ordinal in self._lesson_postings.get(tag_id, ()):
+                matches.setdefault(ordinal, []).append(tag)
+
+        results = []
+        for ordinal in sorted(matches):
+            lesson = self._lessons[ordinal]
+            results.append(
+                {
+                    "subject": self.subject,
+                    "subtopic": lesson["subtopic"],
+                    "lesson_id": lesson["lesson_id"],
+                    "title": lesson["title"],
+                    "tags": lesson["tags"],
+                    "matching_tags": matches[ordinal],
+                }
+            )
+        return results
+
+    def find_questions(
+        self, subtopic: str, target_tags: Iterable[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Find pool questions of a subtopic carrying any of the target tags.
+
+        Args:
+            subtopic: Subtopic whose pool to search
+            target_tags: Tags to search for
+
+        Returns:
+            Matching question dictionaries in pool order; of matching questions
+            with the same text only the first is kept
+        """
+        postings = self._question_postings.get(subtopic)
+        if not postings:
+            return []
+
+        ordinals = set()
+        for tag in set(target_tags):
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is not None:
+                ordinals.update(postings.get(tag_id, ()))
+
+        questions = self._questions[subtopic]
+        results = []
+        seen_texts = set()
+        for ordinal in sorted(ordinals):
+            text = questions[ordinal].get("question")
+            if text not in seen_texts:
+                seen_texts.add(text)
+                results.append(questions[ordinal])
+        return results
@@ -0,0 +1,113 @@
+"""
+Insert-or-merge writes for rows identified by key columns.
+
+An Upsert describes how an incoming row is combined with an existing row
+with the same key: columns are added up, keep the greater value or are
+replaced. Rows for the same key are merged in memory first, then written
+with one INSERT ... ON CONFLICT DO UPDATE executemany on SQLite and
+PostgreSQL, or with an UPDATE-then-INSERT per row elsewhere.
+"""
+
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import Table, and_, case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+
+_UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class Upsert:
+    """Merges rows into a table by key, combining conflicting columns."""
+
+    def __init__(
+        self,
+        table: Table,
+        keys: Sequence[str],
+        add: Sequence[str] = (),
+        greatest: Sequence[str] = (),
+        replace: Sequence[str] = (),
+    ):
+        """
+        Describe an upsert.
+
+        Args:
+            table: Table to write, with a unique constraint over keys
+            keys: Columns identifying a row
+            add: Columns summed with the existing value, e.g. counters
+            greatest: Columns keeping the greater of both values
+            replace: Columns overwritten by the newer value
+        """
+        self.table = table
+        self.keys = list(keys)
+        self.add = list(add)
+        self.greatest = list(greatest)
+        self.replace = list(replace)
+
+    def merge(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Combine rows sharing a key, in order, the way a conflict would."""
+        merged: Dict[tuple, Dict[str, Any]] = {}
+        for row in rows:
+            key = tuple(row[column] for column in self.keys)
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = dict(row)
+                continue
+            for column in self.add:
+                existing[column] += row[column]
+            for column in self.greatest:
+                existing[column] = max(existing[column], row[column])
+            for column in self.replace:
+                existing[column] = row[column]
+        return list(merged.values())
+
+    def execute(self, connection: Connection, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Write rows within the caller's transaction.
+
+        Returns:
+            Number of rows written after merging
+        """
+        rows = self.merge(rows)
+        if not rows:
+            return 0
+
+        insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+        if insert is None:
+            for row in rows:
+                self._update_or_insert(connection, row)
+            return len(rows)
+
+        statement = insert(self.table)
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=[self.table.c[column] for column in self.keys],
+                set_=self._merged_values(statement.excluded),
+            ),
+            rows,
+        )
+        return len(rows)
+
+    def _merged_values(self, new) -> Dict[str, Any]:
+        # new is either the excluded row or a mapping of literal values
+        columns = self.table.c
+        values: Dict[str, Any] = {}
+        for column in self.add:
+            values[column] = columns[column] + new[column]
+        for column in self.greatest:
+            values[column] = case(
+                (new[column] > columns[column], new[column]), else_=columns[column]
+            )
+        for column in self.replace:
+            values[column] = new[column]
+        return values
+
+    def _update_or_insert(self, connection: Connection, row: Dict[str, Any]) -> None:
+        columns = self.table.c
+        result = connection.execute(
+            self.table.update()
+            .where(and_(*(columns[column] == row[column] for column in self.keys)))
+            .values(self._merged_values(row))
+        )
+        if result.rowcount == 0:
+            connection.execute(self.table.insert(), row)
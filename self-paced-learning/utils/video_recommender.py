@@ -0,0 +1,153 @@
+"""
+Local TF-IDF video recommender.
+
+Every video from every subject's videos.json is indexed as a document made of
+its title, description and the tags of its subtopic's lessons. Documents are
+stored as rows of an L2-normalized NumPy matrix, so scoring a weak-topic query
+against all videos is a single matrix-vector product.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from how in into is it its learn of on or "
+    "the their this to understand use using what with your".split()
+)
+
+# Fields are repeated to weight them: titles and lesson tags describe a video
+# more precisely than its free-form description
+TITLE_WEIGHT = 2
+TAG_WEIGHT = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms, dropping stop words.
+
+    A trailing "s" is stripped from longer words so that e.g. "loops" in a
+    weak topic matches "loop" in a description.
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class VideoRecommender:
+    """TF-IDF index over videos, queried with weak-topic strings."""
+
+    def __init__(self, videos: Iterable[Dict[str, Any]]):
+        """
+        Build the index.
+
+        Args:
+            videos: Video dictionaries with subject, subtopic, key, title,
+                url, description and tags (tags of the subtopic's lessons)
+        """
+        self.videos: List[Dict[str, Any]] = []
+        documents = []
+        for video in videos:
+            self.videos.append(
+                {
+                    "subject": video["subject"],
+                    "subtopic": video["subtopic"],
+                    "key": video["key"],
+                    "title": video.get("title", ""),
+                    "url": video.get("url", ""),
+                    "description": video.get("description", ""),
+                }
+            )
+            documents.append(
+                tokenize(video.get("title", "")) * TITLE_WEIGHT
+                + tokenize(video.get("description", ""))
+                + tokenize(" ".join(video.get("tags", []))) * TAG_WEIGHT
+            )
+
+        self._video_subjects = np.array([video["subject"] for video in self.videos])
+
+        self.vocabulary: Dict[str, int] = {}
+        for terms in documents:
+            for term in terms:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+
+        counts = np.zeros((len(documents), len(self.vocabulary)), dtype=np.float32)
+        for row, terms in enumerate(documents):
+            for term in terms:
+                counts[row, self.vocabulary[term]] += 1
+
+        # Smoothed IDF, as in scikit-learn, keeps terms present everywhere > 0
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self.idf = (
+            np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        ).astype(np.float32)
+
+        # Sublinear TF dampens terms repeated many times in one description
+        weights = np.zeros_like(counts)
+        np.log(counts, out=weights, where=counts > 0)
+        weights[counts > 0] += 1
+        weights *= self.idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        self.matrix = weights / np.where(norms == 0, 1, norms)
+
+    def query_vector(self, topics: Iterable[str]) -> Optional[np.ndarray]:
+        """
+        Build the normalized TF-IDF vector for a weak-topic query.
+
+        Returns:
+            Query vector, or None if no query term occurs in any video
+        """
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term in tokenize(" ".join(topics)):
+            column = self.vocabulary.get(term)
+            if column is not None:
+                vector[column] += 1
+
+        if not vector.any():
+            return None
+        vector *= self.idf
+        return vector / np.linalg.norm(vector)
+
+    def recommend(
+        self,
+        topics: Iterable[str],
+        limit: int = 5,
+        min_score: float = 0.1,
+        subject: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Recommend videos for a list of weak topics.
+
+        Args:
+            topics: Weak topic strings (e.g. ["for loops", "return values"])
+            limit: Maximum number of videos to return
+            min_score: Minimum cosine similarity for a video to be returned
+            subject: If given, only videos of this subject are considered
+
+        Returns:
+            Video dictionaries with a "score", best match first
+        """
+        if not self.videos:
+            return []
+        query = self.query_vector(topics)
+        if query is None:
+            return []
+
+        scores = self.matrix @ query
+        if subject is not None:
+            scores = np.where(self._video_subjects == subject, scores, 0)
+
+        candidates = np.flatnonzero(scores >= min_score)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")][:limit]
+        return [
+            {**self.videos[row], "score": round(float(scores[row]), 4)}
+            for row in ranked
+        ]